@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Backplane de broadcast - pub/sub de frames de pitch entre instâncias
+
+Com várias instâncias do backend atrás de um balanceador, um professor
+conectado na instância A precisa ver um aluno conectado na instância B. O
+backplane liga as instâncias: cada uma publica os frames das sessões locais
+e assina os canais que seus clientes estão assistindo.
+
+Os frames não vão para a rede um a um: em cada tick, cada canal manda uma
+única mensagem com o frame mais recente de cada sessão (os anteriores do
+mesmo tick são coalescidos). O tráfego entre nós cresce com o número de
+sessões, não com o número de espectadores.
+
+Implementações:
+    InMemoryBackplane - dentro do processo (uma instância, ou testes)
+    RedisBackplane    - protocolo Redis (RESP) sobre asyncio streams, sem
+                        dependências; funciona com Redis/Valkey/KeyDB
+
+Para testar sem Redis há um servidor local mínimo (PING/PUBLISH/SUBSCRIBE):
+    python backplane.py --serve 6379
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+from logs import log
+
+
+# Callback de assinatura: recebe a lista de frames de um tick
+BatchCallback = Callable[[list[dict]], Awaitable[None]]
+
+
+class Backplane:
+    """
+    Interface do backplane, com o agrupamento por tick já implementado
+
+    Subclasses implementam _connect, _close, _send (entrega uma mensagem
+    já serializada a um canal) e _listen/_unlisten (assinatura remota).
+    Mensagens recebidas são repassadas a _dispatch.
+    """
+
+    def __init__(self, tick_interval: float = 0.05):
+        self.tick_interval = tick_interval
+        self.node_id = uuid.uuid4().hex[:8]
+        self.pending: dict[str, dict[str, dict]] = {}
+        self.subscribers: dict[str, list[BatchCallback]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.sent_batches = 0
+        self.received_batches = 0
+
+    async def start(self):
+        """Conecta e inicia o envio periódico dos lotes"""
+        if self.flush_task is not None:
+            return
+        await self._connect()
+        self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Envia o que estiver pendente e desconecta"""
+        if self.flush_task is None:
+            return
+        self.flush_task.cancel()
+        self.flush_task = None
+        await self.flush()
+        await self._close()
+
+    def publish(self, channel: str, key: str, frame: dict):
+        """
+        Enfileira um frame para o próximo tick
+
+        `key` identifica a origem (ex.: id da sessão): dentro de um tick só o
+        frame mais recente de cada origem é enviado.
+        """
+        self.pending.setdefault(channel, {})[key] = frame
+        self.published += 1
+
+    async def subscribe(self, channel: str, callback: BatchCallback):
+        """Assina um canal; o callback recebe os frames de cada lote"""
+        callbacks = self.subscribers.setdefault(channel, [])
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            await self._listen(channel)
+
+    async def unsubscribe(self, channel: str, callback: BatchCallback):
+        """Cancela uma assinatura; o canal remoto é liberado com a última"""
+        callbacks = self.subscribers.get(channel)
+        if not callbacks or callback not in callbacks:
+            return
+        callbacks.remove(callback)
+        if not callbacks:
+            del self.subscribers[channel]
+            await self._unlisten(channel)
+
+    async def flush(self):
+        """Envia uma mensagem por canal com os frames acumulados no tick"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        messages = [
+            (channel, json.dumps({"node": self.node_id, "frames": list(frames.values())}))
+            for channel, frames in pending.items()
+        ]
+        await self._send(messages)
+        self.sent_batches += len(messages)
+
+    async def _flush_loop(self):
+        """Loop de ticks do envio"""
+        while True:
+            started = time.monotonic()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Erro no backplane", error=e)
+            await asyncio.sleep(max(0.0, self.tick_interval - (time.monotonic() - started)))
+
+    async def _dispatch(self, channel: str, payload: str):
+        """Entrega um lote recebido aos assinantes locais do canal"""
+        callbacks = self.subscribers.get(channel)
+        if not callbacks:
+            return
+        try:
+            frames = json.loads(payload)["frames"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.received_batches += 1
+        await asyncio.gather(*(callback(frames) for callback in list(callbacks)), return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Contadores para endpoints de status"""
+        return {
+            "backend": type(self).__name__,
+            "node": self.node_id,
+            "channels": len(self.subscribers),
+            "published_frames": self.published,
+            "sent_batches": self.sent_batches,
+            "received_batches": self.received_batches
+        }
+
+    async def _connect(self):
+        """Abre a conexão com o broker"""
+
+    async def _close(self):
+        """Fecha a conexão com o broker"""
+
+    async def _send(self, messages: list[tuple[str, str]]):
+        """Entrega mensagens (canal, payload) ao broker"""
+        raise NotImplementedError
+
+    async def _listen(self, channel: str):
+        """Passa a receber as mensagens de um canal"""
+
+    async def _unlisten(self, channel: str):
+        """Deixa de receber as mensagens de um canal"""
+
+
+class InMemoryBroker:
+    """Broker dentro do processo, compartilhado por vários InMemoryBackplane"""
+
+    def __init__(self):
+        self.listeners: dict[str, set["InMemoryBackplane"]] = {}
+
+
+class InMemoryBackplane(Backplane):
+    """Backplane dentro do processo (instância única ou várias "instâncias" em testes)"""
+
+    def __init__(self, broker: Optional[InMemoryBroker] = None, tick_interval: float = 0.05):
+        super().__init__(tick_interval)
+        self.broker = broker or InMemoryBroker()
+
+    async def _send(self, messages: list[tuple[str, str]]):
+        for channel, payload in messages:
+            for backplane in list(self.broker.listeners.get(channel, ())):
+                await backplane._dispatch(channel, payload)
+
+    async def _listen(self, channel: str):
+        self.broker.listeners.setdefault(channel, set()).add(self)
+
+    async def _unlisten(self, channel: str):
+        listeners = self.broker.listeners.get(channel)
+        if listeners:
+            listeners.discard(self)
+            if not listeners:
+                del self.broker.listeners[channel]
+
+
+def encode_bulk(arg) -> bytes:
+    """Serializa um valor como bulk string RESP"""
+    data = arg if isinstance(arg, bytes) else str(arg).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def encode_command(*args) -> bytes:
+    """Serializa um comando Redis (array RESP de bulk strings)"""
+    return b"*%d\r\n" % len(args) + b"".join(encode_bulk(arg) for arg in args)
+
+
+class RespError(Exception):
+    """Resposta de erro (-ERR ...) do servidor"""
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Lê uma resposta RESP completa (string, erro, inteiro, bulk ou array)"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Conexão fechada pelo servidor")
+    kind, body = line[:1], line[1:-2]
+
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Resposta RESP inválida: {line!r}")
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane sobre o pub/sub do Redis
+
+    Usa duas conexões: uma para PUBLISH (um pipeline por tick) e outra em modo
+    SUBSCRIBE, lida por uma tarefa em segundo plano. Se a conexão cair, a
+    tarefa reconecta e refaz as assinaturas.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379", tick_interval: float = 0.05,
+                 channel_prefix: str = "pitch:"):
+        super().__init__(tick_interval)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.channel_prefix = channel_prefix
+        self.publisher: Optional[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self.subscriber_writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.publish_lock = asyncio.Lock()
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Abre uma conexão (autenticando se a URL tiver senha)"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            reply = await read_reply(reader)
+            if isinstance(reply, RespError):
+                writer.close()
+                raise reply
+        return reader, writer
+
+    async def _connect(self):
+        self.publisher = await self._open()
+        self.reader_task = asyncio.create_task(self._subscriber_loop())
+
+    async def _close(self):
+        if self.reader_task:
+            self.reader_task.cancel()
+            self.reader_task = None
+        for writer in (self.publisher[1] if self.publisher else None, self.subscriber_writer):
+            if writer is not None:
+                writer.close()
+        self.publisher = None
+        self.subscriber_writer = None
+
+    async def _send(self, messages: list[tuple[str, str]]):
+        async with self.publish_lock:
+            if self.publisher is None:
+                self.publisher = await self._open()
+            reader, writer = self.publisher
+            try:
+                # Pipeline: todos os PUBLISH do tick num único write
+                writer.write(b"".join(
+                    encode_command("PUBLISH", self.channel_prefix + channel, payload)
+                    for channel, payload in messages
+                ))
+                await writer.drain()
+                for _ in messages:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, RespError):
+                        log.error("Erro no PUBLISH", reply=reply)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                self.publisher = None
+                raise
+
+    async def _listen(self, channel: str):
+        if self.subscriber_writer is not None:
+            self.subscriber_writer.write(encode_command("SUBSCRIBE", self.channel_prefix + channel))
+            await self.subscriber_writer.drain()
+
+    async def _unlisten(self, channel: str):
+        if self.subscriber_writer is not None:
+            self.subscriber_writer.write(encode_command("UNSUBSCRIBE", self.channel_prefix + channel))
+            await self.subscriber_writer.drain()
+
+    async def _subscriber_loop(self):
+        """Recebe mensagens do modo SUBSCRIBE, reconectando quando necessário"""
+        delay = 0.5
+        while True:
+            try:
+                reader, writer = await self._open()
+                self.subscriber_writer = writer
+                if self.subscribers:
+                    writer.write(encode_command("SUBSCRIBE", *(self.channel_prefix + channel
+                                                               for channel in self.subscribers)))
+                    await writer.drain()
+                delay = 0.5
+
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        channel = reply[1].decode()[len(self.channel_prefix):]
+                        await self._dispatch(channel, reply[2].decode())
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+                log.warning("Backplane Redis desconectado", error=e, retry_in=round(delay, 1))
+                self.subscriber_writer = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10.0)
+
+
+def create_backplane(url: Optional[str] = None, tick_interval: float = 0.05) -> Backplane:
+    """Cria o backplane a partir de uma URL (memory:// ou redis://host:porta)"""
+    if not url or url.startswith("memory://"):
+        return InMemoryBackplane(tick_interval=tick_interval)
+    if url.startswith("redis://"):
+        return RedisBackplane(url, tick_interval=tick_interval)
+    raise ValueError(f"URL de backplane não suportada: {url}")
+
+
+class LocalPubSubServer:
+    """
+    Servidor RESP mínimo (PING, PUBLISH, SUBSCRIBE, UNSUBSCRIBE) para testes
+
+    Não é um Redis: não guarda dados nem implementa padrões; serve só para
+    rodar várias instâncias do backend localmente sem instalar nada.
+    """
+
+    def __init__(self):
+        self.channels: dict[bytes, set[asyncio.StreamWriter]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 6379):
+        """Começa a aceitar conexões"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def stop(self):
+        """Para de aceitar conexões"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Atende um cliente até a desconexão"""
+        subscribed: set[bytes] = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR invalid command\r\n")
+                    continue
+                name = command[0].upper()
+
+                if name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                elif name == b"PUBLISH" and len(command) == 3:
+                    listeners = self.channels.get(command[1], ())
+                    message = encode_command("message", command[1], command[2])
+                    for listener in list(listeners):
+                        listener.write(message)
+                    writer.write(b":%d\r\n" % len(listeners))
+                elif name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    for channel in command[1:]:
+                        if name == b"SUBSCRIBE":
+                            subscribed.add(channel)
+                            self.channels.setdefault(channel, set()).add(writer)
+                        else:
+                            subscribed.discard(channel)
+                            self.channels.get(channel, set()).discard(writer)
+                        kind = name.lower().decode()
+                        writer.write(b"*3\r\n" + encode_bulk(kind) + encode_bulk(channel)
+                                     + b":%d\r\n" % len(subscribed))
+                else:
+                    writer.write(b"-ERR unsupported command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+
+def main():
+    """Roda o servidor pub/sub local"""
+    parser = argparse.ArgumentParser(description="Servidor pub/sub RESP local para testar o backplane")
+    parser.add_argument("--serve", type=int, default=6379, metavar="PORTA")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    async def serve():
+        server = await LocalPubSubServer().start(args.host, args.serve)
+        print(f"📡 Pub/sub local em redis://{args.host}:{args.serve}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
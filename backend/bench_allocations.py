@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Verificação de alocações do caminho quente de DSP
+
+Roda SimplePitchDetector.detect_pitch_fft (com --decimation, precedido do
+decimador) sobre blocos sintéticos com o
+tracemalloc ligado (o NumPy registra os buffers de arrays no tracemalloc) e
+mede quanta memória é alocada por bloco depois do aquecimento. Em regime
+permanente nenhum array deve ser criado: a janela é cacheada e todos os
+buffers de trabalho são reutilizados. Sai com código 1 se o pico de memória
+crescer mais que o limite durante a medição ou se sobrar memória alocada.
+
+O caminho sem alocações precisa do NumPy 2 (np.fft.rfft com out=). Com o
+NumPy 1.x fixado em requirements.txt a FFT cria um array por bloco: nada
+sobra alocado, mas o pico cresce um espectro, e só o crescimento líquido é
+cobrado. check_allocations() pode ser importada (testes, CI) sem
+sounddevice/PortAudio.
+
+Uso: python bench_allocations.py --frames 2000
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+
+from main_simple import RFFT_SUPPORTS_OUT, SimplePitchDetector
+from synth import VocalSynth
+
+
+def detect(detector: SimplePitchDetector, block: np.ndarray) -> float:
+    """Caminho do callback: decimação (se ligada) e FFT"""
+    if detector.decimator:
+        block = detector.decimator.process(block)
+    return detector.detect_pitch_fft(block)
+
+
+def measure(detector: SimplePitchDetector, blocks: list[np.ndarray]) -> tuple[int, int]:
+    """Retorna (crescimento líquido, crescimento do pico) em bytes ao processar os blocos"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for block in blocks:
+            detect(detector, block)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current - baseline, peak - baseline
+
+
+def check_allocations(frames: int = 2000, block_size: int = 1024, decimation: int = 1,
+                      limit: int = 4096) -> dict:
+    """
+    Mede as alocações do caminho quente em regime permanente
+
+    Retorna os crescimentos líquido e de pico (bytes), se o rfft com out=
+    está disponível e "ok": nada alocado no fim e, com NumPy 2, pico dentro
+    de `limit`.
+    """
+    # Blocos gerados antes da medição, como chegariam do callback de áudio
+    synth = VocalSynth(voices=1, seed=1)
+    audio, _ = synth.render(frames * block_size)
+    blocks = list(audio[0].reshape(frames, block_size))
+
+    detector = SimplePitchDetector(buffer_size=block_size * 4, decimation=decimation)
+    for block in blocks[:10]:
+        detect(detector, block)  # aquecimento: cria janela e buffers
+
+    net, peak = measure(detector, blocks)
+    return {
+        "net": net,
+        "peak": peak,
+        "rfft_out": RFFT_SUPPORTS_OUT,
+        "ok": net <= 0 and (peak <= limit or not RFFT_SUPPORTS_OUT)
+    }
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Alocações por bloco do detector FFT")
+    parser.add_argument("--frames", type=int, default=2000, help="blocos medidos")
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--decimation", type=int, default=1, help="fator de decimação antes da FFT")
+    parser.add_argument("--limit", type=int, default=4096,
+                        help="crescimento máximo do pico em bytes (escalares temporários cabem; "
+                             "um buffer de 1024 amostras em float64 tem 8 KiB)")
+    args = parser.parse_args()
+
+    result = check_allocations(args.frames, args.block_size, args.decimation, args.limit)
+    net, peak = result["net"], result["peak"]
+
+    print(f"🎵 {args.frames} blocos de {args.block_size} amostras, decimação {args.decimation}× "
+          f"(rfft com out=: {'sim' if result['rfft_out'] else 'não, NumPy < 2.0'})")
+    print(f"📦 Crescimento líquido: {net} bytes ({net / args.frames:.2f} por bloco)")
+    print(f"📈 Crescimento do pico: {peak} bytes")
+
+    if not result["ok"]:
+        print(f"❌ Caminho quente alocando memória (limite {args.limit} bytes)")
+        sys.exit(1)
+    if not result["rfft_out"]:
+        print("⚠️  NumPy < 2.0: um espectro temporário por bloco (pico não verificado)")
+    print("✅ Sem alocações de arrays em regime permanente")
+
+
+if __name__ == "__main__":
+    main()
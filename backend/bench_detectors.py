@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Matriz de precisão × custo dos detectores de pitch
+
+Roda cada detector disponível sobre um corpus rotulado, em vários tamanhos
+de buffer:
+
+- aubio-<método>: aubio.pitch com os gates do PitchDetector de main.py
+  (RMS >= 0.005, periodicidade >= 0.5, 80-2000 Hz); "yinfft" é o "default"
+- fft: SimplePitchDetector de main_simple.py
+- browser-acf: porte da autocorrelação do frontend (App.tsx autoCorrelate),
+  vetorizado com NumPy; o µs/frame não é o do JavaScript no navegador
+
+O corpus é gerado (tons puros, voz sintética com harmônicos, voz com
+vibrato, ruído e silêncio, com ruído branco em vários SNRs) ou carregado de
+um .npz com os arrays `audio` (itens × amostras), `f0` (Hz por amostra, 0 =
+sem voz), `kind` e `snr`. O rótulo de cada frame é o f0 no centro do buffer.
+
+Métricas por detector, buffer e SNR: mediana e p95 do erro em cents (frames
+com erro < 100 cents), voz não detectada, erros de oitava, outros erros
+grosseiros, falsos positivos em trechos sem voz e µs/frame.
+
+Uso: python bench_detectors.py --items 200 --sizes 1024,2048,4096
+     python bench_detectors.py --save corpus.npz   (gera e guarda o corpus)
+     python bench_detectors.py --load corpus.npz
+"""
+
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+
+from main_simple import SimplePitchDetector
+
+try:
+    import aubio
+except ImportError:
+    aubio = None
+
+
+SAMPLE_RATE = 44100
+AUBIO_METHODS = ("yinfft", "yin", "yinfast", "specacf")
+VOICED_KINDS = ("tone", "vocal", "vibrato")
+
+
+def generate_corpus(items: int, length: int, snrs: list[float], seed: int = 0) -> dict:
+    """Sinais rotulados: cada tipo com voz × cada SNR, mais ruído e silêncio"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(length) / SAMPLE_RATE
+    audio, f0, kinds, snr_labels = [], [], [], []
+
+    for kind in VOICED_KINDS:
+        for snr in snrs:
+            for _ in range(items):
+                base = np.exp(rng.uniform(np.log(90), np.log(900)))
+                if kind == "vibrato":
+                    # 4.5-6.5 Hz, ±20-80 cents
+                    rate, extent = rng.uniform(4.5, 6.5), rng.uniform(20, 80)
+                    contour = base * 2 ** (extent / 1200 * np.sin(2 * np.pi * rate * t + rng.uniform(0, 2 * np.pi)))
+                else:
+                    contour = np.full(length, base)
+                phase = 2 * np.pi * np.cumsum(contour) / SAMPLE_RATE + rng.uniform(0, 2 * np.pi)
+
+                if kind == "tone":
+                    signal = np.sin(phase)
+                else:
+                    # Harmônicos até 5 kHz com envelope espectral irregular (fundamental às vezes fraca)
+                    harmonics = np.arange(1, int(5000 // base) + 1)
+                    amplitudes = rng.uniform(0.3, 1.0, len(harmonics)) / harmonics ** 0.8
+                    amplitudes[0] *= rng.uniform(0.2, 1.0)
+                    signal = np.sum(amplitudes[:, np.newaxis] * np.sin(np.outer(harmonics, phase)), axis=0)
+
+                signal *= 0.3 / np.sqrt(np.mean(signal ** 2))
+                if np.isfinite(snr):
+                    signal += rng.standard_normal(length) * 0.3 / 10 ** (snr / 20)
+                audio.append(signal)
+                f0.append(contour)
+                kinds.append(kind)
+                snr_labels.append(snr)
+
+    for kind, level in (("noise", 0.1), ("silence", 0.0005)):
+        for _ in range(items):
+            audio.append(rng.standard_normal(length) * level)
+            f0.append(np.zeros(length))
+            kinds.append(kind)
+            snr_labels.append(np.nan)
+
+    return {
+        "audio": np.array(audio, dtype=np.float32),
+        "f0": np.array(f0, dtype=np.float32),
+        "kind": np.array(kinds),
+        "snr": np.array(snr_labels)
+    }
+
+
+def browser_autocorrelate(buffer: np.ndarray, sample_rate: int) -> float:
+    """Porte da autoCorrelate do frontend: ACF normalizada, primeiro mínimo, pico em 80-800 Hz"""
+    size = len(buffer)
+    half = size // 2
+    spectrum = np.fft.rfft(buffer, 2 * size)
+    correlations = np.fft.irfft(spectrum * np.conj(spectrum))[:half] / (size - np.arange(half))
+
+    # Primeiro mínimo local
+    rising = np.flatnonzero(correlations[1:-1] <= correlations[2:])
+    d = int(rising[0]) + 1 if len(rising) else half - 1
+
+    min_period = int(sample_rate / 800)
+    max_period = int(sample_rate / 80)
+    lo, hi = max(d, min_period), min(half, max_period)
+    if lo >= hi:
+        return -1.0
+    position = lo + int(np.argmax(correlations[lo:hi]))
+    if correlations[position] < 0.01:
+        return -1.0
+
+    # Interpolação parabólica
+    period = float(position)
+    if 0 < position < half - 1:
+        x1, x2, x3 = correlations[position - 1:position + 2]
+        a = (x1 - 2 * x2 + x3) / 2
+        b = (x3 - x1) / 2
+        if a != 0:
+            period = position - b / (2 * a)
+    return sample_rate / period
+
+
+def browser_detector(size: int) -> Callable[[np.ndarray], float]:
+    """Pipeline do frontend: gate de RMS, autocorrelação e faixa 80-2000 Hz"""
+    def detect(frame: np.ndarray) -> float:
+        if np.sqrt(np.dot(frame, frame) / len(frame)) <= 0.00001:
+            return 0.0
+        frequency = browser_autocorrelate(frame, SAMPLE_RATE)
+        return frequency if 80 < frequency < 2000 else 0.0
+    return detect
+
+
+def aubio_detector(method: str, size: int) -> Callable[[np.ndarray], float]:
+    """aubio.pitch com hop = buffer (frames independentes) e os gates de main.py"""
+    pitch = aubio.pitch(method, size, size, SAMPLE_RATE)
+    pitch.set_unit("Hz")
+    pitch.set_tolerance(0.8)
+
+    def periodicity(frame: np.ndarray, frequency: float) -> float:
+        # Mesma confiança do PitchDetector.periodicity
+        lag = int(round(SAMPLE_RATE / frequency))
+        if lag >= len(frame) - 1:
+            return 0.0
+        head, tail = frame[:-lag], frame[lag:]
+        energy = np.dot(head, head) * np.dot(tail, tail)
+        return float(max(0.0, np.dot(head, tail) / np.sqrt(energy))) if energy > 0 else 0.0
+
+    def detect(frame: np.ndarray) -> float:
+        if np.sqrt(np.dot(frame, frame) / len(frame)) < 0.005:
+            return 0.0
+        frequency = float(pitch(frame)[0])
+        if not 80 <= frequency <= 2000 or periodicity(frame, frequency) < 0.5:
+            return 0.0
+        return frequency
+    return detect
+
+
+def fft_detector(size: int) -> Callable[[np.ndarray], float]:
+    """SimplePitchDetector (o filtro 80-2000 Hz já está em detect_pitch_fft)"""
+    return SimplePitchDetector(buffer_size=size).detect_pitch_fft
+
+
+def available_detectors() -> dict[str, Callable[[int], Callable[[np.ndarray], float]]]:
+    detectors = {}
+    if aubio is not None:
+        for method in AUBIO_METHODS:
+            detectors[f"aubio-{method}"] = lambda size, method=method: aubio_detector(method, size)
+    detectors["fft"] = fft_detector
+    detectors["browser-acf"] = browser_detector
+    return detectors
+
+
+def evaluate(estimates: np.ndarray, labels: np.ndarray) -> dict:
+    """Métricas de um conjunto de frames (labels 0 = sem voz)"""
+    voiced = labels > 0
+    detected = estimates > 0
+    both = voiced & detected
+
+    errors = 1200 * np.log2(estimates[both] / labels[both])
+    octaves = np.round(errors / 1200)
+    octave = (octaves != 0) & (np.abs(errors - 1200 * octaves) < 100)
+    fine = np.abs(errors) < 100
+
+    fine_errors = np.abs(errors[fine])
+    return {
+        "median": float(np.median(fine_errors)) if fine_errors.size else np.nan,
+        "p95": float(np.percentile(fine_errors, 95)) if fine_errors.size else np.nan,
+        "missed": float(np.mean(~detected[voiced])) if voiced.any() else np.nan,
+        "octave": float(np.sum(octave) / voiced.sum()) if voiced.any() else np.nan,
+        "gross": float(np.sum(~fine & ~octave) / voiced.sum()) if voiced.any() else np.nan,
+        "false_voicing": float(np.mean(detected[~voiced])) if (~voiced).any() else np.nan
+    }
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Precisão × custo dos detectores de pitch num corpus rotulado")
+    parser.add_argument("--items", type=int, default=100, help="sinais por tipo e SNR")
+    parser.add_argument("--sizes", default="1024,2048,4096", help="tamanhos de buffer (separados por vírgula)")
+    parser.add_argument("--snrs", default="inf,30,20,10,0", help="SNRs em dB (inf = sem ruído)")
+    parser.add_argument("--detectors", default="", help="subconjunto de detectores (separados por vírgula)")
+    parser.add_argument("--by-kind", action="store_true", help="uma linha por tipo de sinal além do SNR")
+    parser.add_argument("--load", help="corpus .npz (audio, f0, kind, snr)")
+    parser.add_argument("--save", help="guarda o corpus gerado em .npz")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [int(value) for value in args.sizes.split(",")]
+    if args.load:
+        with np.load(args.load) as data:
+            corpus = {name: data[name] for name in ("audio", "f0", "kind", "snr")}
+    else:
+        snrs = [float(value) for value in args.snrs.split(",")]
+        corpus = generate_corpus(args.items, max(sizes), snrs, args.seed)
+        if args.save:
+            np.savez_compressed(args.save, **corpus)
+            print(f"💾 Corpus salvo em {args.save}")
+
+    detectors = available_detectors()
+    if args.detectors:
+        detectors = {name: detectors[name] for name in args.detectors.split(",") if name in detectors}
+    if aubio is None:
+        print("⚠️  aubio não instalado: detectores aubio-* ignorados")
+
+    audio, f0, kinds, snrs = corpus["audio"], corpus["f0"], corpus["kind"], corpus["snr"]
+    unvoiced = ~np.isin(kinds, VOICED_KINDS)
+    print(f"🎵 {len(audio)} sinais ({int((~unvoiced).sum())} com voz, {int(unvoiced.sum())} sem), "
+          f"{len(detectors)} detectores, buffers {sizes}")
+    print(f"{'detector':<14} {'buffer':>6} {'ms':>5} {'sinal':>8} {'SNR':>5} {'mediana':>8} {'p95':>7} "
+          f"{'perdidos':>9} {'oitava':>7} {'grosso':>7} {'falso+':>7} {'µs/frame':>9}")
+
+    for name, factory in detectors.items():
+        for size in sizes:
+            if size > audio.shape[1]:
+                continue
+            detect = factory(size)
+            frames = np.ascontiguousarray(audio[:, :size])
+            labels = f0[:, size // 2].astype(np.float64)
+
+            estimates = np.empty(len(frames))
+            start = time.perf_counter()
+            for i, frame in enumerate(frames):
+                estimates[i] = detect(frame)
+            microseconds = (time.perf_counter() - start) / len(frames) * 1e6
+            false_voicing = evaluate(estimates[unvoiced], labels[unvoiced])["false_voicing"]
+
+            groups = [("todos", snr, (snrs == snr) & ~unvoiced) for snr in np.unique(snrs[~unvoiced])]
+            if args.by_kind:
+                groups += [(kind, snr, (kinds == kind) & (snrs == snr))
+                           for kind in VOICED_KINDS for snr in np.unique(snrs[~unvoiced])]
+            for kind, snr, mask in groups:
+                if not mask.any():
+                    continue
+                metrics = evaluate(estimates[mask], labels[mask])
+                print(f"{name:<14} {size:>6} {size / SAMPLE_RATE * 1000:>5.1f} {kind:>8} {snr:>5.0f} "
+                      f"{metrics['median']:>8.2f} {metrics['p95']:>7.2f} {metrics['missed']:>9.1%} "
+                      f"{metrics['octave']:>7.1%} {metrics['gross']:>7.1%} {false_voicing:>7.1%} "
+                      f"{microseconds:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
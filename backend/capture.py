@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Daemon de captura - o microfone publicado em memória compartilhada
+
+Só um processo consegue abrir o microfone com sd.InputStream; com vários
+workers do uvicorn (ou um gravador ao lado do servidor) os outros falham.
+Este daemon é o único dono do microfone: cada bloco capturado (e, com
+--detect, o pitch detectado) vai para um anel em
+multiprocessing.shared_memory, e qualquer número de processos se conecta só
+para leitura, com views NumPy direto na memória compartilhada (sem cópia).
+
+Layout (little-endian):
+    cabeçalho (64 bytes)  "PTSM" | versão | slots | block_size | sample_rate
+                          | flags | write_seq (uint64)
+    slots                 seq (uint64) | capture_time (float64) | pitch |
+                          confidence | rms (float32) | áudio float32[block_size]
+
+Cada bloco recebe um número de sequência crescente (1, 2, ...) e vai para o
+slot seq % slots. O escritor zera o seq do slot, escreve os dados e só então
+grava o seq (seqlock): um leitor confere o seq antes e depois de usar o
+slot e descarta o bloco se ele foi sobrescrito no meio. Um leitor atrasado
+percebe o buraco entre a sua posição e write_seq e pula para o bloco mais
+antigo ainda no anel, contando os blocos perdidos.
+
+Uso: python capture.py --name pitch-capture --detect
+     CAPTURE_SHM=pitch-capture uvicorn main:app --workers 4
+"""
+
+import argparse
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+import sounddevice as sd
+
+from clocksync import capture_time
+from logs import log
+
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S4"), ("version", "<u4"), ("slots", "<u4"), ("block_size", "<u4"),
+    ("sample_rate", "<u4"), ("flags", "<u4"), ("write_seq", "<u8")
+])
+HEADER_SIZE = 64
+MAGIC = b"PTSM"
+VERSION = 1
+
+# flags: o daemon também publica o pitch detectado
+FLAG_DETECTION = 1
+
+
+def slot_dtype(block_size: int) -> np.dtype:
+    """Registro de um slot do anel para blocos de block_size amostras"""
+    return np.dtype([
+        ("seq", "<u8"), ("capture_time", "<f8"), ("pitch", "<f4"), ("confidence", "<f4"),
+        ("rms", "<f4"), ("reserved", "<u4"), ("audio", "<f4", (block_size,))
+    ])
+
+
+class RingWriter:
+    """Lado do daemon: cria o segmento e publica os blocos"""
+
+    def __init__(self, name: str, slots: int = 256, block_size: int = 1024, sample_rate: int = 44100,
+                 detection: bool = False):
+        dtype = slot_dtype(block_size)
+        size = HEADER_SIZE + slots * dtype.itemsize
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Segmento de um daemon que morreu sem limpar: substitui
+            log.warning("Memória compartilhada já existia; recriando", name=name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.memory.buf)
+        self.ring = np.ndarray((slots,), dtype=dtype, buffer=self.memory.buf, offset=HEADER_SIZE)
+        self.ring["seq"] = 0
+        self.header["magic"] = MAGIC
+        self.header["version"] = VERSION
+        self.header["slots"] = slots
+        self.header["block_size"] = block_size
+        self.header["sample_rate"] = sample_rate
+        self.header["flags"] = FLAG_DETECTION if detection else 0
+        self.header["write_seq"] = 0
+
+        # Views por campo (criadas uma vez; o callback de áudio só indexa)
+        self.seqs = self.ring["seq"]
+        self.capture_times = self.ring["capture_time"]
+        self.pitches = self.ring["pitch"]
+        self.confidences = self.ring["confidence"]
+        self.rms = self.ring["rms"]
+        self.audio = self.ring["audio"]
+        self.slots = slots
+        self.seq = 0
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def publish(self, audio: np.ndarray, capture_time: float, pitch: float = 0.0,
+                confidence: float = 0.0, rms: float = 0.0) -> int:
+        """Escreve um bloco no próximo slot e devolve o seu número de sequência"""
+        seq = self.seq + 1
+        index = seq % self.slots
+        self.seqs[index] = 0  # escrevendo: leitores descartam o slot
+        self.audio[index] = audio
+        self.capture_times[index] = capture_time
+        self.pitches[index] = pitch
+        self.confidences[index] = confidence
+        self.rms[index] = rms
+        self.seqs[index] = seq
+        self.header["write_seq"] = seq
+        self.seq = seq
+        return seq
+
+    def close(self):
+        """Desfaz as views e remove o segmento"""
+        self.header = self.ring = self.seqs = self.capture_times = None
+        self.pitches = self.confidences = self.rms = self.audio = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class RingReader:
+    """
+    Lado dos processos do backend: anexa ao segmento só para leitura
+
+    poll() devolve os números de sequência novos desde a última chamada
+    (pulando o que já foi sobrescrito, se o leitor ficou para trás) e slot()
+    a view do bloco, sem cópia. A view continua apontando para o anel: quem
+    processa o bloco confere valid(seq) no fim para saber se o escritor não
+    o sobrescreveu enquanto isso.
+    """
+
+    def __init__(self, name: str):
+        self.memory = _attach(name)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.memory.buf)
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            self.memory.close()
+            raise ValueError(f"Segmento {name} não é um anel de captura (versão {VERSION})")
+
+        self.slots = int(header["slots"])
+        self.block_size = int(header["block_size"])
+        self.sample_rate = int(header["sample_rate"])
+        self.has_detection = bool(header["flags"] & FLAG_DETECTION)
+        self.header = header
+        self.ring = np.ndarray((self.slots,), dtype=slot_dtype(self.block_size),
+                               buffer=self.memory.buf, offset=HEADER_SIZE)
+        self.header.flags.writeable = False
+        self.ring.flags.writeable = False
+        self.seqs = self.ring["seq"]
+
+        self.position = int(self.header["write_seq"])  # começa do bloco atual
+        self.lost = 0
+        self.gaps = 0
+
+    @property
+    def latest(self) -> int:
+        """Último bloco publicado pelo daemon"""
+        return int(self.header["write_seq"])
+
+    def poll(self) -> range:
+        """Sequências novas; se o anel deu a volta, pula para a mais antiga disponível"""
+        latest = self.latest
+        oldest = latest - self.slots + 2  # margem de um slot para o que está sendo escrito
+        if self.position + 1 < oldest:
+            self.lost += oldest - self.position - 1
+            self.gaps += 1
+            self.position = oldest - 1
+        new = range(self.position + 1, latest + 1)
+        self.position = latest
+        return new
+
+    def slot(self, seq: int) -> Optional[np.void]:
+        """View do bloco `seq`, ou None se ele já foi sobrescrito"""
+        index = seq % self.slots
+        if self.seqs[index] != seq:
+            self.lost += 1
+            return None
+        return self.ring[index]
+
+    def valid(self, seq: int) -> bool:
+        """O slot ainda contém o bloco `seq` (conferir depois de usar a view)"""
+        return self.seqs[seq % self.slots] == seq
+
+    def stats(self) -> dict:
+        """Posição, atraso e perdas deste leitor"""
+        return {
+            "name": self.memory.name,
+            "position": self.position,
+            "latest": self.latest,
+            "lag": self.latest - self.position,
+            "lost": self.lost,
+            "gaps": self.gaps
+        }
+
+    def close(self):
+        """Solta as views e desanexa (o segmento continua com o daemon)"""
+        self.header = self.ring = self.seqs = None
+        self.memory.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Anexa a um segmento existente sem que este processo o remova ao sair"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        # Antes do 3.13 o resource_tracker removeria o segmento do daemon na saída do leitor
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+def main():
+    """Roda o daemon: captura do microfone para o anel até Ctrl+C"""
+    parser = argparse.ArgumentParser(description="Daemon de captura em memória compartilhada")
+    parser.add_argument("--name", default="pitch-capture", help="nome do segmento de memória compartilhada")
+    parser.add_argument("--slots", type=int, default=256, help="blocos guardados no anel")
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--device", default=None, help="dispositivo de entrada do sounddevice")
+    parser.add_argument("--detect", action="store_true", help="detectar pitch no daemon (Aubio)")
+    args = parser.parse_args()
+
+    detector = None
+    if args.detect:
+        from main import PitchDetector  # só o daemon com --detect precisa do Aubio
+        detector = PitchDetector(sample_rate=args.sample_rate, buffer_size=args.block_size * 4)
+
+    writer = RingWriter(args.name, args.slots, args.block_size, args.sample_rate, detection=bool(detector))
+
+    def audio_callback(indata, frames, time_info, status):
+        if status:
+            log.warning("Áudio status", status=status)
+        audio = indata[:, 0]
+        captured_at = capture_time(time_info, frames, args.sample_rate)
+        if detector:
+            detector.current_capture_time = captured_at
+            detector.process(audio)
+            writer.publish(audio, captured_at, detector.current_pitch,
+                           detector.current_confidence, detector.current_rms)
+        else:
+            writer.publish(audio, captured_at, rms=float(np.sqrt(np.dot(audio, audio) / len(audio))))
+
+    stream = sd.InputStream(callback=audio_callback, channels=1, samplerate=args.sample_rate,
+                            blocksize=args.block_size, dtype=np.float32, device=args.device)
+    print(f"🎙️  Captura em memória compartilhada: {writer.name} "
+          f"({args.slots} × {args.block_size} amostras a {args.sample_rate} Hz"
+          f"{', com detecção' if detector else ''})")
+    print(f"   Backends: CAPTURE_SHM={writer.name} uvicorn main:app --workers N")
+
+    stream.start()
+    try:
+        while True:
+            time.sleep(5)
+            log.info("Captura", blocks=writer.seq)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.stop()
+        stream.close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
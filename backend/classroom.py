@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Modo sala de aula - agregação de vários alunos num único stream do professor
+
+Os alunos publicam seus frames de pitch no backplane (canal "room:<sala>").
+A instância que tem professores conectados assina o canal e mantém o estado
+da sala em arrays NumPy (um slot por aluno). A cada tick monta um único frame
+binário com todos os alunos - pitch, cents em relação ao alvo e flag de
+afinado - e envia os mesmos bytes para todos os professores da sala: o custo
+de montagem não depende de quantos professores estão assistindo.
+
+Frame binário (little-endian):
+    cabeçalho  "PTCL" | tick (uint32) | alunos (uint16)
+    registros  pitch (float32) | cents (float32) | in_tune (uint8), um por aluno
+
+A ordem dos registros é a do roster, enviado em JSON ({"type":
+"classroom_roster"}) sempre que um aluno entra ou sai da sala.
+"""
+
+import asyncio
+import json
+import math
+import struct
+import time
+from typing import Optional
+
+import numpy as np
+from fastapi import WebSocket
+
+from backplane import Backplane
+
+
+FRAME_HEADER = struct.Struct("<4sIH")
+FRAME_MAGIC = b"PTCL"
+
+# Registro empacotado de um aluno (9 bytes)
+STUDENT_RECORD = np.dtype([("pitch", "<f4"), ("cents", "<f4"), ("in_tune", "u1")])
+
+
+def finite_hz(value) -> float:
+    """Frequência de um frame de aluno como float finito e positivo (0.0 se inválida)"""
+    try:
+        value = float(value or 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+    return value if math.isfinite(value) and value > 0 else 0.0
+
+
+class Classroom:
+    """Estado de uma sala: último pitch e alvo de cada aluno, em arrays"""
+
+    def __init__(self, name: str, in_tune_cents: float = 10.0, stale_after: float = 1.0,
+                 forget_after: float = 30.0, capacity: int = 32):
+        self.name = name
+        self.in_tune_cents = in_tune_cents
+        self.stale_after = stale_after
+        self.forget_after = forget_after
+        self.target = 0.0  # alvo da sala (Hz); 0 = semitom mais próximo
+
+        self.slots: dict[str, int] = {}
+        self.roster: list[str] = []
+        self.roster_version = 0
+        self.tick = 0
+
+        self.pitch = np.zeros(capacity, dtype=np.float32)
+        self.student_target = np.zeros(capacity, dtype=np.float32)
+        self.updated = np.zeros(capacity)
+        self.records = np.zeros(capacity, dtype=STUDENT_RECORD)
+
+    def _slot(self, session_id: str) -> int:
+        """Slot do aluno, criando (e crescendo os arrays) se ele é novo"""
+        slot = self.slots.get(session_id)
+        if slot is None:
+            slot = len(self.roster)
+            if slot == len(self.pitch):
+                size = 2 * len(self.pitch)
+                self.pitch = np.resize(self.pitch, size)
+                self.student_target = np.resize(self.student_target, size)
+                self.updated = np.resize(self.updated, size)
+                self.records = np.resize(self.records, size)
+            self.slots[session_id] = slot
+            self.roster.append(session_id)
+            self.roster_version += 1
+        return slot
+
+    def update(self, frames: list[dict]):
+        """Aplica um lote de frames de alunos vindo do backplane"""
+        now = time.time()
+        for frame in frames:
+            session_id = frame.get("session_id")
+            if not session_id or not isinstance(session_id, str):
+                continue
+            slot = self._slot(session_id)
+            # Um frame malformado não pode interromper o lote da sala inteira
+            self.pitch[slot] = finite_hz(frame.get("pitch"))
+            self.student_target[slot] = finite_hz(frame.get("target"))
+            self.updated[slot] = now
+
+    def forget_inactive(self, now: float):
+        """Remove do roster alunos sem frames há mais de forget_after segundos"""
+        count = len(self.roster)
+        keep = np.flatnonzero(now - self.updated[:count] <= self.forget_after)
+        if len(keep) == count:
+            return
+
+        # Compactar os arrays mantendo a ordem dos que ficaram
+        for array in (self.pitch, self.student_target, self.updated):
+            array[:len(keep)] = array[keep]
+        self.roster = [self.roster[index] for index in keep]
+        self.slots = {session_id: slot for slot, session_id in enumerate(self.roster)}
+        self.roster_version += 1
+
+    def build_frame(self, now: Optional[float] = None) -> bytes:
+        """Monta o frame binário da sala (vetorizado sobre todos os alunos)"""
+        now = time.time() if now is None else now
+        self.forget_inactive(now)
+        count = len(self.roster)
+        self.tick += 1
+
+        pitch = self.pitch[:count]
+        active = (now - self.updated[:count] <= self.stale_after) & (pitch > 0)
+        safe_pitch = np.where(active, pitch, np.float32(440.0))
+
+        # Alvo do aluno, senão o da sala; sem alvo, desvio do semitom mais próximo
+        target = np.where(self.student_target[:count] > 0, self.student_target[:count], np.float32(self.target))
+        semitones = 12 * np.log2(safe_pitch / np.float32(440.0))
+        cents = np.where(target > 0,
+                         1200 * np.log2(safe_pitch / np.where(target > 0, target, np.float32(1.0))),
+                         (semitones - np.round(semitones)) * 100)
+
+        records = self.records[:count]
+        records["pitch"] = np.where(active, pitch, 0)
+        records["cents"] = np.where(active, cents, 0)
+        records["in_tune"] = active & (np.abs(cents) <= self.in_tune_cents)
+
+        return FRAME_HEADER.pack(FRAME_MAGIC, self.tick & 0xFFFFFFFF, count) + records.tobytes()
+
+    def roster_message(self) -> str:
+        """Mensagem JSON com a ordem dos alunos nos frames binários"""
+        return json.dumps({
+            "type": "classroom_roster",
+            "room": self.name,
+            "students": self.roster,
+            "target": self.target,
+            "in_tune_cents": self.in_tune_cents
+        })
+
+
+class TeacherStream:
+    """Envio para um professor: só o frame mais recente fica à espera"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.frame: Optional[bytes] = None
+        self.roster: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, frame: bytes, roster: Optional[str] = None):
+        """Entrega o frame do tick; um frame ainda não enviado é substituído"""
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        if roster is not None:
+            self.roster = roster
+        self.ready.set()
+
+    async def run(self):
+        """Envia roster (quando mudou) e frame; um professor lento só perde frames"""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            roster, self.roster = self.roster, None
+            frame, self.frame = self.frame, None
+            if roster is not None:
+                await self.websocket.send_text(roster)
+            if frame is not None:
+                await self.websocket.send_bytes(frame)
+
+
+class ClassroomHub:
+    """Salas com professores conectados nesta instância e seus loops de envio"""
+
+    def __init__(self, backplane: Backplane, tick_interval: float = 0.05):
+        self.backplane = backplane
+        self.tick_interval = tick_interval
+        self.rooms: dict[str, Classroom] = {}
+        self.teachers: dict[str, list[TeacherStream]] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.listeners: dict[str, object] = {}
+        self.frames_built = 0
+
+    @staticmethod
+    def channel(room: str) -> str:
+        """Canal do backplane onde os alunos da sala publicam"""
+        return f"room:{room}"
+
+    async def join_teacher(self, room: str, websocket: WebSocket) -> Classroom:
+        """Adiciona um professor; o primeiro da sala assina o canal e inicia o loop"""
+        classroom = self.rooms.get(room)
+        if classroom is None:
+            classroom = self.rooms[room] = Classroom(room)
+            self.teachers[room] = []
+
+            async def on_frames(frames: list[dict]):
+                classroom.update(frames)
+
+            self.listeners[room] = on_frames
+            await self.backplane.subscribe(self.channel(room), on_frames)
+            self.tasks[room] = asyncio.create_task(self._run(classroom))
+
+        stream = TeacherStream(websocket)
+        stream.roster = classroom.roster_message()
+        stream.task = asyncio.create_task(stream.run())
+        self.teachers[room].append(stream)
+        return classroom
+
+    async def leave_teacher(self, room: str, websocket: WebSocket):
+        """Remove um professor; o último fecha a sala nesta instância"""
+        teachers = self.teachers.get(room)
+        if teachers is None:
+            return
+        for stream in [stream for stream in teachers if stream.websocket is websocket]:
+            stream.task.cancel()
+            teachers.remove(stream)
+        if teachers:
+            return
+
+        del self.rooms[room]
+        del self.teachers[room]
+        self.tasks.pop(room).cancel()
+        await self.backplane.unsubscribe(self.channel(room), self.listeners.pop(room))
+
+    async def _run(self, classroom: Classroom):
+        """Loop da sala: um frame por tick, os mesmos bytes para todos os professores"""
+        roster_version = classroom.roster_version
+        while True:
+            started = time.monotonic()
+            frame = classroom.build_frame()
+            self.frames_built += 1
+
+            roster = None
+            if classroom.roster_version != roster_version:
+                roster_version = classroom.roster_version
+                roster = classroom.roster_message()
+
+            for stream in self.teachers.get(classroom.name, ()):
+                stream.offer(frame, roster)
+
+            await asyncio.sleep(max(0.0, self.tick_interval - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        """Resumo das salas para endpoints de status"""
+        return {
+            "frames_built": self.frames_built,
+            "rooms": {
+                name: {
+                    "students": len(classroom.roster),
+                    "teachers": len(self.teachers[name]),
+                    "dropped_frames": sum(stream.dropped for stream in self.teachers[name])
+                }
+                for name, classroom in self.rooms.items()
+            }
+        }
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Sincronização de relógio cliente/servidor e latência por estágio
+
+Troca no estilo NTP sobre o próprio WebSocket:
+
+    cliente  {"type": "ping", "t0": <envio, relógio do cliente>,
+              "prev_t0": <t0 do pong anterior>, "prev_t3": <chegada desse pong>}
+    servidor {"type": "pong", "t0": ..., "t1": <chegada do ping>, "t2": <envio do pong>,
+              "offset_ms": ..., "rtt_ms": ...}
+
+Com t3 (chegada do pong no cliente) o offset é ((t1 - t0) + (t2 - t3)) / 2 e
+o RTT é (t3 - t0) - (t2 - t1). O cliente calcula os dois na hora; o servidor
+recebe t3 no ping seguinte e mantém a própria estimativa, escolhendo entre as
+últimas amostras a de menor RTT (a menos afetada por filas na rede).
+
+Com o offset, tempos do cliente viram tempos do servidor e cada estágio do
+pipeline (captura → servidor → tela) ganha uma amostra de latência; o
+servidor reporta percentis por cliente.
+"""
+
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+
+def capture_time(time_info, frames: int, sample_rate: int) -> float:
+    """
+    Horário (relógio de time.time()) do primeiro sample de um bloco de entrada
+
+    Usa os tempos do PortAudio no callback do sounddevice: a diferença entre
+    currentTime e inputBufferAdcTime é há quanto tempo o bloco foi digitalizado.
+    Sem esses tempos (alguns host APIs reportam 0), estima pela duração do bloco.
+    """
+    now = time.time()
+    adc_time = getattr(time_info, "inputBufferAdcTime", 0.0) or 0.0
+    current_time = getattr(time_info, "currentTime", 0.0) or 0.0
+    if adc_time > 0 and current_time > 0 and 0.0 <= current_time - adc_time < 1.0:
+        return now - (current_time - adc_time)
+    return now - frames / sample_rate
+
+
+class ClockSync:
+    """Estimativa de offset/RTT de um cliente e amostras de latência por estágio"""
+
+    def __init__(self, samples: int = 8, window: int = 512):
+        self.samples: deque[tuple[float, float]] = deque(maxlen=samples)  # (rtt, offset)
+        self.pending: dict[float, tuple[float, float]] = {}  # t0 -> (t1, t2)
+        self.window = window
+        self.stages: dict[str, deque[float]] = {}
+        self.offset: Optional[float] = None  # relógio do servidor - relógio do cliente
+        self.rtt: Optional[float] = None
+
+    def pong(self, command: dict, received_at: float) -> dict:
+        """Resposta a um ping (received_at = time.time() na chegada)"""
+        prev_t0, prev_t3 = command.get("prev_t0"), command.get("prev_t3")
+        if prev_t0 is not None and prev_t3 is not None:
+            self.complete(float(prev_t0), float(prev_t3))
+
+        response = {"type": "pong"}
+        t0 = command.get("t0")
+        if t0 is not None:
+            t0 = float(t0)
+            response["t0"] = t0
+            response["t1"] = received_at
+            response["t2"] = time.time()
+            self.pending[t0] = (received_at, response["t2"])
+            while len(self.pending) > 4:
+                self.pending.pop(next(iter(self.pending)))
+        if self.offset is not None:
+            response["offset_ms"] = round(self.offset * 1000, 2)
+            response["rtt_ms"] = round(self.rtt * 1000, 2)
+        return response
+
+    def complete(self, t0: float, t3: float):
+        """Fecha uma troca com t3 informado pelo cliente"""
+        times = self.pending.pop(t0, None)
+        if times is None:
+            return
+        t1, t2 = times
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0:
+            return
+        self.samples.append((rtt, ((t1 - t0) + (t2 - t3)) / 2))
+        self.rtt, self.offset = min(self.samples)
+        self.record("rtt", rtt)
+
+    def to_server_time(self, client_time: float) -> Optional[float]:
+        """Converte um horário do cliente para o relógio do servidor"""
+        if self.offset is None:
+            return None
+        return client_time + self.offset
+
+    def record(self, stage: str, seconds: float):
+        """Amostra de latência de um estágio do pipeline"""
+        samples = self.stages.get(stage)
+        if samples is None:
+            samples = self.stages[stage] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def record_display(self, command: dict):
+        """Relato do cliente: frame capturado em capture_time (servidor) exibido em displayed_at (cliente)"""
+        displayed_at = self.to_server_time(float(command["displayed_at"]))
+        if displayed_at is not None:
+            self.record("capture_to_display", displayed_at - float(command["capture_time"]))
+
+    def stats(self) -> dict:
+        """Offset, RTT e percentis (ms) de cada estágio"""
+        stages = {}
+        for stage, samples in self.stages.items():
+            p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 95, 99]) * 1000
+            stages[stage] = {"count": len(samples), "p50_ms": round(p50, 2),
+                             "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+        return {
+            "offset_ms": None if self.offset is None else round(self.offset * 1000, 2),
+            "rtt_ms": None if self.rtt is None else round(self.rtt * 1000, 2),
+            "stages": stages
+        }
+
+
+class LatencyRegistry:
+    """ClockSync de cada cliente conectado, para o endpoint de status"""
+
+    def __init__(self):
+        self.clients: dict[str, ClockSync] = {}
+        self.sessions: dict[str, str] = {}  # conexão -> sessão (várias conexões podem usar o mesmo id)
+        self.connections = 0
+
+    def register(self, client_id: Optional[str] = None,
+                 session_id: Optional[str] = None) -> tuple[str, ClockSync]:
+        """Cria o estado de um cliente (id sequencial se não informado)"""
+        self.connections += 1
+        client_id = client_id or f"client-{self.connections}"
+        clock = self.clients[client_id] = ClockSync()
+        if session_id:
+            self.sessions[client_id] = session_id
+        return client_id, clock
+
+    def remove(self, client_id: str):
+        self.clients.pop(client_id, None)
+        self.sessions.pop(client_id, None)
+
+    def stats(self) -> dict:
+        result = {}
+        for client_id, clock in self.clients.items():
+            result[client_id] = clock.stats()
+            if client_id in self.sessions:
+                result[client_id]["session_id"] = self.sessions[client_id]
+        return result
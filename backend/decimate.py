@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Decimação com anti-aliasing em streaming (ex.: 44.1 kHz -> 11.025 kHz)
+
+A faixa aceita de pitch vai até 2 kHz, então a detecção não precisa de
+44.1 kHz: com um fator 4 a mesma janela de tempo tem 4× menos amostras e a
+FFT/autocorrelação custa proporcionalmente menos.
+
+O filtro é um FIR passa-baixas (sinc com janela de Kaiser) com corte na
+Nyquist da taxa de saída, em forma polifásica: o filtro é separado em
+`factor` fases e só as amostras que sobrevivem à decimação são calculadas
+(taps multiplicações por amostra de saída, nenhuma descartada). Os produtos
+de todas as fases com a entrada saem de um único matmul e cada saída é a
+soma de uma diagonal desse resultado. O histórico de taps-1 amostras e a
+fase da decimação são mantidos entre blocos, então blocos de qualquer
+tamanho produzem a mesma saída que o sinal inteiro.
+"""
+
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def lowpass_filter(factor: int, taps_per_phase: int = 24, beta: float = 8.0) -> np.ndarray:
+    """FIR passa-baixas para decimar por `factor` (corte na Nyquist da saída, ganho 1)"""
+    taps = taps_per_phase * factor + 1
+    n = np.arange(taps) - (taps - 1) / 2
+    cutoff = 0.5 / factor  # ciclos por amostra da entrada
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, beta)
+    return kernel / kernel.sum()
+
+
+class Decimator:
+    """Decimador FIR polifásico com estado entre blocos"""
+
+    def __init__(self, factor: int = 4, taps_per_phase: int = 24):
+        if factor < 1:
+            raise ValueError(f"Fator de decimação inválido: {factor}")
+        self.factor = factor
+        self.kernel = lowpass_filter(factor, taps_per_phase)
+
+        # Filtro invertido (correlação = convolução) com zeros à esquerda até
+        # um múltiplo do fator, separado em fases: linha r = taps r*M .. r*M+M-1
+        phases = -(-len(self.kernel) // factor)
+        padded = np.zeros(phases * factor)
+        padded[len(padded) - len(self.kernel):] = self.kernel[::-1]
+        self.phases = padded.reshape(phases, factor)
+
+        self.history = np.zeros(len(padded) - 1)
+        self.offset = 0  # primeira janela do próximo bloco que gera saída
+
+        # Buffers reutilizados por tamanho de bloco (entrada com histórico, saída)
+        # e as views/produtos parciais por (tamanho, fase), criados uma vez
+        self._scratch: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self._plans: dict[tuple[int, int], tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @property
+    def delay(self) -> float:
+        """Atraso de grupo do filtro, em amostras da entrada"""
+        return (len(self.kernel) - 1) / 2
+
+    def reset(self):
+        """Zera o estado (início de um sinal novo)"""
+        self.history[:] = 0
+        self.offset = 0
+
+    def _buffers(self, size: int) -> tuple[np.ndarray, np.ndarray]:
+        buffers = self._scratch.get(size)
+        if buffers is None:
+            buffers = self._scratch[size] = (
+                np.zeros(len(self.history) + size),
+                np.zeros(size // self.factor + 1)
+            )
+        return buffers
+
+    def _plan(self, buffer: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Views para o bloco atual (sem cópia, criadas uma vez por tamanho e fase)
+
+        rows: a entrada a partir de offset em linhas de `factor` amostras.
+        partial[r, j] = fase r do filtro · linha j (um único matmul).
+        diagonals: saída m = soma de partial[r, m + r] sobre r.
+        """
+        key = (size, self.offset)
+        plan = self._plans.get(key)
+        if plan is None:
+            count = max(0, (size - self.offset + self.factor - 1) // self.factor)
+            phases = len(self.phases)
+            rows = buffer[self.offset:self.offset + (count + phases - 1) * self.factor]
+            rows = rows.reshape(count + phases - 1, self.factor)
+            partial = np.zeros((phases, len(rows)))
+            diagonals = as_strided(partial, shape=(phases, count),
+                                   strides=(partial.strides[0] + partial.strides[1], partial.strides[1]),
+                                   writeable=False)
+            plan = self._plans[key] = (rows, partial, diagonals)
+        return plan
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Decima um bloco
+
+        Retorna uma view de um buffer interno (válida até a próxima chamada)
+        com floor/ceil(len(block) / factor) amostras, conforme a fase.
+        """
+        size = len(block)
+        buffer, output = self._buffers(size)
+        keep = len(self.history)
+        buffer[:keep] = self.history
+        np.copyto(buffer[keep:], block)
+
+        # Cada saída usa só as amostras que sobrevivem: taps/M produtos por fase
+        rows, partial, diagonals = self._plan(buffer, size)
+        count = diagonals.shape[1]
+        result = output[:count]
+        np.matmul(self.phases, rows.T, out=partial)
+        np.add.reduce(diagonals, axis=0, out=result)
+
+        self.offset = self.offset + count * self.factor - size
+        self.history[:] = buffer[size:]
+        return result
+
+
+def create_decimator(factor: Optional[int], block_size: Optional[int] = None) -> Optional[Decimator]:
+    """
+    Decimador para o fator configurado, ou None se não há decimação
+
+    Os detectores esperam blocos decimados de tamanho fixo: o fator precisa
+    ser potência de dois (o Aubio só cria o detector com janelas assim) e
+    dividir `block_size`, senão os blocos saem com tamanhos alternados.
+    """
+    factor = int(factor or 1)
+    if factor <= 1:
+        return None
+    if factor & (factor - 1):
+        raise ValueError(f"Fator de decimação {factor} inválido: use uma potência de dois (2, 4, 8...)")
+    if block_size is not None and block_size % factor:
+        raise ValueError(f"Fator de decimação {factor} não divide o bloco de {block_size} amostras")
+    return Decimator(factor)
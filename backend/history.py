@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Histórico de pitch em múltiplas resoluções (level of detail)
+
+Cada sessão guarda os frames recentes em ring buffers float32 (tempo relativo
+ao primeiro frame e pitch) e, por cima deles, uma pirâmide de agregados
+mín/máx/média: no nível k cada bucket resume factor**k frames. A pirâmide é
+atualizada incrementalmente - um bucket do nível k só é fechado quando
+`factor` buckets do nível k-1 ficam completos - então o custo amortizado por
+frame é O(1).
+
+Os níveis grossos usam rings menores, mas cobrem um período bem maior que o
+nível 0: quando os frames antigos saem do ring fino, o trecho continua
+disponível numa resolução menor.
+
+query() escolhe o nível mais fino que devolve no máximo `points` buckets no
+intervalo pedido e lê só esses buckets: o custo é proporcional à resposta,
+não à duração da sessão.
+"""
+
+import bisect
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class _Accumulator:
+    """Bucket em formação de um nível da pirâmide"""
+
+    __slots__ = ("start", "minimum", "maximum", "total", "voiced", "count")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.total = 0.0
+        self.voiced = 0
+        self.count = 0
+
+    def add(self, start: float, minimum: float, maximum: float, total: float, voiced: int):
+        """Soma um frame (ou um bucket completo do nível de baixo)"""
+        if not self.count:
+            self.start = start
+        self.count += 1
+        if voiced:
+            self.minimum = min(self.minimum, minimum)
+            self.maximum = max(self.maximum, maximum)
+            self.total += total
+            self.voiced += voiced
+
+
+class _Level:
+    """Ring buffer de buckets fechados de um nível"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.time = np.zeros(capacity, dtype=np.float32)
+        self.minimum = np.zeros(capacity, dtype=np.float32)
+        self.maximum = np.zeros(capacity, dtype=np.float32)
+        self.mean = np.zeros(capacity, dtype=np.float32)
+        self.total = 0  # buckets já escritos (índice lógico do próximo)
+
+    @property
+    def first(self) -> int:
+        """Índice lógico do bucket mais antigo ainda no ring"""
+        return max(0, self.total - self.capacity)
+
+    def append(self, accumulator: _Accumulator):
+        slot = self.total % self.capacity
+        self.time[slot] = accumulator.start
+        if accumulator.voiced:
+            self.minimum[slot] = accumulator.minimum
+            self.maximum[slot] = accumulator.maximum
+            self.mean[slot] = accumulator.total / accumulator.voiced
+        else:
+            self.minimum[slot] = self.maximum[slot] = self.mean[slot] = np.nan
+        self.total += 1
+
+    def search(self, offset: float) -> int:
+        """Primeiro bucket retido com início >= offset (busca binária no ring)"""
+        return bisect.bisect_left(range(self.first, self.total), offset,
+                                  key=lambda index: self.time[index % self.capacity]) + self.first
+
+    def read(self, start: int, stop: int) -> tuple[np.ndarray, ...]:
+        """Cópias das colunas dos buckets [start, stop), desfazendo a volta do ring"""
+        slots = np.arange(start, stop) % self.capacity
+        return self.time[slots], self.minimum[slots], self.maximum[slots], self.mean[slots]
+
+
+class PitchHistory:
+    """Histórico limitado de uma sessão com pirâmide mín/máx/média"""
+
+    def __init__(self, capacity: int = 32768, factor: int = 4, min_level_capacity: int = 1024):
+        self.factor = factor
+        self.origin: Optional[float] = None
+        self.frames = 0
+
+        # Nível 0: frames crus (sem voz = 0)
+        self.time = np.zeros(capacity, dtype=np.float32)
+        self.pitch = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+
+        # Níveis 1..n: até um bucket cobrir o ring fino inteiro
+        self.levels: list[_Level] = []
+        size = factor
+        while size <= capacity:
+            self.levels.append(_Level(max(capacity // size, min_level_capacity)))
+            size *= factor
+        self.accumulators = [_Accumulator() for _ in self.levels]
+
+    def add(self, timestamp: float, pitch: float):
+        """Acrescenta um frame (pitch <= 0 = sem voz); O(1) amortizado"""
+        if self.origin is None:
+            self.origin = timestamp
+        offset = np.float32(timestamp - self.origin)
+        voiced = pitch > 0
+
+        slot = self.frames % self.capacity
+        self.time[slot] = offset
+        self.pitch[slot] = pitch if voiced else 0.0
+        self.frames += 1
+
+        # Sobe na pirâmide só enquanto buckets fecham
+        source = (float(offset), pitch, pitch, pitch, int(voiced))
+        for level, accumulator in zip(self.levels, self.accumulators):
+            accumulator.add(*source)
+            if accumulator.count < self.factor:
+                break
+            level.append(accumulator)
+            source = (accumulator.start, accumulator.minimum, accumulator.maximum,
+                      accumulator.total, accumulator.voiced)
+            accumulator.reset()
+
+    def _partial(self, level: int) -> Optional[tuple[float, float, float, float]]:
+        """Bucket ainda aberto do nível: combina os acumuladores dos níveis 1..level"""
+        start, minimum, maximum, total, voiced, count = None, np.inf, -np.inf, 0.0, 0, 0
+        for accumulator in self.accumulators[:level]:
+            if not accumulator.count:
+                continue
+            start = accumulator.start if start is None else min(start, accumulator.start)
+            count += accumulator.count
+            if accumulator.voiced:
+                minimum = min(minimum, accumulator.minimum)
+                maximum = max(maximum, accumulator.maximum)
+                total += accumulator.total
+                voiced += accumulator.voiced
+        if not count:
+            return None
+        if not voiced:
+            return start, np.nan, np.nan, np.nan
+        return start, minimum, maximum, total / voiced
+
+    def _level0_search(self, offset: float) -> int:
+        first = max(0, self.frames - self.capacity)
+        return bisect.bisect_left(range(first, self.frames), offset,
+                                  key=lambda index: self.time[index % self.capacity]) + first
+
+    def query(self, start: Optional[float] = None, stop: Optional[float] = None, points: int = 500) -> dict:
+        """
+        Amostras entre os timestamps `start` e `stop` (absolutos), no máximo `points`
+
+        Retorna o nível usado, quantos frames cada bucket resume e colunas
+        t/min/max/mean (sem voz = None). No nível 0 min = max = mean = pitch.
+        """
+        points = max(1, int(points))
+        empty = {"level": 0, "bucket_frames": 1, "t": [], "min": [], "max": [], "mean": []}
+        if self.origin is None:
+            return empty
+        low = -np.inf if start is None else start - self.origin
+        high = np.inf if stop is None else stop - self.origin
+
+        # Nível 0, se ele ainda tem o começo do intervalo e cabe em `points`
+        first = max(0, self.frames - self.capacity)
+        lo, hi = self._level0_search(low), self._level0_search(np.nextafter(high, np.inf))
+        retained = first == 0 or self.time[first % self.capacity] <= low
+        if hi - lo <= points and (retained or not self.levels):
+            slots = np.arange(lo, hi) % self.capacity
+            pitch = np.where(self.pitch[slots] > 0, self.pitch[slots], np.nan)
+            return self._result(0, self.time[slots], pitch, pitch, pitch)
+
+        for number, level in enumerate(self.levels, start=1):
+            lo = level.search(low)
+            hi = level.search(np.nextafter(high, np.inf))
+            # Bucket que começa antes de `low` mas cobre parte do intervalo
+            if lo > level.first and lo > 0:
+                lo -= 1
+            partial = self._partial(number) if hi == level.total else None
+            if partial is not None and partial[0] > high:
+                partial = None
+            count = hi - lo + (partial is not None)
+
+            retained = level.first == 0 or level.time[level.first % level.capacity] <= low
+            coarsest = number == len(self.levels)
+            if (count <= points and retained) or coarsest:
+                # Nível mais grosso e ainda demais: ficam os buckets mais recentes
+                lo = max(lo, hi - points + (partial is not None))
+                columns = level.read(lo, hi)
+                if partial is not None:
+                    columns = tuple(np.append(column, np.float32(value))
+                                    for column, value in zip(columns, partial))
+                return self._result(number, *columns)
+
+        return empty
+
+    def _result(self, level: int, time: np.ndarray, minimum: np.ndarray, maximum: np.ndarray,
+                mean: np.ndarray) -> dict:
+        def values(column: np.ndarray) -> list:
+            rounded = np.round(column.astype(np.float64), 2)
+            return [None if value != value else value for value in rounded.tolist()]
+
+        return {
+            "level": level,
+            "bucket_frames": self.factor ** level,
+            "t": np.round(time.astype(np.float64) + self.origin, 3).tolist(),
+            "min": values(minimum),
+            "max": values(maximum),
+            "mean": values(mean)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "retained_frames": min(self.frames, self.capacity),
+            "levels": len(self.levels) + 1
+        }
+
+
+class HistoryStore:
+    """Históricos das sessões recentes (LRU: as menos ativas saem primeiro)"""
+
+    def __init__(self, max_sessions: int = 256, capacity: int = 32768):
+        self.max_sessions = max_sessions
+        self.capacity = capacity
+        self.sessions: OrderedDict[str, PitchHistory] = OrderedDict()
+
+    def add(self, session_id: str, timestamp: float, pitch: float):
+        """Acrescenta um frame ao histórico da sessão"""
+        history = self.sessions.get(session_id)
+        if history is None:
+            history = self.sessions[session_id] = PitchHistory(self.capacity)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        history.add(timestamp, pitch)
+
+    def get(self, session_id: str) -> Optional[PitchHistory]:
+        return self.sessions.get(session_id)
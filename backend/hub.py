@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Hub pub/sub em processo - Uma captura alimenta vários inscritos
+
+Cada fonte de pitch (microfone, canal de uma interface multicanal, ...) é um
+tópico. Os inscritos de um tópico compartilham uma única leitura da fonte por
+tick, mas cada inscrição tem sua própria taxa, formato, filtro de campos e
+modo send-on-change. A fonte é ligada no primeiro inscrito e desligada só
+depois de um período de carência sem inscritos, para que tempestades de
+reconexão não fiquem abrindo e fechando o dispositivo de áudio.
+"""
+
+import asyncio
+import json
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from logs import log
+
+
+# Ordem dos campos no formato "compact" (array JSON em vez de objeto)
+COMPACT_FIELDS = ["timestamp", "pitch", "confidence", "note", "octave", "cents", "frequency", "capture_time"]
+
+# Campos comparados pelo send-on-change (pitch/confiança variam sempre um pouco)
+CHANGE_FIELDS = ("note", "octave", "cents", "voices")
+
+
+class FrameSuppressor:
+    """Send-on-change: suprime frames iguais ao anterior, com keepalive periódico"""
+
+    def __init__(self, keepalive_interval: float = 1.0):
+        self.keepalive_interval = keepalive_interval
+        self.last_key = None
+        self.last_sent = 0.0
+        self.suppressed = 0
+
+    def should_send(self, key) -> bool:
+        """Retorna True se o frame mudou ou se o keepalive venceu"""
+        now = time.monotonic()
+        if key == self.last_key and now - self.last_sent < self.keepalive_interval:
+            self.suppressed += 1
+            return False
+
+        self.last_key = key
+        self.last_sent = now
+        return True
+
+
+class PitchSource:
+    """Interface de uma fonte de frames de pitch (implementada pelos backends)"""
+
+    def start(self):
+        """Liga a captura"""
+
+    def stop(self):
+        """Desliga a captura"""
+
+    def read(self) -> dict:
+        """Retorna o frame mais recente (dict com pitch, nota, etc.)"""
+        raise NotImplementedError
+
+
+class Subscription:
+    """Inscrição de um cliente em um tópico, com taxa, formato e campos próprios"""
+
+    FORMATS = ("json", "compact")
+
+    def __init__(self, topic: str, send: Callable[[str], Awaitable[None]], rate: float = 20.0,
+                 format: str = "json", fields: Optional[list[str]] = None,
+                 on_change: bool = False, keepalive_interval: float = 1.0):
+        self.topic = topic
+        self.send = send
+        self.suppressor = FrameSuppressor(keepalive_interval)
+        self.next_due = 0.0
+        self.sent = 0
+        self.configure(rate=rate, format=format, fields=fields, on_change=on_change)
+
+    @staticmethod
+    def clamp_rate(rate) -> float:
+        """Taxa em frames/s limitada a 0.1–100 (ValueError para NaN/infinito)"""
+        rate = float(rate)
+        if not math.isfinite(rate):
+            raise ValueError(f"Taxa inválida: {rate}")
+        return min(max(rate, 0.1), 100.0)
+
+    def configure(self, rate: Optional[float] = None, format: Optional[str] = None,
+                  fields: Optional[list[str]] = None, on_change: Optional[bool] = None):
+        """Altera parâmetros da inscrição (valores None mantêm o atual)"""
+        if rate is not None:
+            self.rate = self.clamp_rate(rate)
+            self.interval = 1.0 / self.rate
+        if format is not None:
+            if format not in self.FORMATS:
+                raise ValueError(f"Formato desconhecido: {format}")
+            self.format = format
+        if fields is not None:
+            self.fields = tuple(fields) if fields else None
+        elif not hasattr(self, "fields"):
+            self.fields = None
+        if on_change is not None:
+            self.on_change = bool(on_change)
+
+    @property
+    def encoding(self) -> tuple:
+        """Chave de serialização: inscrições com a mesma chave recebem a mesma mensagem"""
+        return (self.format, self.fields)
+
+
+def encode_frame(frame: dict, format: str, fields: Optional[tuple]) -> str:
+    """Serializa um frame conforme o formato e o filtro de campos"""
+    if format == "compact":
+        names = fields or COMPACT_FIELDS
+        return json.dumps([frame.get(name) for name in names])
+
+    if fields:
+        frame = {"type": frame["type"], **{name: frame[name] for name in fields if name in frame}}
+    return json.dumps(frame)
+
+
+class Topic:
+    """Um tópico: fonte, inscritos, contagem de referências e loop de envio"""
+
+    def __init__(self, name: str, source: PitchSource):
+        self.name = name
+        self.source = source
+        self.subscriptions: list[Subscription] = []
+        self.running = False
+        self.stop_handle: Optional[asyncio.TimerHandle] = None
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()
+        self.starts = 0
+
+
+class PitchHub:
+    """Hub pub/sub com tópicos por fonte e ciclo de vida por contagem de referências"""
+
+    def __init__(self, grace_period: float = 5.0):
+        self.grace_period = grace_period
+        self.factories: dict[str, Callable[[], PitchSource]] = {}
+        self.topics: dict[str, Topic] = {}
+
+    def register_source(self, name: str, factory: Callable[[], PitchSource]):
+        """Registra uma fonte; ela só é criada/ligada quando alguém se inscrever"""
+        self.factories[name] = factory
+
+    def has_topic(self, name: str) -> bool:
+        """Indica se existe fonte registrada com esse nome"""
+        return name in self.factories
+
+    def subscribe(self, topic_name: str, send: Callable[[str], Awaitable[None]], **options) -> Subscription:
+        """Inscreve um cliente em um tópico, ligando a fonte se necessário"""
+        topic = self.topics.get(topic_name)
+        if topic is None:
+            topic = self.topics[topic_name] = Topic(topic_name, self.factories[topic_name]())
+
+        subscription = Subscription(topic_name, send, **options)
+
+        # Liga a fonte antes de inscrever: se start() falhar, nada fica no tópico
+        if not topic.running:
+            topic.source.start()
+            topic.running = True
+            topic.starts += 1
+            topic.task = asyncio.create_task(self._run(topic))
+        topic.subscriptions.append(subscription)
+
+        # Reconexão dentro do período de carência: a fonte continua ligada
+        if topic.stop_handle is not None:
+            topic.stop_handle.cancel()
+            topic.stop_handle = None
+
+        topic.wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove uma inscrição; sem inscritos, a fonte para após a carência"""
+        topic = self.topics.get(subscription.topic)
+        if topic is None or subscription not in topic.subscriptions:
+            return
+        topic.subscriptions.remove(subscription)
+
+        if not topic.subscriptions and topic.stop_handle is None:
+            loop = asyncio.get_running_loop()
+            topic.stop_handle = loop.call_later(self.grace_period, self._stop_topic, topic)
+
+    def _stop_topic(self, topic: Topic):
+        """Desliga a fonte de um tópico que ficou sem inscritos"""
+        topic.stop_handle = None
+        if topic.subscriptions or not topic.running:
+            return
+        topic.running = False
+        topic.source.stop()
+        # Cancela o loop: um subscribe antes dele acordar cria outro, e os dois enviariam
+        if topic.task is not None:
+            topic.task.cancel()
+            topic.task = None
+
+    async def _run(self, topic: Topic):
+        """Loop do tópico: uma leitura da fonte por tick, enviada a quem estiver na hora"""
+        while topic.running and topic.task is asyncio.current_task():
+            if not topic.subscriptions:
+                topic.wakeup.clear()
+                await topic.wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            due = [subscription for subscription in topic.subscriptions if subscription.next_due <= now]
+
+            # Reagendar sem acumular atraso quando o loop se atrasa
+            for subscription in due:
+                subscription.next_due += subscription.interval
+                if subscription.next_due <= now:
+                    subscription.next_due = now + subscription.interval
+
+            if due:
+                try:
+                    frame = topic.source.read()
+                except Exception as e:
+                    log.error("Erro lendo fonte", topic=topic.name, error=e)
+                    frame = None
+
+                if frame is not None:
+                    await self._deliver(frame, due)
+
+            # Dormir até a próxima inscrição vencer (ou até alguém se inscrever)
+            if topic.subscriptions:
+                delay = min(subscription.next_due for subscription in topic.subscriptions) - time.monotonic()
+                if delay > 0:
+                    topic.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(topic.wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+
+    async def _deliver(self, frame: dict, due: list[Subscription]):
+        """Serializa uma vez por combinação formato/campos e envia em paralelo"""
+        change_key = [frame.get(name) for name in CHANGE_FIELDS]
+        encoded: dict[tuple, str] = {}
+        sends = []
+        targets = []
+
+        for subscription in due:
+            if subscription.on_change and not subscription.suppressor.should_send(change_key):
+                continue
+
+            message = encoded.get(subscription.encoding)
+            if message is None:
+                message = encoded[subscription.encoding] = encode_frame(frame, *subscription.encoding)
+            sends.append(subscription.send(message))
+            targets.append(subscription)
+
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for subscription, result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.unsubscribe(subscription)
+            else:
+                subscription.sent += 1
+
+    def stats(self) -> dict:
+        """Resumo dos tópicos para endpoints de status"""
+        return {
+            name: {
+                "running": topic.running,
+                "subscribers": len(topic.subscriptions),
+                "source_starts": topic.starts,
+                "rates": [subscription.rate for subscription in topic.subscriptions]
+            }
+            for name, topic in self.topics.items()
+        }
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Detecção incremental de tonalidade - histograma de classes de altura com decaimento
+
+Cada frame com voz soma peso à classe de altura (C, C#, ..., B) da nota
+detectada. O histograma decai exponencialmente com o tempo (meia-vida
+configurável), mas sem percorrer as 12 classes a cada frame: em vez de
+multiplicar o histograma pelo decaimento, o peso dos frames novos cresce na
+mesma proporção, e o histograma é renormalizado só quando esse fator fica
+grande. A atualização é O(1).
+
+A tonalidade sai da correlação do histograma com os 24 perfis de
+Krumhansl-Kessler (12 maiores e 12 menores), calculada com uma única
+multiplicação de matriz 24×12.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+PITCH_CLASS = {name: index for index, name in enumerate(NOTE_NAMES)}
+
+# Perfis de tonalidade de Krumhansl-Kessler (tônica em C)
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+
+def _key_profiles() -> np.ndarray:
+    """Matriz 24×12 com os perfis rotacionados e normalizados (média 0, norma 1)"""
+    rows = [np.roll(profile, tonic) for profile in (MAJOR_PROFILE, MINOR_PROFILE) for tonic in range(12)]
+    profiles = np.array(rows)
+    profiles -= profiles.mean(axis=1, keepdims=True)
+    profiles /= np.linalg.norm(profiles, axis=1, keepdims=True)
+    return profiles
+
+
+KEY_PROFILES = _key_profiles()
+KEY_NAMES = [(NOTE_NAMES[tonic], scale) for scale in ("major", "minor") for tonic in range(12)]
+
+
+class KeyDetector:
+    """Estimativa contínua da tonalidade a partir das notas cantadas"""
+
+    def __init__(self, half_life: float = 8.0, min_weight: float = 20.0, switch_margin: float = 0.05):
+        self.half_life = half_life
+        self.min_weight = min_weight
+        self.switch_margin = switch_margin
+
+        self.histogram = np.zeros(12)
+        self.reference_time: Optional[float] = None
+        self.scale = 1.0  # peso atual de um frame, relativo a reference_time
+        self.key: Optional[int] = None
+        self.correlation = 0.0
+        self.scores = np.zeros(len(KEY_PROFILES))  # correlações da última avaliação
+
+    def add(self, note: str, timestamp: float) -> bool:
+        """
+        Soma um frame com voz (nome da nota, ex. "F#")
+
+        Retorna True quando a tonalidade estimada muda.
+        """
+        pitch_class = PITCH_CLASS.get(note)
+        if pitch_class is None:
+            return False
+
+        if self.reference_time is None:
+            self.reference_time = timestamp
+
+        # Peso crescente no tempo equivale a decair todo o histograma; depois
+        # de 60 meias-vidas o que havia é desprezível (e 2 ** x estouraria)
+        half_lives = (timestamp - self.reference_time) / self.half_life
+        if half_lives > 60:
+            self.histogram[:] = 0
+            self.reference_time = timestamp
+            half_lives = 0.0
+        self.scale = 2.0 ** half_lives
+        if self.scale > 1e6:
+            self.histogram /= self.scale
+            self.reference_time = timestamp
+            self.scale = 1.0
+        self.histogram[pitch_class] += self.scale
+
+        return self._update_key()
+
+    @property
+    def weight(self) -> float:
+        """Número efetivo de frames no histograma (já com decaimento)"""
+        return float(self.histogram.sum() / self.scale)
+
+    def correlations(self) -> np.ndarray:
+        """Correlação do histograma com as 24 tonalidades"""
+        centered = self.histogram - self.histogram.mean()
+        norm = np.linalg.norm(centered)
+        if norm == 0:
+            return np.zeros(len(KEY_PROFILES))
+        return KEY_PROFILES @ (centered / norm)
+
+    def _update_key(self) -> bool:
+        """Reavalia a tonalidade, com margem para não ficar alternando"""
+        if self.weight < self.min_weight:
+            return False
+
+        correlations = self.scores = self.correlations()
+        best = int(np.argmax(correlations))
+        if self.key is not None and best != self.key:
+            if correlations[best] < correlations[self.key] + self.switch_margin:
+                self.correlation = float(correlations[self.key])
+                return False
+
+        changed = best != self.key
+        self.key = best
+        self.correlation = float(correlations[best])
+        return changed
+
+    def estimate(self, candidates: int = 3) -> Optional[dict]:
+        """Tonalidade atual e as próximas candidatas (da última avaliação)"""
+        if self.key is None:
+            return None
+        correlations = self.scores
+        order = np.argsort(correlations)[::-1][:candidates]
+        tonic, scale = KEY_NAMES[self.key]
+        return {
+            "tonic": tonic,
+            "scale": scale,
+            "correlation": round(self.correlation, 3),
+            "candidates": [
+                {"tonic": KEY_NAMES[index][0], "scale": KEY_NAMES[index][1],
+                 "correlation": round(float(correlations[index]), 3)}
+                for index in order
+            ],
+            "weight": round(self.weight, 1)
+        }
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do endpoint /ws
+
+Abre N clientes WebSocket concorrentes (asyncio) contra um backend iniciado
+localmente, cada um enviando mensagens audio_data numa taxa configurável, e
+mede o tempo de ida e volta de cada mensagem. O número de clientes sobe em
+etapas; para cada etapa são reportados throughput, latência p50/p95/p99,
+erros, desconexões e CPU/RSS do processo servidor.
+
+Uso:
+    python loadtest.py --clients 10,50,100,200 --rate 20 --stage-seconds 10
+    python loadtest.py --url ws://localhost:8000/ws --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import websockets
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Percentil por vizinho mais próximo de uma lista já ordenada"""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ProcessMonitor:
+    """Mede CPU e memória (RSS) do processo servidor"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.process = psutil.Process(pid) if psutil else None
+        self.last_cpu = self._cpu_seconds()
+        self.last_time = time.monotonic()
+
+    def _cpu_seconds(self) -> float:
+        """Tempo de CPU (usuário + sistema) acumulado pelo processo"""
+        if self.process:
+            times = self.process.cpu_times()
+            return times.user + times.system
+        try:
+            # Fallback Linux: campos utime e stime de /proc/<pid>/stat (em ticks)
+            fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, IndexError, ValueError):
+            return float("nan")
+
+    def rss_mb(self) -> float:
+        """Memória residente atual em MB"""
+        if self.process:
+            return self.process.memory_info().rss / 2**20
+        try:
+            for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        except (OSError, ValueError):
+            pass
+        return float("nan")
+
+    def cpu_percent(self) -> float:
+        """Uso de CPU (%) desde a última chamada"""
+        now = time.monotonic()
+        cpu = self._cpu_seconds()
+        percent = 100 * (cpu - self.last_cpu) / max(now - self.last_time, 1e-9)
+        self.last_cpu, self.last_time = cpu, now
+        return percent
+
+
+class StageStats:
+    """Métricas acumuladas durante uma etapa do ramp-up"""
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+        self.disconnects = 0
+        self.latencies: list[float] = []
+
+
+class LoadClient:
+    """Cliente simulado: envia audio_data numa taxa fixa e mede o round trip"""
+
+    def __init__(self, client_id: int, url: str, rate: float, get_stats):
+        self.client_id = client_id
+        self.url = url
+        self.interval = 1.0 / rate
+        self.get_stats = get_stats
+        self.pending: dict[int, float] = {}
+        self.sequence = 0
+        self.disconnected = False  # visto pelo envio e/ou pela recepção; contado uma vez em run()
+
+    async def run(self, stop: asyncio.Event):
+        """Conecta e mantém envio/recepção até o fim do teste"""
+        try:
+            async with websockets.connect(self.url, max_size=None) as websocket:
+                receiver = asyncio.create_task(self.receive_loop(websocket))
+                try:
+                    await self.send_loop(websocket, stop)
+                finally:
+                    receiver.cancel()
+        except websockets.ConnectionClosed:
+            self.disconnected = True
+        except (OSError, websockets.WebSocketException):
+            self.get_stats().errors += 1
+        if self.disconnected:
+            self.get_stats().disconnects += 1
+
+    async def send_loop(self, websocket, stop: asyncio.Event):
+        """Envia mensagens audio_data com um número de sequência"""
+        # Cada cliente "canta" uma frequência diferente dentro da faixa vocal
+        frequency = 110.0 + (self.client_id * 7.3) % 600
+        next_send = time.perf_counter()
+        while not stop.is_set():
+            self.sequence += 1
+            self.pending[self.sequence] = time.perf_counter()
+            await websocket.send(json.dumps({
+                "type": "audio_data",
+                "frequency": frequency,
+                "amplitude": 0.1,
+                "timestamp": time.time(),
+                "seq": self.sequence
+            }))
+            self.get_stats().sent += 1
+
+            next_send += self.interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_send = time.perf_counter()  # atrasado: não tentar compensar em rajada
+
+    async def receive_loop(self, websocket):
+        """Casa cada resposta pitch_data com o envio correspondente (campo seq)"""
+        try:
+            async for message in websocket:
+                now = time.perf_counter()
+                try:
+                    data = json.loads(message)
+                except json.JSONDecodeError:
+                    self.get_stats().errors += 1
+                    continue
+
+                sent_at = self.pending.pop(data.get("seq"), None)
+                if data.get("type") == "pitch_data" and sent_at is not None:
+                    stats = self.get_stats()
+                    stats.received += 1
+                    stats.latencies.append((now - sent_at) * 1000)
+
+                # Descartar envios muito antigos (mensagens descartadas pelo servidor)
+                if len(self.pending) > 1000:
+                    for sequence in sorted(self.pending)[:500]:
+                        del self.pending[sequence]
+        except websockets.ConnectionClosed:
+            self.disconnected = True
+
+
+def start_server(port: int, app: str) -> subprocess.Popen:
+    """Inicia o backend localmente com uvicorn"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+
+
+async def wait_for_server(url: str, timeout: float = 15.0):
+    """Aguarda o servidor aceitar conexões WebSocket"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(url):
+                return
+        except (OSError, websockets.WebSocketException):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Servidor não respondeu em {url}")
+            await asyncio.sleep(0.2)
+
+
+async def run_load_test(url: str, stages: list[int], rate: float, stage_seconds: float,
+                        monitor) -> list[dict]:
+    """Executa o ramp-up de clientes e retorna as métricas de cada etapa"""
+    stop = asyncio.Event()
+    current = {"stats": StageStats()}
+    tasks = []
+    results = []
+
+    print(f"{'clientes':>8} {'env/s':>8} {'resp/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'erros':>6} {'desc.':>6} {'CPU %':>7} {'RSS MB':>7}")
+
+    for clients in stages:
+        # Abrir os clientes que faltam para chegar nesta etapa
+        while len(tasks) < clients:
+            client = LoadClient(len(tasks), url, rate, lambda: current["stats"])
+            tasks.append(asyncio.create_task(client.run(stop)))
+
+        stats = current["stats"] = StageStats()
+        if monitor:
+            monitor.cpu_percent()
+        await asyncio.sleep(stage_seconds)
+
+        latencies = sorted(stats.latencies)
+        result = {
+            "clients": clients,
+            "sent_per_second": stats.sent / stage_seconds,
+            "received_per_second": stats.received / stage_seconds,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "errors": stats.errors,
+            "disconnects": stats.disconnects,
+            "cpu_percent": monitor.cpu_percent() if monitor else float("nan"),
+            "rss_mb": monitor.rss_mb() if monitor else float("nan")
+        }
+        results.append(result)
+        print(f"{clients:>8} {result['sent_per_second']:>8.0f} {result['received_per_second']:>8.0f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['errors']:>6} {result['disconnects']:>6} "
+              f"{result['cpu_percent']:>7.1f} {result['rss_mb']:>7.1f}")
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Teste de carga do WebSocket /ws")
+    parser.add_argument("--clients", default="10,50,100,200",
+                        help="número de clientes em cada etapa do ramp-up (separados por vírgula)")
+    parser.add_argument("--rate", type=float, default=20.0, help="mensagens audio_data por segundo por cliente")
+    parser.add_argument("--stage-seconds", type=float, default=10.0, help="duração de cada etapa")
+    parser.add_argument("--app", default="main_deploy:app", help="app uvicorn iniciado localmente")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="usar um servidor já rodando em vez de iniciar um local")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor externo (para CPU/RSS)")
+    parser.add_argument("--json", help="salvar os resultados neste arquivo JSON")
+    args = parser.parse_args()
+
+    stages = [int(value) for value in args.clients.split(",")]
+    server = None
+
+    if args.url:
+        url = args.url
+        pid = args.server_pid
+    else:
+        server = start_server(args.port, args.app)
+        url = f"ws://127.0.0.1:{args.port}/ws"
+        pid = server.pid
+
+    print("🎵 Teste de carga do Pitch Training Backend")
+    print(f"📡 Alvo: {url} | {args.rate:.0f} msg/s por cliente | etapas: {stages}")
+
+    try:
+        asyncio.run(wait_for_server(url))
+        monitor = ProcessMonitor(pid) if pid else None
+        results = asyncio.run(run_load_test(url, stages, args.rate, args.stage_seconds, monitor))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"💾 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
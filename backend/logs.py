@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Log estruturado sem bloqueio para o callback de áudio e o event loop
+
+print() faz I/O síncrono em stdout: chamado do callback do PortAudio ou de
+um handler com a rede ruim (um erro por socket derrubado), segura a
+captura ou o fan-out enquanto o terminal/pipe não consome. Aqui quem loga
+só monta uma tupla e faz append numa deque (atômico, sem lock e sem I/O);
+uma thread de fundo formata e escreve em lotes.
+
+Mensagens repetidas são agregadas por (nível, mensagem) numa janela de
+`window` segundos: a primeira sai na hora e as seguintes só viram um
+resumo no fim da janela, ex.:
+
+    12:00:01.204 WARN Áudio status status=input overflow
+    12:00:02.204 WARN Áudio status ×37 em 1.0 s status=input overflow
+
+Formato: texto (padrão) ou uma linha JSON por registro com LOG_FORMAT=json.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional, TextIO
+
+
+class _Window:
+    """Repetições de uma mensagem dentro da janela de agregação"""
+
+    __slots__ = ("start", "suppressed", "fields")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.suppressed = 0
+        self.fields: dict = {}
+
+
+class Logger:
+    """Logger com fila e escritor em segundo plano; nunca bloqueia quem loga"""
+
+    def __init__(self, stream: Optional[TextIO] = None, window: float = 1.0, max_pending: int = 10000,
+                 flush_interval: float = 0.1, json_lines: Optional[bool] = None):
+        self.stream = stream
+        self.window = window
+        self.flush_interval = flush_interval
+        self.json_lines = os.environ.get("LOG_FORMAT") == "json" if json_lines is None else json_lines
+        self.pending: deque[tuple] = deque(maxlen=max_pending)
+        self.windows: dict[tuple[str, str], _Window] = {}
+        self.written = 0
+        self.aggregated = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def log(self, level: str, message: str, **fields):
+        """Enfileira um registro (seguro em qualquer thread, inclusive no callback de áudio)"""
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1  # fila cheia: o registro mais antigo é descartado
+        self.pending.append((time.time(), level, message, fields))
+        if self._thread is None:
+            self.start()
+
+    def debug(self, message: str, **fields):
+        self.log("DEBUG", message, **fields)
+
+    def info(self, message: str, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.log("WARN", message, **fields)
+
+    def error(self, message: str, **fields):
+        self.log("ERROR", message, **fields)
+
+    def start(self):
+        """Inicia a thread escritora (feito no primeiro registro)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="logger", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Para a thread e escreve o que ficou na fila e os resumos pendentes"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self.flush(final=True)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # um erro de escrita não pode matar o escritor
+
+    def flush(self, final: bool = False):
+        """Drena a fila e fecha as janelas vencidas (chamado pela thread escritora)"""
+        lines = []
+        while self.pending:
+            timestamp, level, message, fields = self.pending.popleft()
+            key = (level, message)
+            window = self.windows.get(key)
+            if window is not None and timestamp - window.start < self.window:
+                window.suppressed += 1
+                window.fields = fields
+                continue
+            if window is not None and window.suppressed:
+                lines.append(self._summary(key, window, timestamp))
+            self.windows[key] = _Window(timestamp)
+            lines.append(self._format(timestamp, level, message, fields))
+
+        # Janelas encerradas: resumo das repetições suprimidas
+        now = time.time()
+        for key, window in list(self.windows.items()):
+            if final or now - window.start >= self.window:
+                if window.suppressed:
+                    lines.append(self._summary(key, window, now))
+                del self.windows[key]
+
+        if lines:
+            stream = self.stream or sys.stdout
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+            self.written += len(lines)
+
+    def _summary(self, key: tuple[str, str], window: _Window, now: float) -> str:
+        self.aggregated += window.suppressed
+        level, message = key
+        elapsed = min(now - window.start, self.window)
+        return self._format(now, level, message, window.fields,
+                            repeated=window.suppressed, window=round(elapsed, 1))
+
+    def _format(self, timestamp: float, level: str, message: str, fields: dict,
+                repeated: int = 0, window: float = 0.0) -> str:
+        if self.json_lines:
+            record = {"time": round(timestamp, 3), "level": level, "message": message, **fields}
+            if repeated:
+                record.update(repeated=repeated, window=window)
+            return json.dumps(record, ensure_ascii=False, default=str)
+
+        clock = time.strftime("%H:%M:%S", time.localtime(timestamp)) + f".{int(timestamp % 1 * 1000):03d}"
+        text = f"{clock} {level} {message}"
+        if repeated:
+            text += f" ×{repeated} em {window} s"
+        if fields:
+            text += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return text
+
+    def stats(self) -> dict:
+        """Contadores para endpoints de status"""
+        return {
+            "written": self.written,
+            "aggregated": self.aggregated,
+            "dropped": self.dropped,
+            "pending": len(self.pending)
+        }
+
+
+# Logger do processo
+log = Logger()
@@ -6,6 +6,7 @@ Pitch Training Backend - Detecta pitch em tempo real e envia via WebSocket
 import asyncio
 import json
 import math
+import os
 import threading
 import time
 from typing import Optional
@@ -16,43 +17,75 @@ import sounddevice as sd
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 
+from capture import RingReader
+from clocksync import LatencyRegistry, capture_time
+from decimate import create_decimator
+from hub import PitchHub, PitchSource, Subscription
+from logs import log
+from multichannel import MultiChannelPitchDetector
+from polyphonic import PolyphonicPitchDetector
+from vibrato import VibratoAnalyzer
+
 
 class PitchDetector:
     """Classe para detectar pitch em tempo real usando Aubio"""
     
-    def __init__(self, sample_rate: int = 44100, buffer_size: int = 4096):
+    def __init__(self, sample_rate: int = 44100, buffer_size: int = 4096, polyphony: int = 0,
+                 silence_threshold: float = 0.005, confidence_threshold: float = 0.5, decimation: int = 1):
         self.sample_rate = sample_rate
         self.buffer_size = buffer_size
+        self.polyphony = polyphony
+        
+        # Decimação opcional antes do Aubio: mesma janela de tempo com menos amostras
+        self.decimator = create_decimator(decimation, block_size=buffer_size // 4)
+        factor = self.decimator.factor if self.decimator else 1
+        self.detection_rate = sample_rate // factor
+        self.decimated = np.zeros(buffer_size // 4 // factor, dtype=np.float32)  # saída do decimador para o Aubio
+        
+        # Gate de energia (RMS) e confiança mínima do Aubio
+        self.silence_threshold = silence_threshold
+        self.confidence_threshold = confidence_threshold
         
         # Configurar detector de pitch do Aubio
-        self.pitch_detector = aubio.pitch("default", self.buffer_size, self.buffer_size//4, self.sample_rate)
+        self.pitch_detector = aubio.pitch("default", self.buffer_size // factor,
+                                          self.buffer_size // 4 // factor, self.detection_rate)
         self.pitch_detector.set_unit("Hz")
         self.pitch_detector.set_tolerance(0.8)
         
         # Buffer para armazenar áudio
         self.audio_buffer = np.zeros(self.buffer_size, dtype=np.float32)
         self.current_pitch = 0.0
+        self.current_confidence = 0.0
+        self.current_rms = 0.0
+        self.current_capture_time = 0.0
         self.is_recording = False
         
+        # Vibrato acompanhado bloco a bloco, no ritmo da detecção
+        self.vibrato = VibratoAnalyzer()
+        self.current_vibrato: Optional[dict] = None
+        
+        # Modo polifônico opcional: até N vozes simultâneas (duetos, acordes)
+        self.current_voices: list[tuple[float, float]] = []
+        if polyphony > 0:
+            self.polyphonic_detector = PolyphonicPitchDetector(
+                sample_rate=self.sample_rate,
+                frame_size=self.buffer_size,
+                max_voices=polyphony
+            )
+        
     def start_recording(self):
         """Inicia a captura de áudio"""
         self.is_recording = True
         
-        def audio_callback(indata, frames, time, status):
+        def audio_callback(indata, frames, time_info, status):
             if status:
-                print(f"Áudio status: {status}")
-            
-            # Converter para float32 e mono
-            audio_data = indata[:, 0].astype(np.float32)
+                log.warning("Áudio status", status=status)
             
-            # Detectar pitch
-            pitch = self.pitch_detector(audio_data)[0]
+            # Horário de captura do bloco, pelo relógio do PortAudio
+            self.current_capture_time = capture_time(time_info, frames, self.sample_rate)
             
-            # Filtrar ruído (frequências muito baixas ou muito altas)
-            if 80 <= pitch <= 2000:  # Faixa vocal humana típica
-                self.current_pitch = pitch
-            else:
-                self.current_pitch = 0.0
+            # Canal mono como view (sem cópia quando a entrada já é float32)
+            self.process(np.asarray(indata[:, 0], dtype=np.float32))
         
         # Iniciar stream de áudio
         self.stream = sd.InputStream(
@@ -63,7 +96,73 @@ class PitchDetector:
             dtype=np.float32
         )
         self.stream.start()
+    
+    def process(self, audio_data: np.ndarray):
+        """Detecta o pitch de um bloco capturado (callback de áudio ou anel compartilhado)"""
+        frames = len(audio_data)
+        
+        # Estado que acompanha o sinal mesmo no silêncio: histórico do decimador
+        # e janela deslizante do polifônico (senão a volta da voz usa áudio velho)
+        detection_data = audio_data
+        if self.decimator:
+            decimated = self.decimator.process(audio_data)
+            if len(decimated) != len(self.decimated):
+                self.decimated = np.zeros(len(decimated), dtype=np.float32)
+            np.copyto(self.decimated, decimated)
+            detection_data = self.decimated
+        if self.polyphony > 0:
+            self.audio_buffer[:-frames] = self.audio_buffer[frames:]
+            self.audio_buffer[-frames:] = audio_data
+        
+        # Gate de silêncio: blocos com pouca energia não passam pelos detectores
+        self.current_rms = float(np.sqrt(np.dot(audio_data, audio_data) / len(audio_data)))
+        if self.current_rms < self.silence_threshold:
+            self.current_pitch = 0.0
+            self.current_confidence = 0.0
+            self.current_voices = []
+            self.update_vibrato()
+            return
+        
+        # Detectar pitch (no sinal decimado, se a decimação está ligada)
+        pitch = self.pitch_detector(detection_data)[0]
+        self.current_confidence = self.periodicity(detection_data, pitch)
+        
+        # Filtrar ruído (frequências fora da faixa ou detecção pouco confiável)
+        if 80 <= pitch <= 2000 and self.current_confidence >= self.confidence_threshold:
+            self.current_pitch = pitch
+        else:
+            self.current_pitch = 0.0
         
+        if self.polyphony > 0:
+            self.current_voices = self.polyphonic_detector.detect(self.audio_buffer)
+        
+        self.update_vibrato()
+    
+    def update_vibrato(self):
+        """Alimenta o VibratoAnalyzer com o pitch do bloco (no horário de captura)"""
+        timestamp = self.current_capture_time or time.time()
+        self.current_vibrato = self.vibrato.add(timestamp, self.current_pitch)
+        
+    def periodicity(self, audio_data: np.ndarray, pitch: float) -> float:
+        """
+        Confiança da detecção: autocorrelação normalizada do bloco no período detectado
+        
+        O Aubio 0.4.9 sempre reporta confiança 0 para o método "default" (yinfft),
+        então a confiança é medida aqui, com dois produtos escalares por bloco.
+        """
+        if pitch <= 0:
+            return 0.0
+        lag = int(round(self.detection_rate / pitch))
+        if lag >= len(audio_data) - 1:
+            return 0.0
+        
+        head = audio_data[:-lag]
+        tail = audio_data[lag:]
+        energy = np.dot(head, head) * np.dot(tail, tail)
+        if energy <= 0:
+            return 0.0
+        return float(max(0.0, np.dot(head, tail) / np.sqrt(energy)))
+    
     def stop_recording(self):
         """Para a captura de áudio"""
         self.is_recording = False
@@ -74,6 +173,14 @@ class PitchDetector:
     def get_current_pitch(self) -> float:
         """Retorna o pitch atual detectado"""
         return self.current_pitch
+    
+    def get_current_confidence(self) -> float:
+        """Retorna a confiança (0-1) da última detecção"""
+        return self.current_confidence
+    
+    def get_current_voices(self) -> list[tuple[float, float]]:
+        """Retorna as vozes atuais (frequência, confiança) no modo polifônico"""
+        return self.current_voices
 
 
 class NoteConverter:
@@ -130,100 +237,190 @@ class NoteConverter:
         return round(frequency, 2)
 
 
-class ConnectionManager:
-    """Gerenciador de conexões WebSocket"""
+class MicrophoneSource(PitchSource):
+    """Fonte do hub: microfone padrão com PitchDetector (Aubio)"""
     
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
-        self.pitch_detector = PitchDetector()
-        self.is_broadcasting = False
-        
-    async def connect(self, websocket: WebSocket):
-        """Aceita uma nova conexão WebSocket"""
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        
-        # Iniciar detecção de pitch se é a primeira conexão
-        if len(self.active_connections) == 1:
-            self.start_pitch_detection()
-    
-    def disconnect(self, websocket: WebSocket):
-        """Remove uma conexão WebSocket"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        
-        # Parar detecção se não há mais conexões
-        if len(self.active_connections) == 0:
-            self.stop_pitch_detection()
-    
-    async def broadcast(self, data: dict):
-        """Envia dados para todas as conexões ativas"""
-        if not self.active_connections:
-            return
+        self.pitch_detector = PitchDetector(polyphony=int(os.environ.get("PITCH_POLYPHONY", 0)),
+                                            decimation=int(os.environ.get("PITCH_DECIMATION", 1)))
+    
+    def start(self):
+        """Liga a captura de áudio"""
+        self.pitch_detector.start_recording()
+    
+    def stop(self):
+        """Desliga a captura de áudio"""
+        self.pitch_detector.stop_recording()
+    
+    def read(self) -> dict:
+        """Frame pitch_data com o estado atual do detector"""
+        pitch = float(self.pitch_detector.get_current_pitch())
+        note_info = NoteConverter.frequency_to_note(pitch)
+        
+        data = {
+            "type": "pitch_data",
+            "pitch": pitch,
+            "confidence": round(self.pitch_detector.get_current_confidence(), 3),
+            "note": note_info["note"],
+            "octave": note_info["octave"],
+            "cents": note_info["cents"],
+            "frequency": note_info["frequency"],
+            "timestamp": time.time(),
+            "capture_time": self.pitch_detector.current_capture_time
+        }
         
-        message = json.dumps(data)
-        disconnected = []
+        # Vibrato (taxa e extensão) enquanto a nota sustentada oscila
+        vibrato = self.pitch_detector.current_vibrato
+        if vibrato:
+            data["vibrato"] = vibrato
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
+        # Vozes simultâneas no modo polifônico
+        if self.pitch_detector.polyphony > 0:
+            data["voices"] = [
+                {**NoteConverter.frequency_to_note(frequency), "confidence": round(confidence, 3)}
+                for frequency, confidence in self.pitch_detector.get_current_voices()
+            ]
         
-        # Remove conexões desconectadas
-        for connection in disconnected:
-            self.disconnect(connection)
+        return data
+
+
+class SharedMemorySource(MicrophoneSource):
+    """
+    Fonte do hub: blocos do daemon de captura (capture.py) em memória compartilhada
     
-    def start_pitch_detection(self):
-        """Inicia a detecção de pitch e broadcasting"""
-        if self.is_broadcasting:
-            return
+    Nenhum processo do backend abre o microfone, então vários workers (e um
+    gravador) leem o mesmo áudio. Uma thread leitora consome o anel no ritmo
+    dos blocos, fora do event loop: se o daemon roda com --detect, usa o
+    pitch do bloco mais recente; senão copia cada bloco, confere que o slot
+    não foi sobrescrito e detecta aqui. read() só monta o frame com o
+    estado mais recente.
+    """
+    
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.ring: Optional[RingReader] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    def start(self):
+        """Anexa ao anel do daemon (só leitura) e inicia a thread leitora"""
+        self.ring = RingReader(self.name)
+        if not self.ring.has_detection:
+            self.pitch_detector = PitchDetector(sample_rate=self.ring.sample_rate,
+                                                buffer_size=self.ring.block_size * 4,
+                                                polyphony=self.pitch_detector.polyphony,
+                                                decimation=int(os.environ.get("PITCH_DECIMATION", 1)))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._consume, name=f"shm-{self.name}", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Para a thread leitora e desanexa do anel (o daemon continua capturando)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+    
+    def _consume(self):
+        """Thread leitora: acompanha o anel bloco a bloco até stop()"""
+        ring = self.ring
+        detector = self.pitch_detector
+        # Meio bloco entre consultas: acompanha o daemon sem girar em vão
+        interval = ring.block_size / ring.sample_rate / 2
+        audio = np.zeros(ring.block_size, dtype=np.float32)
         
-        self.is_broadcasting = True
-        self.pitch_detector.start_recording()
+        while not self._stop.wait(interval):
+            gaps = ring.gaps
+            new = ring.poll()
+            
+            if ring.has_detection:
+                # Só o bloco mais recente ainda intacto interessa
+                for seq in reversed(new):
+                    slot = ring.slot(seq)
+                    if slot is None:
+                        continue
+                    pitch, confidence = float(slot["pitch"]), float(slot["confidence"])
+                    captured_at = float(slot["capture_time"])
+                    if ring.valid(seq):
+                        detector.current_pitch, detector.current_confidence = pitch, confidence
+                        detector.current_capture_time = captured_at
+                        detector.update_vibrato()
+                        break
+            else:
+                for seq in new:
+                    slot = ring.slot(seq)
+                    if slot is None:
+                        continue
+                    np.copyto(audio, slot["audio"])
+                    captured_at = float(slot["capture_time"])
+                    if not ring.valid(seq):
+                        ring.lost += 1  # sobrescrito durante a cópia: descarta o bloco
+                        continue
+                    detector.current_capture_time = captured_at
+                    detector.process(audio)
+            
+            if ring.gaps != gaps:
+                log.warning("Leitor atrasado no anel de captura", name=self.name, lost=ring.lost)
+
+
+class SharedMultiChannelCapture:
+    """Captura multicanal única, compartilhada pelos tópicos de cada canal"""
+    
+    def __init__(self, channels: int):
+        self.channels = channels
+        self.pitch_detector = MultiChannelPitchDetector(channels=channels)
+        self.users = 0
+    
+    def acquire(self):
+        """Liga a captura no primeiro canal em uso"""
+        self.users += 1
+        if self.users == 1:
+            self.pitch_detector.start_recording()
+    
+    def release(self):
+        """Desliga a captura quando nenhum canal está em uso"""
+        self.users = max(0, self.users - 1)
+        if self.users == 0:
+            self.pitch_detector.stop_recording()
+
+
+class ChannelSource(PitchSource):
+    """Fonte do hub: um canal de uma interface de áudio multicanal"""
+    
+    def __init__(self, capture: SharedMultiChannelCapture, channel: int):
+        self.capture = capture
+        self.channel = channel
+    
+    def start(self):
+        """Passa a usar a captura multicanal compartilhada"""
+        self.capture.acquire()
+    
+    def stop(self):
+        """Deixa de usar a captura multicanal compartilhada"""
+        self.capture.release()
+    
+    def read(self) -> dict:
+        """Frame pitch_data do canal"""
+        detector = self.capture.pitch_detector
+        pitch = detector.get_current_pitch(self.channel)
+        note_info = NoteConverter.frequency_to_note(pitch)
         
-        # Thread para enviar dados continuamente
-        def broadcast_loop():
-            while self.is_broadcasting and self.active_connections:
-                try:
-                    # Obter pitch atual
-                    pitch = self.pitch_detector.get_current_pitch()
-                    
-                    # Converter para nota
-                    note_info = NoteConverter.frequency_to_note(pitch)
-                    
-                    # Preparar dados
-                    data = {
-                        "type": "pitch_data",
-                        "pitch": pitch,
-                        "note": note_info["note"],
-                        "octave": note_info["octave"],
-                        "cents": note_info["cents"],
-                        "frequency": note_info["frequency"],
-                        "timestamp": time.time()
-                    }
-                    
-                    # Enviar dados (usar asyncio para executar a função async)
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.broadcast(data))
-                    loop.close()
-                    
-                    # Aguardar um pouco antes da próxima leitura
-                    time.sleep(0.05)  # 20 FPS
-                    
-                except Exception as e:
-                    print(f"Erro no broadcast: {e}")
-                    break
-        
-        # Iniciar thread
-        self.broadcast_thread = threading.Thread(target=broadcast_loop, daemon=True)
-        self.broadcast_thread.start()
-    
-    def stop_pitch_detection(self):
-        """Para a detecção de pitch"""
-        self.is_broadcasting = False
-        self.pitch_detector.stop_recording()
+        return {
+            "type": "pitch_data",
+            "channel": self.channel,
+            "pitch": pitch,
+            "confidence": round(float(detector.current_confidences[self.channel]), 3),
+            "note": note_info["note"],
+            "octave": note_info["octave"],
+            "cents": note_info["cents"],
+            "frequency": note_info["frequency"],
+            "timestamp": time.time(),
+            "capture_time": detector.current_capture_time
+        }
 
 
 # Criar aplicação FastAPI
@@ -238,8 +435,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Gerenciador de conexões
-manager = ConnectionManager()
+# Com CAPTURE_SHM=<nome> o microfone vem do daemon de captura (capture.py) e vários
+# workers podem rodar juntos; sem ele este processo abre o microfone
+CAPTURE_SHM = os.environ.get("CAPTURE_SHM", "")
+
+# Hub pub/sub: cada fonte é um tópico, ligado/desligado por contagem de referências
+hub = PitchHub(grace_period=float(os.environ.get("PITCH_SOURCE_GRACE", 5.0)))
+if CAPTURE_SHM:
+    hub.register_source("mic", lambda: SharedMemorySource(CAPTURE_SHM))
+else:
+    hub.register_source("mic", MicrophoneSource)
+
+# Interfaces multicanal: um tópico por microfone, todos sobre a mesma captura
+multichannel_capture = SharedMultiChannelCapture(channels=int(os.environ.get("PITCH_CHANNELS", 8)))
+for channel in range(multichannel_capture.channels):
+    hub.register_source(f"channel:{channel}",
+                        lambda channel=channel: ChannelSource(multichannel_capture, channel))
+
+# Send-on-change ligado por padrão; cada cliente pode mudar via ?on_change=0
+SEND_ON_CHANGE = os.environ.get("PITCH_SEND_ON_CHANGE", "1") == "1"
+
+# Offset de relógio, RTT e latência por estágio de cada cliente conectado
+latency = LatencyRegistry()
+
+
+def subscription_options(params) -> dict:
+    """Lê taxa, formato, campos e send-on-change da query string ou de uma mensagem"""
+    options = {}
+    if params.get("rate") is not None:
+        options["rate"] = Subscription.clamp_rate(params["rate"])
+    if params.get("format") is not None:
+        options["format"] = params["format"]
+    if params.get("fields") is not None:
+        fields = params["fields"]
+        options["fields"] = fields.split(",") if isinstance(fields, str) else list(fields)
+    if params.get("on_change") is not None:
+        options["on_change"] = str(params["on_change"]).lower() in ("1", "true", "yes")
+    return options
+
+
+async def serve_topic(websocket: WebSocket, topic: str):
+    """Inscreve o WebSocket em um tópico do hub até a desconexão"""
+    try:
+        options = {"on_change": SEND_ON_CHANGE, **subscription_options(websocket.query_params)}
+    except ValueError:
+        options = None
+    if options is None or options.get("format", "json") not in Subscription.FORMATS:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    subscription: Optional[Subscription] = None
+    client_id, clock = latency.register()
+    
+    try:
+        # Dentro do try: se a fonte não liga (sem microfone, anel ausente) nada fica inscrito
+        subscription = hub.subscribe(topic, websocket.send_text, **options)
+        
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.time()
+            
+            # Processar comandos do cliente
+            try:
+                command = json.loads(data)
+                if command.get("type") == "ping":
+                    await websocket.send_text(json.dumps(clock.pong(command, received_at)))
+                elif command.get("type") == "frame_displayed":
+                    clock.record_display(command)
+                elif command.get("type") == "configure":
+                    subscription.configure(**subscription_options(command))
+            except (ValueError, TypeError, AttributeError, KeyError):
+                pass
+                
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        log.error("Erro WebSocket", error=e, topic=topic)
+        if subscription is None:
+            await websocket.close(code=1011)  # a fonte não ligou
+    finally:
+        if subscription is not None:
+            hub.unsubscribe(subscription)
+        latency.remove(client_id)
 
 
 @app.get("/")
@@ -264,29 +542,31 @@ async def get_notes():
     return {"notes": notes}
 
 
+@app.get("/status")
+async def status():
+    """Status dos tópicos do hub e latência (offset, RTT, percentis) por cliente"""
+    return {"status": "running", "topics": hub.stats(), "latency": latency.stats(),
+            "logging": log.stats()}
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """Endpoint WebSocket para transmissão de dados de pitch"""
-    await manager.connect(websocket)
+    """
+    Endpoint WebSocket para transmissão de dados de pitch
     
-    try:
-        while True:
-            # Manter conexão viva
-            data = await websocket.receive_text()
-            
-            # Processar comandos do cliente se necessário
-            try:
-                command = json.loads(data)
-                if command.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
-            except:
-                pass
-                
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-    except Exception as e:
-        print(f"Erro WebSocket: {e}")
-        manager.disconnect(websocket)
+    Parâmetros opcionais: ?rate=20&format=json|compact&fields=pitch,note&on_change=1
+    """
+    await serve_topic(websocket, "mic")
+
+
+@app.websocket("/ws/channel/{channel}")
+async def channel_websocket_endpoint(websocket: WebSocket, channel: int):
+    """Endpoint WebSocket com o pitch de um único canal da interface de áudio"""
+    if not hub.has_topic(f"channel:{channel}"):
+        await websocket.close(code=1008)
+        return
+    
+    await serve_topic(websocket, f"channel:{channel}")
 
 
 if __name__ == "__main__":
@@ -294,6 +574,7 @@ if __name__ == "__main__":
     
     print("🎵 Iniciando Pitch Training Backend...")
     print("📡 WebSocket: ws://localhost:8000/ws")
+    print("🎚️  Multicanal: ws://localhost:8000/ws/channel/{canal}")
     print("🌐 API: http://localhost:8000")
     print("📋 Notas: http://localhost:8000/notes")
     
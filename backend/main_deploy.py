@@ -7,15 +7,30 @@ import asyncio
 import json
 import math
 import time
+import uuid
+from contextlib import asynccontextmanager
 from typing import Optional
 import random
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 import os
 
+from backplane import create_backplane
+from classroom import ClassroomHub, finite_hz
+from clocksync import ClockSync, LatencyRegistry
+from history import HistoryStore
+from keydetect import KEY_NAMES, KeyDetector
+from logs import log
+from melody import EXERCISES, MAX_NOTES, MelodyScorer
+from ratelimit import CoalescingReceiver, InboundStats
+from recording import SESSION_ID_PATTERN, ReplayCursor, SessionStore
+from segmenter import NoteSegmenter, midi_file, segment_notes
+from static import FrontendFiles
+from tones import CHORDS, TIMBRES, ToneHub
+from vibrato import VibratoAnalyzer
+
 
 class NoteConverter:
     """Classe para converter frequências em notas musicais"""
@@ -108,15 +123,20 @@ class ConnectionManager:
         self.active_connections: list[WebSocket] = []
         self.mock_generator = MockPitchGenerator()
         self.is_broadcasting = False
+        self.broadcast_task: Optional[asyncio.Task] = None
+        
+        # Contadores agregados de mensagens recebidas/coalescidas
+        self.inbound_stats = InboundStats()
         
     async def connect(self, websocket: WebSocket):
         """Aceita uma nova conexão WebSocket"""
         await websocket.accept()
         self.active_connections.append(websocket)
         
-        # Iniciar broadcasting se é a primeira conexão
+        # Iniciar broadcasting se é a primeira conexão (em segundo plano: o
+        # handler segue para a sessão enquanto os dados simulados são enviados)
         if len(self.active_connections) == 1:
-            await self.start_broadcasting()
+            self.broadcast_task = asyncio.create_task(self.start_broadcasting())
     
     def disconnect(self, websocket: WebSocket):
         """Remove uma conexão WebSocket"""
@@ -180,19 +200,58 @@ class ConnectionManager:
                 await asyncio.sleep(0.05)  # 20 FPS
                 
             except Exception as e:
-                print(f"Erro no broadcast: {e}")
+                log.error("Erro no broadcast", error=e)
                 break
     
     def stop_broadcasting(self):
         """Para o broadcasting"""
         self.is_broadcasting = False
+        if self.broadcast_task is not None:
+            self.broadcast_task.cancel()
+            self.broadcast_task = None
+
+
+# Backplane entre instâncias (BACKPLANE_URL=redis://host:6379; sem URL fica só em memória)
+backplane = create_backplane(os.environ.get("BACKPLANE_URL"))
+
+# Gravação das sessões para replay: desligada sem SESSIONS_DIR; limitada em sessões e frames por sessão
+SESSIONS_DIR = os.environ.get("SESSIONS_DIR", "")
+session_store = SessionStore(SESSIONS_DIR, max_sessions=int(os.environ.get("SESSIONS_MAX", 100)),
+                             max_frames=int(os.environ.get("SESSIONS_MAX_FRAMES", 216000))) if SESSIONS_DIR else None
+
+# Histórico em memória das sessões recentes, com pirâmide para zoom no gráfico
+histories = HistoryStore(max_sessions=int(os.environ.get("HISTORY_MAX_SESSIONS", 256)))
+
+# Build do frontend servido por este processo (FRONTEND_DIST=../frontend/dist); vazio desativa
+FRONTEND_DIST = os.environ.get("FRONTEND_DIST", "")
+frontend = FrontendFiles(FRONTEND_DIST) if FRONTEND_DIST else None
+
+# Offset de relógio, RTT e latência por estágio de cada sessão conectada
+latency = LatencyRegistry()
+
+# Salas de aula: professores desta instância recebem um frame agregado por tick
+classrooms = ClassroomHub(backplane)
+
+# Tons e drones de referência: um gerador por canal, PCM int16 na taxa TONE_SAMPLE_RATE
+tones = ToneHub(sample_rate=int(os.environ.get("TONE_SAMPLE_RATE", 22050)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Conecta o backplane (e carrega o frontend) na subida; desconecta no desligamento"""
+    if frontend:
+        await asyncio.to_thread(frontend.load)
+    await backplane.start()
+    yield
+    await backplane.stop()
 
 
 # Criar aplicação FastAPI
 app = FastAPI(
     title="Pitch Training Backend", 
     version="1.0.0",
-    description="Backend para treinamento de afinação vocal - Versão Demo"
+    description="Backend para treinamento de afinação vocal - Versão Demo",
+    lifespan=lifespan
 )
 
 # Configurar CORS para Vercel + local
@@ -213,6 +272,10 @@ app.add_middleware(
 # Gerenciador de conexões
 manager = ConnectionManager()
 
+# Limite de mensagens audio_data processadas por conexão (por segundo / rajada)
+AUDIO_DATA_RATE = float(os.environ.get("AUDIO_DATA_RATE", 30))
+AUDIO_DATA_BURST = float(os.environ.get("AUDIO_DATA_BURST", 10))
+
 # Backend-only mode - sem arquivos estáticos
 
 
@@ -247,28 +310,142 @@ async def status():
             "pitch_detection": False,
             "audio_input": False,
             "simulated_data": True
+        },
+        "inbound": {
+            **manager.inbound_stats.as_dict(),
+            "rate_limit": AUDIO_DATA_RATE,
+            "burst": AUDIO_DATA_BURST
+        },
+        "backplane": backplane.stats(),
+        "classrooms": classrooms.stats(),
+        "tones": tones.stats(),
+        "latency": latency.stats(),
+        "logging": log.stats()
+    }
+
+
+def melody_notes(command: dict) -> list[tuple[float, float]]:
+    """Notas (MIDI, duração) de um start_melody: exercício pronto ou lista de notas"""
+    if "exercise" in command:
+        return EXERCISES[command["exercise"]]
+    
+    if len(command["notes"]) > MAX_NOTES:
+        raise ValueError(f"Melodia com mais de {MAX_NOTES} notas")
+    
+    notes = []
+    for item in command["notes"]:
+        if "midi" in item:
+            midi = float(item["midi"])
+        else:
+            # C4 = 60 (mesma convenção de oitavas do NoteConverter)
+            midi = 12 * (int(item["octave"]) + 1) + NoteConverter.NOTE_NAMES.index(item["note"])
+        notes.append((midi, float(item.get("duration", 0.5))))
+    return notes
+
+
+def tone_notes(command: dict) -> list[float]:
+    """Notas MIDI de um comando de tom: lista de notas ou nota (+ acorde/drone)"""
+    if "notes" in command:
+        items, intervals = command["notes"], (0,)
+    else:
+        items, intervals = [command], CHORDS[command.get("chord", "unison")]
+    
+    roots = []
+    for item in items:
+        if "midi" in item:
+            roots.append(float(item["midi"]))
+        elif "frequency" in item:
+            roots.append(69 + 12 * math.log2(float(item["frequency"]) / 440.0))
+        else:
+            roots.append(12 * (int(item.get("octave", 4)) + 1) + NoteConverter.NOTE_NAMES.index(item["note"]))
+    return [root + interval for root in roots for interval in intervals]
+
+
+@app.get("/tones")
+async def list_tones():
+    """Timbres e acordes disponíveis para os tons de referência"""
+    return {
+        "timbres": list(TIMBRES),
+        "chords": {name: list(intervals) for name, intervals in CHORDS.items()},
+        "sample_rate": tones.sample_rate,
+        "block_size": tones.block_size
+    }
+
+
+@app.get("/melodies")
+async def list_melodies():
+    """Exercícios de melodia disponíveis"""
+    return {
+        "melodies": {
+            name: [{"midi": midi, "duration": duration} for midi, duration in notes]
+            for name, notes in EXERCISES.items()
         }
     }
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """Endpoint WebSocket para transmissão de dados de pitch"""
+    """
+    Endpoint WebSocket para transmissão de dados de pitch
+    
+    Cada conexão é uma sessão (?session=<id> para reutilizar um id); o pitch
+    da sessão é publicado no backplane e pode ser assistido de qualquer
+    instância em /ws/watch/{session_id}. Com ?room=<sala> o aluno também
+    aparece no stream agregado do professor (/ws/classroom/{sala}).
+    
+    Exercícios de melodia: {"type": "start_melody", "exercise": "c_major_scale"}
+    ou {"type": "start_melody", "notes": [{"note": "C", "octave": 4, "duration": 0.5}, ...]};
+    cada nota concluída gera um "melody_note" e o fim um "melody_result".
+    
+    A tonalidade estimada do que foi cantado vai em cada pitch_data ("key")
+    e, quando muda, numa mensagem "key_data" com as candidatas. Enquanto há
+    vibrato, o pitch_data traz "vibrato" com taxa (Hz) e extensão (± cents).
+    
+    O contorno também é segmentado em notas: "note_on" quando uma nota se
+    confirma e "note_off" (início, fim, pitch mediano) quando ela termina.
+    Com ?stream=notes só os eventos de nota são enviados, sem pitch_data.
+    """
+    session_id = websocket.query_params.get("session") or ""
+    if not SESSION_ID_PATTERN.match(session_id):
+        session_id = uuid.uuid4().hex[:12]
+    elif session_store and session_store.recording(session_id):
+        # Outro socket já grava este id: esta conexão vira uma sessão própria
+        session_id = f"{session_id[:51]}-{uuid.uuid4().hex[:12]}"
+    channel = f"session:{session_id}"
+    room = websocket.query_params.get("room")
+    recorder = session_store.recorder(session_id) if session_store else None
+    melody_scorer: Optional[MelodyScorer] = None
+    key_detector = KeyDetector()
+    vibrato = VibratoAnalyzer()
+    segmenter = NoteSegmenter(keep_notes=False)
+    notes_only = websocket.query_params.get("stream") == "notes"
+    
     await manager.connect(websocket)
+    await websocket.send_text(json.dumps({"type": "session", "session_id": session_id,
+                                          "node": backplane.node_id}))
+    
+    # Leitura em segundo plano com limite de taxa e coalescência de audio_data
+    receiver = CoalescingReceiver(websocket, AUDIO_DATA_RATE, AUDIO_DATA_BURST,
+                                  totals=manager.inbound_stats)
+    receiver.start()
+    client_id, clock = latency.register(session_id=session_id)
     
     try:
         while True:
-            # Receber dados do cliente
-            data = await websocket.receive_text()
+            # Receber dados do cliente (já decodificados)
+            command = await receiver.receive()
             
             try:
-                command = json.loads(data)
-                
                 # Processar dados de áudio vindos do frontend
                 if command.get("type") == "audio_data":
                     frequency = command.get("frequency", 0)
                     amplitude = command.get("amplitude", 0)
                     
+                    # Captura no navegador ("timestamp" do cliente) no relógio do servidor
+                    captured_at = clock.to_server_time(command["timestamp"]) if "timestamp" in command else None
+                    if captured_at is not None:
+                        clock.record("uplink", command["received_at"] - captured_at)
+                    
                     if frequency > 80 and frequency < 2000:  # Frequências válidas
                         # Converter para nota musical
                         note_info = NoteConverter.frequency_to_note(frequency)
@@ -286,29 +463,383 @@ async def websocket_endpoint(websocket: WebSocket):
                             "amplitude": amplitude
                         }
                         
+                        # Ecoar o número de sequência do cliente (medição de round trip)
+                        if "seq" in command:
+                            response_data["seq"] = command["seq"]
+                        if captured_at is not None:
+                            response_data["capture_time"] = captured_at
+                        
+                        # Alinhar ao exercício de melodia em andamento
+                        melody_events = []
+                        if melody_scorer:
+                            melody_events = melody_scorer.add(response_data["timestamp"], frequency)
+                            response_data["melody"] = melody_scorer.current
+                            if melody_scorer.finished:
+                                melody_scorer = None
+                        
+                        # Vibrato: taxa e extensão sobre a janela recente do contorno
+                        vibrato_info = vibrato.add(response_data["timestamp"], frequency)
+                        if vibrato_info:
+                            response_data["vibrato"] = vibrato_info
+                        
+                        # Tonalidade: histograma de classes de altura atualizado pela nota
+                        key_changed = key_detector.add(note_info["note"], response_data["timestamp"])
+                        if key_detector.key is not None:
+                            tonic, scale = KEY_NAMES[key_detector.key]
+                            response_data["key"] = {"tonic": tonic, "scale": scale,
+                                                    "correlation": round(key_detector.correlation, 3)}
+                        
+                        # Eventos de nota (início/fim com pitch mediano)
+                        note_events = segmenter.add(response_data["timestamp"], frequency)
+                        
                         # Enviar de volta para o cliente
-                        await websocket.send_text(json.dumps(response_data))
+                        if not notes_only:
+                            await websocket.send_text(json.dumps(response_data))
+                        for event in note_events:
+                            await websocket.send_text(json.dumps(event))
+                        for event in melody_events:
+                            await websocket.send_text(json.dumps(event))
+                        if key_changed:
+                            await websocket.send_text(json.dumps({"type": "key_data", **key_detector.estimate()}))
+                        clock.record("server", time.time() - command["received_at"])
+                        
+                        if recorder:
+                            recorder.append(response_data["timestamp"], frequency, amplitude)
+                        histories.add(session_id, response_data["timestamp"], frequency)
+                        
+                        # Publicar para quem assiste a sessão (em qualquer instância)
+                        backplane.publish(channel, session_id, {**response_data, "session_id": session_id})
+                        if room:
+                            backplane.publish(ClassroomHub.channel(room), session_id, {
+                                "session_id": session_id,
+                                "pitch": frequency,
+                                "target": finite_hz(command.get("target"))
+                            })
                         
                         # Parar dados simulados quando receber dados reais
                         if manager.is_broadcasting:
                             manager.stop_broadcasting()
+                    
+                    else:
+                        # Sem pitch válido: silêncio para o segmentador (pode fechar a nota)
+                        for event in segmenter.add(time.time(), 0):
+                            await websocket.send_text(json.dumps(event))
                 
                 elif command.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    await websocket.send_text(json.dumps(clock.pong(command, command["received_at"])))
+                
+                elif command.get("type") == "frame_displayed":
+                    clock.record_display(command)
+                
+                elif command.get("type") == "start_melody":
+                    notes = melody_notes(command)
+                    melody_scorer = MelodyScorer(notes)
+                    await websocket.send_text(json.dumps({
+                        "type": "melody_started",
+                        "exercise": command.get("exercise"),
+                        "notes": [{"midi": midi, "duration": duration} for midi, duration in notes]
+                    }))
+                
+                elif command.get("type") == "stop_melody" and melody_scorer:
+                    for event in melody_scorer.finish():
+                        await websocket.send_text(json.dumps(event))
+                    melody_scorer = None
                     
-            except json.JSONDecodeError:
+            except (TypeError, ValueError, KeyError):
                 pass
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"Erro WebSocket: {e}")
+        log.error("Erro WebSocket", error=e)
         manager.disconnect(websocket)
+    finally:
+        receiver.stop()
+        latency.remove(client_id)
+        if recorder:
+            recorder.close()
+        
+        # Fecha a nota em andamento; o note_off só chega se o socket ainda está aberto
+        for event in segmenter.finish():
+            try:
+                await websocket.send_text(json.dumps(event))
+            except Exception:
+                break
+
+
+def record_to_pitch_data(record) -> dict:
+    """Converte um registro gravado de volta para o formato pitch_data"""
+    pitch = float(record["pitch"])
+    note_info = NoteConverter.frequency_to_note(pitch)
+    return {
+        "type": "pitch_data",
+        "pitch": pitch,
+        "note": note_info["note"],
+        "octave": note_info["octave"],
+        "cents": note_info["cents"],
+        "frequency": note_info["frequency"],
+        "timestamp": float(record["timestamp"]),
+        "amplitude": float(record["amplitude"]),
+        "demo": False,
+        "replay": True
+    }
+
+
+@app.get("/sessions")
+async def list_sessions():
+    """Sessões gravadas disponíveis para replay"""
+    return {"sessions": session_store.sessions() if session_store else []}
+
+
+@app.get("/sessions/{session_id}/history")
+async def session_history(session_id: str, start: Optional[float] = Query(None, alias="from"),
+                          stop: Optional[float] = Query(None, alias="to"),
+                          points: int = Query(500, ge=1, le=10000)):
+    """
+    Histórico de pitch da sessão entre os timestamps from e to
+    
+    Devolve no máximo `points` amostras: no zoom aberto vêm buckets
+    mín/máx/média de um nível grosso da pirâmide, no zoom fechado os frames.
+    """
+    history = histories.get(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Sessão sem histórico")
+    return {"session_id": session_id, **history.query(start, stop, points)}
+
+
+def recorded_notes(session_id: str) -> list[dict]:
+    """Notas segmentadas de uma sessão gravada (HTTPException se não existe)"""
+    try:
+        reader = session_store.open(session_id) if session_store else None
+    except ValueError:
+        reader = None
+    if reader is None:
+        raise HTTPException(status_code=404, detail="Sessão não encontrada")
+    records = reader.read(0, len(reader))
+    return segment_notes(records["timestamp"], records["pitch"])
+
+
+@app.get("/sessions/{session_id}/notes")
+async def session_notes(session_id: str):
+    """Notas (início, fim, pitch mediano) de uma sessão gravada"""
+    notes = await asyncio.to_thread(recorded_notes, session_id)
+    return {"session_id": session_id, "notes": notes}
+
+
+@app.get("/sessions/{session_id}/midi")
+async def session_midi(session_id: str, tempo: float = Query(120.0, ge=4, le=1000)):
+    """Sessão gravada exportada como Standard MIDI File"""
+    notes = await asyncio.to_thread(recorded_notes, session_id)
+    return Response(midi_file(notes, tempo=tempo, name=session_id), media_type="audio/midi",
+                    headers={"Content-Disposition": f'attachment; filename="{session_id}.mid"'})
+
+
+@app.websocket("/ws/replay/{session_id}")
+async def replay_websocket_endpoint(websocket: WebSocket, session_id: str):
+    """
+    Replay de uma sessão gravada no formato pitch_data
+    
+    Parâmetros: ?speed=1..50&from=<segundos desde o início>. Comandos:
+    {"type": "seek", "time": 12.5}, {"type": "speed", "value": 8},
+    {"type": "pause"}, {"type": "play"}. Quando vários frames caem no
+    mesmo tick (velocidades altas) eles vão juntos em {"type": "pitch_batch"}.
+    """
+    try:
+        reader = session_store.open(session_id) if session_store else None
+    except ValueError:
+        reader = None
+    if reader is None:
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        cursor = ReplayCursor(reader, float(websocket.query_params.get("speed", 1)))
+        cursor.seek(float(websocket.query_params.get("from", 0)))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    
+    def status_message() -> str:
+        return json.dumps({
+            "type": "replay_status",
+            "session_id": session_id,
+            "position": round(cursor.elapsed(), 3),
+            "duration": round(reader.duration, 3),
+            "speed": cursor.speed,
+            "playing": cursor.playing
+        })
+    
+    async def read_commands():
+        clock = ClockSync()
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.time()
+            try:
+                command = json.loads(data)
+                kind = command.get("type")
+                if kind == "seek":
+                    cursor.seek(float(command.get("time", 0)))
+                elif kind == "speed":
+                    cursor.set_speed(float(command.get("value", 1)))
+                elif kind == "pause":
+                    cursor.pause()
+                elif kind == "play":
+                    cursor.play()
+                elif kind == "ping":
+                    await websocket.send_text(json.dumps(clock.pong(command, received_at)))
+                    continue
+                else:
+                    continue
+                await websocket.send_text(status_message())
+            except (ValueError, TypeError, AttributeError):
+                pass
+    
+    commands = asyncio.create_task(read_commands())
+    try:
+        await websocket.send_text(status_message())
+        ended = False
+        while not commands.done():
+            records = cursor.advance()
+            if len(records) == 1:
+                await websocket.send_text(json.dumps(record_to_pitch_data(records[0])))
+            elif len(records) > 1:
+                await websocket.send_text(json.dumps({
+                    "type": "pitch_batch",
+                    "frames": [record_to_pitch_data(record) for record in records]
+                }))
+            
+            # Avisar uma vez quando a gravação acaba (se ela crescer, o replay continua)
+            if cursor.finished and not ended:
+                await websocket.send_text(json.dumps({"type": "replay_end", "session_id": session_id}))
+            ended = cursor.finished
+            
+            await asyncio.sleep(0.05)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        commands.cancel()
+
+
+@app.websocket("/ws/watch/{session_id}")
+async def watch_websocket_endpoint(websocket: WebSocket, session_id: str):
+    """Assiste ao pitch de uma sessão, esteja ela conectada nesta instância ou em outra"""
+    await websocket.accept()
+    channel = f"session:{session_id}"
+    
+    async def forward(frames: list[dict]):
+        # Um lote por tick; da sessão só interessa o frame mais recente
+        await websocket.send_text(json.dumps(frames[-1]))
+    
+    await backplane.subscribe(channel, forward)
+    clock = ClockSync()
+    try:
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.time()
+            try:
+                command = json.loads(data)
+                if command.get("type") == "ping":
+                    await websocket.send_text(json.dumps(clock.pong(command, received_at)))
+            except (ValueError, TypeError, AttributeError):
+                pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await backplane.unsubscribe(channel, forward)
+
+
+@app.websocket("/ws/classroom/{room}")
+async def classroom_websocket_endpoint(websocket: WebSocket, room: str):
+    """
+    Stream do professor: um frame binário por tick com todos os alunos da sala
+    
+    Comandos: {"type": "set_target", "frequency": 440} ou
+    {"type": "set_target", "note": "A", "octave": 4} (0 volta ao semitom mais próximo)
+    """
+    await websocket.accept()
+    classroom = await classrooms.join_teacher(room, websocket)
+    clock = ClockSync()
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.time()
+            try:
+                command = json.loads(data)
+                if command.get("type") == "ping":
+                    await websocket.send_text(json.dumps(clock.pong(command, received_at)))
+                elif command.get("type") == "set_target":
+                    if "note" in command:
+                        target = NoteConverter.note_to_frequency(command["note"], int(command.get("octave", 4)))
+                    else:
+                        target = float(command.get("frequency", 0))
+                    classroom.target = max(0.0, target)
+                    classroom.roster_version += 1  # reenviar o roster com o novo alvo
+            except (ValueError, TypeError, AttributeError):
+                pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await classrooms.leave_teacher(room, websocket)
+
+
+@app.websocket("/ws/tones/{channel}")
+async def tones_websocket_endpoint(websocket: WebSocket, channel: str):
+    """
+    Tons e drones de referência como PCM (mesmos blocos para todo o canal)
+    
+    Comandos: {"type": "play", "note": "A", "octave": 4, "chord": "drone",
+    "timbre": "organ", "gain": 0.3, "duration": 2.0} (ou "notes": [...] /
+    "frequency": 440) e {"type": "stop"}. Ganho fora de 0–1, duração não finita
+    ou acorde com mais de tones.MAX_VOICES vozes fazem o comando ser ignorado.
+    A query string aceita os mesmos campos para começar a tocar ao entrar
+    (?note=A&octave=4&timbre=voice).
+    Mudanças chegam a todos como "tone_state"; o áudio vem em frames binários
+    "PTTN" (ver tones.py).
+    """
+    await websocket.accept()
+    generator = await tones.join(channel, websocket)
+    clock = ClockSync()
+    
+    def play(command: dict):
+        generator.play(tone_notes(command), command.get("timbre", "sine"),
+                       float(command.get("gain", 0.3)),
+                       float(command["duration"]) if command.get("duration") else None)
+    
+    try:
+        query = dict(websocket.query_params)
+        if "note" in query or "frequency" in query:
+            try:
+                play(query)
+            except (KeyError, ValueError, TypeError, AttributeError, OverflowError):
+                pass
+        
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.time()
+            try:
+                command = json.loads(data)
+                if command.get("type") == "ping":
+                    await websocket.send_text(json.dumps(clock.pong(command, received_at)))
+                elif command.get("type") == "play":
+                    play(command)
+                elif command.get("type") == "stop":
+                    generator.stop()
+            except (KeyError, ValueError, TypeError, AttributeError, OverflowError):
+                pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await tones.leave(channel, websocket)
 
 
 @app.get("/")
-async def root():
-    """Endpoint raiz da API"""
+async def root(request: Request):
+    """Endpoint raiz da API (ou o index.html, se o frontend é servido daqui)"""
+    if frontend:
+        return frontend.response(request, "index.html")
     return {
         "message": "🎵 Pitch Training Backend API está rodando!",
         "version": "1.0.0",
@@ -317,15 +848,32 @@ async def root():
         "endpoints": {
             "notes": "/notes",
             "status": "/status", 
-            "websocket": "/ws"
+            "websocket": "/ws",
+            "watch": "/ws/watch/{session_id}",
+            "classroom": "/ws/classroom/{room}",
+            "tones": "/ws/tones/{channel}",
+            "sessions": "/sessions",
+            "history": "/sessions/{session_id}/history?from=&to=&points=",
+            "session_notes": "/sessions/{session_id}/notes",
+            "midi": "/sessions/{session_id}/midi?tempo=",
+            "melodies": "/melodies",
+            "replay": "/ws/replay/{session_id}"
         },
         "frontend": {
-            "message": "Frontend deve ser hospedado separadamente (Vercel/Netlify)",
+            "message": "Frontend deve ser hospedado separadamente (Vercel/Netlify) ou servido daqui com FRONTEND_DIST",
             "cors": "Configurado para aceitar requests de qualquer origem"
         }
     }
 
 
+if frontend:
+    # Registrada por último: as rotas da API têm precedência
+    @app.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def frontend_files(request: Request, path: str):
+        """Arquivos do build do frontend (variantes pré-comprimidas, ETag/304)"""
+        return frontend.response(request, path)
+
+
 if __name__ == "__main__":
     import uvicorn
     import os
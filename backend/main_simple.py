@@ -7,60 +7,181 @@ Detecta pitch usando análise de frequência básica sem Aubio
 import asyncio
 import json
 import math
+import os
 import threading
 import time
 from typing import Optional
 
 import numpy as np
-import sounddevice as sd
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 
+from clocksync import LatencyRegistry, capture_time
+from decimate import create_decimator
+from logs import log
+from ratelimit import CoalescingReceiver, InboundStats
+from vibrato import VibratoAnalyzer
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # sem sounddevice/PortAudio: só a captura local fica indisponível
+    sd = None
+
+
+def _rfft_supports_out() -> bool:
+    """
+    np.fft.rfft só aceita out= a partir do NumPy 2.0
+    
+    Com o NumPy 1.x fixado em requirements.txt a FFT cai no caminho com um
+    array temporário por bloco; o caminho sem alocações precisa do NumPy 2.
+    """
+    try:
+        np.fft.rfft(np.zeros(4), out=np.empty(3, dtype=np.complex128))
+        return True
+    except TypeError:
+        return False
+
+
+RFFT_SUPPORTS_OUT = _rfft_supports_out()
+
 
 class SimplePitchDetector:
     """Detector de pitch simples usando FFT"""
     
-    def __init__(self, sample_rate: int = 44100, buffer_size: int = 4096):
+    # Janelas de Hanning já calculadas, por tamanho de bloco
+    _windows: dict[int, np.ndarray] = {}
+    
+    # Estimadores da posição do pico entre bins
+    INTERPOLATIONS = ("none", "parabolic", "gaussian")
+    
+    def __init__(self, sample_rate: int = 44100, buffer_size: int = 4096,
+                 interpolation: str = "gaussian", zero_padding: int = 2, decimation: int = 1):
+        if interpolation not in self.INTERPOLATIONS:
+            raise ValueError(f"Interpolação desconhecida: {interpolation}")
+        
         self.sample_rate = sample_rate
         self.buffer_size = buffer_size
+        self.interpolation = interpolation
+        
+        # FFT com zero-padding: tamanho = bloco × fator (bins mais estreitos, mesma latência)
+        self.zero_padding = max(1, int(zero_padding))
+        
+        # Decimação opcional antes da FFT (ex.: 4 -> 11.025 kHz, mesma janela de tempo)
+        self.decimator = create_decimator(decimation, block_size=buffer_size // 4)
+        self.detection_rate = sample_rate / self.decimator.factor if self.decimator else sample_rate
+        
         self.current_pitch = 0.0
+        self.current_capture_time = 0.0
         self.is_recording = False
         
+        # Buffers de trabalho reutilizados a cada bloco (criados no primeiro bloco de cada tamanho)
+        self._scratch: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    
+    @classmethod
+    def hanning_window(cls, size: int) -> np.ndarray:
+        """Janela de Hanning calculada uma única vez por tamanho"""
+        window = cls._windows.get(size)
+        if window is None:
+            window = cls._windows[size] = np.hanning(size)
+            window.flags.writeable = False
+        return window
+    
+    def _buffers(self, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Buffers (janelado, espectro, magnitude) para blocos de `size` amostras
+        
+        Em float64: o np.fft.rfft só roda sem buffer interno de conversão em
+        precisão dupla (com float32 ele converte e aloca a cada chamada).
+        O buffer janelado tem o tamanho da FFT; a parte além do bloco fica
+        sempre em zero (zero-padding).
+        """
+        buffers = self._scratch.get(size)
+        if buffers is None:
+            fft_size = size * self.zero_padding
+            buffers = self._scratch[size] = (
+                np.zeros(fft_size),
+                np.empty(fft_size // 2 + 1, dtype=np.complex128),
+                np.empty(fft_size // 2 + 1)
+            )
+        return buffers
+    
+    def _interpolate_peak(self, magnitude: np.ndarray, peak_index: int) -> float:
+        """
+        Posição fracionária do pico, em bins
+        
+        Ajusta uma parábola aos três bins em torno do máximo (na magnitude, ou
+        no log da magnitude para o estimador gaussiano, exato para um pico
+        gaussiano e muito próximo disso para a janela de Hanning).
+        """
+        if self.interpolation == "none" or peak_index <= 0 or peak_index >= len(magnitude) - 1:
+            return float(peak_index)
+        
+        left = float(magnitude[peak_index - 1])
+        center = float(magnitude[peak_index])
+        right = float(magnitude[peak_index + 1])
+        
+        if self.interpolation == "gaussian":
+            if left <= 0 or right <= 0:
+                return float(peak_index)
+            left, center, right = math.log(left), math.log(center), math.log(right)
+        
+        denominator = left - 2 * center + right
+        if denominator >= 0:
+            return float(peak_index)
+        
+        return peak_index + 0.5 * (left - right) / denominator
+        
     def detect_pitch_fft(self, audio_data):
-        """Detecta pitch usando FFT"""
+        """Detecta pitch usando FFT (sem alocar arrays em regime permanente)"""
+        size = len(audio_data)
+        windowed, spectrum, magnitude = self._buffers(size)
+        block = windowed[:size]
+        
         # Aplicar janela de Hanning para reduzir vazamento espectral
-        windowed = audio_data * np.hanning(len(audio_data))
+        # (copyto converte float32 -> float64 sem o buffer de conversão do ufunc)
+        np.copyto(block, audio_data)
+        block *= self.hanning_window(size)
         
-        # Calcular FFT
-        fft = np.fft.rfft(windowed)
-        magnitude = np.abs(fft)
+        # Calcular FFT direto no buffer do espectro (NumPy 2; no 1.x aloca o resultado)
+        if RFFT_SUPPORTS_OUT:
+            np.fft.rfft(windowed, out=spectrum)
+        else:
+            spectrum[:] = np.fft.rfft(windowed)
+        np.abs(spectrum, out=magnitude)
         
         # Encontrar o pico de frequência
-        peak_index = np.argmax(magnitude)
+        peak_index = int(magnitude.argmax())
         
-        # Converter índice para frequência
-        frequency = peak_index * self.sample_rate / len(audio_data)
+        # Converter a posição do pico (com precisão abaixo de um bin) para frequência
+        frequency = self._interpolate_peak(magnitude, peak_index) * self.detection_rate / len(windowed)
         
         # Filtrar frequências irrelevantes
         if frequency < 80 or frequency > 2000:
             return 0.0
         
         # Verificar se o pico é significativo
-        if magnitude[peak_index] < np.mean(magnitude) * 3:
+        if magnitude[peak_index] < magnitude.mean() * 3:
             return 0.0
         
         return frequency
     
     def start_recording(self):
         """Inicia a captura de áudio"""
+        if sd is None:
+            raise RuntimeError("sounddevice/PortAudio não disponível para captura local")
         self.is_recording = True
         
-        def audio_callback(indata, frames, time, status):
+        def audio_callback(indata, frames, time_info, status):
             if status:
-                print(f"Áudio status: {status}")
+                log.warning("Áudio status", status=status)
+            
+            # Horário de captura do bloco, pelo relógio do PortAudio
+            self.current_capture_time = capture_time(time_info, frames, self.sample_rate)
             
-            # Converter para float32 e mono
-            audio_data = indata[:, 0].astype(np.float32)
+            # Canal mono como view (sem cópia quando a entrada já é float32)
+            audio_data = np.asarray(indata[:, 0], dtype=np.float32)
+            if self.decimator:
+                audio_data = self.decimator.process(audio_data)
             
             # Detectar pitch usando FFT
             pitch = self.detect_pitch_fft(audio_data)
@@ -152,9 +273,12 @@ class ConnectionManager:
     
     def __init__(self):
         self.active_connections: list[WebSocket] = []
-        self.pitch_detector = SimplePitchDetector()
+        self.pitch_detector = SimplePitchDetector(decimation=int(os.environ.get("PITCH_DECIMATION", 1)))
         self.is_broadcasting = False
         
+        # Contadores agregados de mensagens recebidas/coalescidas
+        self.inbound_stats = InboundStats()
+        
     async def connect(self, websocket: WebSocket):
         """Aceita uma nova conexão WebSocket"""
         await websocket.accept()
@@ -201,6 +325,13 @@ app.add_middleware(
 # Gerenciador de conexões
 manager = ConnectionManager()
 
+# Limite de mensagens audio_data processadas por conexão (por segundo / rajada)
+AUDIO_DATA_RATE = float(os.environ.get("AUDIO_DATA_RATE", 30))
+AUDIO_DATA_BURST = float(os.environ.get("AUDIO_DATA_BURST", 10))
+
+# Offset de relógio, RTT e latência por estágio de cada cliente conectado
+latency = LatencyRegistry()
+
 
 @app.get("/")
 async def root():
@@ -224,22 +355,46 @@ async def get_notes():
     return {"notes": notes}
 
 
+@app.get("/status")
+async def status():
+    """Status da aplicação, contadores de entrada e latência por cliente"""
+    return {
+        "status": "running",
+        "connections": len(manager.active_connections),
+        "inbound": {
+            **manager.inbound_stats.as_dict(),
+            "rate_limit": AUDIO_DATA_RATE,
+            "burst": AUDIO_DATA_BURST
+        },
+        "latency": latency.stats(),
+        "logging": log.stats()
+    }
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Endpoint WebSocket para transmissão de dados de pitch"""
     await manager.connect(websocket)
     
+    # Leitura em segundo plano com limite de taxa e coalescência de audio_data
+    receiver = CoalescingReceiver(websocket, AUDIO_DATA_RATE, AUDIO_DATA_BURST,
+                                  totals=manager.inbound_stats)
+    receiver.start()
+    client_id, clock = latency.register()
+    vibrato = VibratoAnalyzer()
+    
     try:
         while True:
-            # Receber dados do cliente
-            data = await websocket.receive_text()
+            # Receber dados do cliente (já decodificados)
+            message = await receiver.receive()
             
             # Processar comandos do cliente
             try:
-                message = json.loads(data)
-                
                 if message.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    await websocket.send_text(json.dumps(clock.pong(message, message["received_at"])))
+                
+                elif message.get("type") == "frame_displayed":
+                    clock.record_display(message)
                 
                 elif message.get("type") == "audio_data":
                     # Processar dados de áudio do frontend
@@ -247,6 +402,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     amplitude = message.get("amplitude", 0)
                     timestamp = message.get("timestamp", time.time())
                     
+                    # Captura no navegador, convertida para o relógio do servidor
+                    captured_at = clock.to_server_time(timestamp) if "timestamp" in message else None
+                    if captured_at is not None:
+                        clock.record("uplink", message["received_at"] - captured_at)
+                    
                     if frequency > 0:
                         # Converter para nota
                         note_info = NoteConverter.frequency_to_note(frequency)
@@ -262,19 +422,34 @@ async def websocket_endpoint(websocket: WebSocket):
                             "timestamp": timestamp
                         }
                         
+                        # Ecoar o número de sequência do cliente (medição de round trip)
+                        if "seq" in message:
+                            pitch_data["seq"] = message["seq"]
+                        if captured_at is not None:
+                            pitch_data["capture_time"] = captured_at
+                        
+                        # Vibrato (taxa e extensão) sobre a janela recente do contorno
+                        vibrato_info = vibrato.add(timestamp, frequency)
+                        if vibrato_info:
+                            pitch_data["vibrato"] = vibrato_info
+                        
                         # Enviar dados processados de volta
                         await websocket.send_text(json.dumps(pitch_data))
+                        clock.record("server", time.time() - message["received_at"])
                         
-            except json.JSONDecodeError:
-                print("Erro ao decodificar JSON do WebSocket")
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
-                print(f"Erro ao processar mensagem WebSocket: {e}")
+                log.error("Erro ao processar mensagem WebSocket", error=e)
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"Erro WebSocket: {e}")
+        log.error("Erro WebSocket", error=e)
         manager.disconnect(websocket)
+    finally:
+        receiver.stop()
+        latency.remove(client_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Exercícios de melodia - alinhamento em tempo real com DTW em banda
+
+O servidor guarda a melodia de referência (notas e durações) expandida em
+frames e alinha o contorno de pitch do aluno a ela com dynamic time warping
+incremental: cada frame recebido calcula só uma coluna da matriz de DTW,
+restrita a uma banda em torno da posição atual do alinhamento. O trabalho
+por frame é O(banda) e uma música inteira custa O(N·banda), não O(N·M).
+
+A coluna é vetorizada: a recorrência D[j] = custo[j] + min(D'[j], D'[j-1],
+D[j-1]) tem o termo horizontal D[j-1] dentro da própria coluna, mas com
+C = soma acumulada dos custos ela vira D = C + mínimo acumulado de
+(custo + min(D'[j], D'[j-1]) - C).
+
+Conforme o alinhamento passa de uma nota para a seguinte, a nota é fechada
+e reportada com precisão (cents) e desvio de tempo do ataque.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+
+# Exercícios prontos: (nota MIDI, duração em segundos)
+EXERCISES = {
+    "c_major_scale": [(midi, 0.5) for midi in (60, 62, 64, 65, 67, 69, 71, 72)],
+    "c_major_arpeggio": [(60, 0.6), (64, 0.6), (67, 0.6), (72, 1.0), (67, 0.6), (64, 0.6), (60, 1.0)],
+    "a_minor_pentatonic": [(midi, 0.5) for midi in (57, 60, 62, 64, 67, 69, 67, 64, 62, 60, 57)],
+    "happy_birthday": [(60, 0.375), (60, 0.125), (62, 0.5), (60, 0.5), (65, 0.5), (64, 1.0),
+                       (60, 0.375), (60, 0.125), (62, 0.5), (60, 0.5), (67, 0.5), (65, 1.0)]
+}
+
+# Limites de uma melodia enviada pelo cliente (a referência vira arrays em memória)
+MAX_NOTES = 256
+MAX_NOTE_DURATION = 30.0
+MAX_MELODY_DURATION = 600.0
+
+
+def frequency_to_midi(frequency: float) -> float:
+    """Frequência (Hz) para número de nota MIDI fracionário"""
+    return 69 + 12 * math.log2(frequency / 440.0)
+
+
+class MelodyScorer:
+    """
+    Alinhador incremental de um contorno de pitch a uma melodia de referência
+
+    add() recebe um frame (timestamp, frequência) e devolve os eventos
+    gerados: notas fechadas ("melody_note") e, no fim, o resultado
+    ("melody_result"). `current` traz a nota esperada e o desvio do frame.
+    """
+
+    def __init__(self, notes: list[tuple[float, float]], frame_rate: float = 20.0, band: int = 40,
+                 max_cost: float = 3.0, in_tune_cents: float = 50.0, end_grace: float = 2.0):
+        if not notes:
+            raise ValueError("Melodia vazia")
+        if len(notes) > MAX_NOTES:
+            raise ValueError(f"Melodia com mais de {MAX_NOTES} notas")
+        for midi, duration in notes:
+            if not math.isfinite(midi) or not 0 <= midi <= 127:
+                raise ValueError(f"Nota MIDI inválida: {midi}")
+            if not math.isfinite(duration) or not 0 < duration <= MAX_NOTE_DURATION:
+                raise ValueError(f"Duração inválida: {duration} (0–{MAX_NOTE_DURATION} s)")
+        if sum(duration for _, duration in notes) > MAX_MELODY_DURATION:
+            raise ValueError(f"Melodia com mais de {MAX_MELODY_DURATION} s")
+
+        self.note_midi = np.array([midi for midi, _ in notes], dtype=np.float64)
+        durations = np.array([duration for _, duration in notes], dtype=np.float64)
+        self.note_onsets = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+        self.total_duration = float(durations.sum())
+        self.last_duration = float(durations[-1])
+
+        # Referência em frames: cada nota ocupa duração × frame_rate frames
+        frames = np.maximum(1, np.round(durations * frame_rate)).astype(np.intp)
+        self.reference = np.repeat(self.note_midi, frames)
+        self.reference_note = np.repeat(np.arange(len(notes)), frames)
+
+        self.band = band
+        self.max_cost = max_cost
+        self.in_tune_cents = in_tune_cents
+        self.end_grace = end_grace
+
+        # Coluna anterior da DTW, válida para os índices de referência [lo, lo + len)
+        self.column: Optional[np.ndarray] = None
+        self.lo = 0
+        self.frames = 0
+        self.position = 0
+        self.start_time: Optional[float] = None
+        self.finished = False
+        self.current: dict = {}
+
+        # Acumuladores por nota
+        count = len(notes)
+        self.note_frames = np.zeros(count, dtype=np.int64)
+        self.note_cents_sum = np.zeros(count)
+        self.note_abs_cents_sum = np.zeros(count)
+        self.note_in_tune = np.zeros(count, dtype=np.int64)
+        self.note_first_time = np.full(count, np.nan)
+        self.closed_notes = 0
+        self.results: list[dict] = []
+
+    def _step(self, midi: float) -> int:
+        """Calcula a próxima coluna da DTW na banda e retorna a posição alinhada"""
+        length = len(self.reference)
+        if self.column is None:
+            lo, hi = 0, min(length, self.band + 1)
+        else:
+            lo = max(self.lo, self.position - self.band)
+            hi = min(length, self.position + self.band + 1)
+
+        cost = np.minimum(np.abs(self.reference[lo:hi] - midi), self.max_cost)
+
+        if self.column is None:
+            # O caminho começa no primeiro frame da referência
+            entry = np.full(hi - lo, np.inf)
+            entry[0] = cost[0]
+        else:
+            # Coluna anterior reindexada para a banda atual (inf fora da banda antiga)
+            previous = np.full(hi - lo + 1, np.inf)
+            start = max(lo - 1, self.lo)
+            stop = min(hi, self.lo + len(self.column))
+            if stop > start:
+                previous[start - lo + 1:stop - lo + 1] = self.column[start - self.lo:stop - self.lo]
+            # previous[k + 1] = D'[lo + k], previous[k] = D'[lo + k - 1]
+            entry = cost + np.minimum(previous[1:], previous[:-1])
+
+        cumulative = np.cumsum(cost)
+        column = cumulative + np.minimum.accumulate(entry - cumulative)
+
+        self.column = column
+        self.lo = lo
+        self.frames += 1
+
+        # Melhor posição: custo acumulado normalizado pelo comprimento do caminho
+        normalized = column / (self.frames + np.arange(lo, hi) + 1)
+        return lo + int(np.argmin(normalized))
+
+    def add(self, timestamp: float, frequency: float) -> list[dict]:
+        """Processa um frame de pitch (frequência <= 0 = sem voz)"""
+        if self.finished:
+            return []
+
+        events = []
+        if frequency > 0:
+            if self.start_time is None:
+                self.start_time = timestamp
+
+            midi = frequency_to_midi(frequency)
+            self.position = max(self.position, self._step(midi))
+            note = max(int(self.reference_note[self.position]), self.closed_notes)
+
+            # Notas que o alinhamento deixou para trás estão completas
+            while self.closed_notes < note:
+                events.append(self._close_note(self.closed_notes))
+
+            cents = (midi - self.note_midi[note]) * 100
+            self.note_frames[note] += 1
+            self.note_cents_sum[note] += cents
+            self.note_abs_cents_sum[note] += abs(cents)
+            self.note_in_tune[note] += abs(cents) <= self.in_tune_cents
+            if math.isnan(self.note_first_time[note]):
+                self.note_first_time[note] = timestamp
+
+            self.current = {"note_index": note, "target_midi": float(self.note_midi[note]),
+                            "cents_error": round(float(cents), 1)}
+
+        # Fim: a última nota já durou o previsto (mais uma folga), ou o dobro da melodia passou
+        last_onset = self.note_first_time[-1]
+        if self.start_time is not None and (
+                (not math.isnan(last_onset) and timestamp - last_onset > self.last_duration + self.end_grace)
+                or timestamp - self.start_time > 2 * self.total_duration + self.end_grace):
+            events.extend(self.finish())
+        return events
+
+    def _close_note(self, index: int) -> dict:
+        """Fecha uma nota e monta seu evento"""
+        self.closed_notes = index + 1
+        frames = int(self.note_frames[index])
+        onset_offset = None
+        if frames and self.start_time is not None:
+            expected = self.start_time + self.note_onsets[index]
+            onset_offset = round(float(self.note_first_time[index] - expected) * 1000)
+
+        result = {
+            "type": "melody_note",
+            "index": index,
+            "target_midi": float(self.note_midi[index]),
+            "frames": frames,
+            "accuracy": round(float(self.note_in_tune[index]) / frames, 3) if frames else 0.0,
+            "mean_cents": round(float(self.note_cents_sum[index]) / frames, 1) if frames else None,
+            "mean_abs_cents": round(float(self.note_abs_cents_sum[index]) / frames, 1) if frames else None,
+            "onset_offset_ms": onset_offset
+        }
+        self.results.append(result)
+        return result
+
+    def finish(self) -> list[dict]:
+        """Fecha as notas restantes e devolve o resultado final"""
+        if self.finished:
+            return []
+        self.finished = True
+
+        events = [self._close_note(index) for index in range(self.closed_notes, len(self.note_midi))]
+        sung = [result for result in self.results if result["frames"]]
+        frames = int(self.note_frames.sum())
+        events.append({
+            "type": "melody_result",
+            "notes": len(self.results),
+            "notes_sung": len(sung),
+            "accuracy": round(float(self.note_in_tune.sum()) / frames, 3) if frames else 0.0,
+            "mean_abs_cents": round(float(self.note_abs_cents_sum.sum()) / frames, 1) if frames else None,
+            "mean_abs_onset_ms": round(float(np.mean([abs(result["onset_offset_ms"]) for result in sung])))
+                                 if sung else None
+        })
+        return events
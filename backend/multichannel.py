@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Captura multicanal - Detecta o pitch de vários microfones de uma vez
+
+Cada canal da interface de áudio é tratado como um cantor separado. A detecção
+é feita em lote sobre uma matriz (canais × amostras), com uma única FFT
+vetorizada para todos os canais, em vez de um detector por canal.
+"""
+
+import numpy as np
+import sounddevice as sd
+
+from clocksync import capture_time
+from logs import log
+
+
+def fast_fft_size(minimum: int) -> int:
+    """Menor tamanho >= minimum da forma 2^a·3^b·5^c (rápido para o pocketfft)"""
+    best = 1 << int(np.ceil(np.log2(minimum)))
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            size = power35
+            while size < minimum:
+                size *= 2
+            best = min(best, size)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+class BatchPitchDetector:
+    """Detector de pitch vetorizado por autocorrelação (vários canais por chamada)"""
+
+    def __init__(self, channels: int, sample_rate: int = 44100, buffer_size: int = 4096,
+                 min_frequency: float = 80.0, max_frequency: float = 2000.0,
+                 threshold: float = 0.5, silence_threshold: float = 1e-4):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.threshold = threshold
+        self.silence_threshold = silence_threshold
+
+        # Faixa de lags correspondente à faixa vocal (80-2000 Hz)
+        self.min_lag = max(2, int(sample_rate / max_frequency))
+        self.max_lag = min(buffer_size - 2, int(np.ceil(sample_rate / min_frequency)))
+
+        # Zero-padding só até N + max_lag: os lags usados não sofrem aliasing circular
+        self.fft_size = fast_fft_size(buffer_size + self.max_lag + 1)
+
+        # Janela pré-calculada, com formato (1 × N) para broadcast sobre os canais
+        self.window = np.hanning(buffer_size).astype(np.float32)[np.newaxis, :]
+
+    def detect(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Detecta o pitch de todos os canais
+
+        frames: matriz (canais × amostras). Retorna (pitches, confianças), com
+        pitch 0.0 nos canais sem voz.
+        """
+        pitches = np.zeros(frames.shape[0], dtype=np.float32)
+        confidences = np.zeros(frames.shape[0], dtype=np.float32)
+
+        # Canais em silêncio (energia média baixa) não entram na FFT
+        energy = np.einsum('ij,ij->i', frames, frames) / frames.shape[1]
+        active = np.flatnonzero(energy > self.silence_threshold ** 2)
+        if active.size == 0:
+            return pitches, confidences
+
+        windowed = frames[active] * self.window
+        rows = np.arange(active.size)
+
+        # Autocorrelação de todos os canais numa só FFT: r = IFFT(|FFT(x)|²)
+        spectrum = np.fft.rfft(windowed, n=self.fft_size, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        corr = np.fft.irfft(power, n=self.fft_size, axis=1)
+
+        # Normalizar pela energia (lag 0), só na faixa de lags que interessa
+        region = corr[:, self.min_lag:self.max_lag + 1] / np.maximum(corr[:, :1], 1e-10)
+        best = region.max(axis=1)
+
+        # Primeiro pico local próximo do máximo global (evita erros de oitava)
+        inner = region[:, 1:-1]
+        peaks = ((inner > region[:, :-2]) & (inner >= region[:, 2:])
+                 & (inner >= (0.9 * best)[:, np.newaxis]))
+        lags = peaks.argmax(axis=1) + 1
+
+        # Interpolação parabólica em torno do pico para precisão sub-amostra
+        left = region[rows, lags - 1]
+        center = region[rows, lags]
+        right = region[rows, lags + 1]
+
+        denominator = left - 2 * center + right
+        offset = np.divide(0.5 * (left - right), denominator,
+                           out=np.zeros_like(center), where=np.abs(denominator) > 1e-12)
+        period = lags + self.min_lag + np.clip(offset, -0.5, 0.5)
+
+        confidence = np.clip(center, 0.0, 1.0)
+        voiced = (confidence >= self.threshold) & peaks.any(axis=1)
+
+        pitches[active] = np.where(voiced, self.sample_rate / period, 0.0)
+        confidences[active] = confidence
+
+        return pitches, confidences
+
+
+class MultiChannelPitchDetector:
+    """Captura N canais de uma interface de áudio e detecta o pitch de cada um"""
+
+    def __init__(self, channels: int = 8, sample_rate: int = 44100, buffer_size: int = 4096,
+                 device=None):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.hop_size = buffer_size // 4
+        self.device = device
+
+        self.detector = BatchPitchDetector(channels, sample_rate, buffer_size)
+
+        # Janela deslizante (canais × amostras) com os últimos buffer_size samples
+        self.audio_buffer = np.zeros((channels, buffer_size), dtype=np.float32)
+        self.current_pitches = np.zeros(channels, dtype=np.float32)
+        self.current_confidences = np.zeros(channels, dtype=np.float32)
+        self.current_capture_time = 0.0
+        self.is_recording = False
+
+    def process_block(self, block: np.ndarray):
+        """Processa um bloco (amostras × canais) vindo do sounddevice"""
+        frames = block.shape[0]
+
+        # Deslocar a janela e copiar o bloco novo (transposto) no final
+        self.audio_buffer[:, :-frames] = self.audio_buffer[:, frames:]
+        self.audio_buffer[:, -frames:] = block.T
+
+        pitches, confidences = self.detector.detect(self.audio_buffer)
+
+        # Troca de referência atômica: leitores nunca veem um array pela metade
+        self.current_pitches = pitches
+        self.current_confidences = confidences
+
+    def start_recording(self):
+        """Inicia a captura de áudio multicanal"""
+        self.is_recording = True
+
+        def audio_callback(indata, frames, time_info, status):
+            if status:
+                log.warning("Áudio status", status=status)
+
+            self.current_capture_time = capture_time(time_info, frames, self.sample_rate)
+            self.process_block(indata)
+
+        # Iniciar stream de áudio com todos os canais
+        self.stream = sd.InputStream(
+            callback=audio_callback,
+            device=self.device,
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            blocksize=self.hop_size,
+            dtype=np.float32
+        )
+        self.stream.start()
+
+    def stop_recording(self):
+        """Para a captura de áudio"""
+        self.is_recording = False
+        if hasattr(self, 'stream'):
+            self.stream.stop()
+            self.stream.close()
+
+    def get_current_pitch(self, channel: int) -> float:
+        """Retorna o pitch atual de um canal"""
+        return float(self.current_pitches[channel])
+
+    def get_current_pitches(self) -> np.ndarray:
+        """Retorna os pitches atuais de todos os canais"""
+        return self.current_pitches
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Detecção polifônica - Estima várias notas simultâneas (duetos, acordes)
+
+Calcula um espectro de saliência harmônica sobre uma grade logarítmica de
+frequências candidatas: a saliência de cada candidata é a soma ponderada das
+magnitudes nos bins dos seus harmônicos. As matrizes candidata → bins dos
+harmônicos são calculadas uma única vez no construtor; cada frame custa apenas
+uma FFT e alguns "gathers" vetorizados com NumPy.
+"""
+
+import numpy as np
+
+
+class PolyphonicPitchDetector:
+    """Detector de múltiplos pitches por espectro de saliência harmônica"""
+
+    def __init__(self, sample_rate: int = 44100, frame_size: int = 4096,
+                 max_voices: int = 3, harmonics: int = 6,
+                 min_frequency: float = 80.0, max_frequency: float = 2000.0,
+                 cents_resolution: float = 10.0, threshold: float = 0.5):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.max_voices = max_voices
+        self.harmonics = harmonics
+        self.threshold = threshold
+
+        self.window = np.hanning(frame_size).astype(np.float32)
+        self.bin_width = sample_rate / frame_size
+        n_bins = frame_size // 2 + 1
+
+        # Grade logarítmica de frequências candidatas
+        n_candidates = int(1200 * np.log2(max_frequency / min_frequency) / cents_resolution) + 1
+        self.candidates = min_frequency * 2 ** (np.arange(n_candidates) * cents_resolution / 1200)
+
+        # Matriz (candidatas × harmônicos × 3): bin de cada harmônico e seus vizinhos,
+        # já que o lóbulo principal da janela de Hann ocupa mais de um bin
+        harmonic_freqs = self.candidates[:, np.newaxis] * np.arange(1, harmonics + 1)
+        center_bins = np.rint(harmonic_freqs / self.bin_width).astype(np.intp)
+        self.harmonic_bins = np.clip(center_bins[:, :, np.newaxis] + np.array([-1, 0, 1]),
+                                     0, n_bins - 1)
+
+        # Vizinhos valem menos que o bin central, desempatando candidatas próximas
+        self.neighbor_weights = np.array([0.7, 1.0, 0.7])
+
+        # Peso decrescente por harmônico; harmônicos acima de Nyquist não contam
+        weights = 0.84 ** np.arange(harmonics)
+        self.harmonic_weights = np.where(center_bins < n_bins - 1, weights, 0.0)
+
+        # Bins do harmônico 1 de cada candidata (para exigir energia na fundamental)
+        self.fundamental_bins = self.harmonic_bins[:, 0, :]
+
+        # Bins cancelados após encontrar uma voz: lóbulo principal inteiro (±2 bins)
+        self.cancel_bins = np.clip(center_bins[:, :, np.newaxis] + np.arange(-2, 3),
+                                   0, n_bins - 1).reshape(n_candidates, -1)
+        self.center_bins = np.clip(center_bins, 1, n_bins - 2)
+
+        self.log_candidates = np.log2(self.candidates)
+
+    def salience(self, magnitude: np.ndarray) -> np.ndarray:
+        """Saliência harmônica de todas as candidatas para um espectro de magnitude"""
+        harmonic_magnitude = (magnitude[self.harmonic_bins] * self.neighbor_weights).max(axis=2)
+        salience = np.einsum('ch,ch->c', harmonic_magnitude, self.harmonic_weights)
+
+        # Candidatas sem energia na fundamental são sub-harmônicos espúrios
+        fundamental = magnitude[self.fundamental_bins].max(axis=1)
+        return np.where(fundamental > 0.1 * harmonic_magnitude.max(axis=1), salience, 0.0)
+
+    def detect(self, audio_data: np.ndarray) -> list[tuple[float, float]]:
+        """
+        Detecta até max_voices pitches simultâneos em um frame
+
+        Retorna uma lista de (frequência, confiança), da voz mais saliente para
+        a menos saliente. A confiança compara a saliência da voz com a saliência
+        mediana do frame (0 = ruído, 1 = pico isolado).
+        """
+        spectrum = np.fft.rfft(audio_data[-self.frame_size:] * self.window)
+        magnitude = np.sqrt(np.abs(spectrum))  # compressão reduz o domínio de uma só voz
+
+        if magnitude.max() <= 1e-6:
+            return []
+
+        voices = []
+        noise_floor = None
+        strongest = None
+        taken = np.zeros(len(self.candidates), dtype=bool)
+        for _ in range(self.max_voices):
+            salience = self.salience(magnitude)
+            salience[taken] = 0.0
+            best = int(np.argmax(salience))
+            if salience[best] <= 0:
+                break
+
+            # Contraste contra o ruído de fundo (saliência mediana do frame original),
+            # atenuado para vozes muito mais fracas que a principal (resíduos de lóbulos)
+            if noise_floor is None:
+                noise_floor = float(np.median(salience))
+                strongest = float(salience[best])
+            confidence = (1.0 - noise_floor / float(salience[best])) * \
+                min(1.0, 2.0 * float(salience[best]) / strongest)
+            if confidence < self.threshold:
+                break
+
+            frequency = self._refine(magnitude, best)
+            voices.append((frequency, confidence))
+
+            # Candidatas a menos de um semitom da voz encontrada são a mesma voz
+            taken |= np.abs(self.log_candidates - np.log2(frequency)) < 1 / 12
+            taken |= np.abs(self.center_bins[:, 0] - self.center_bins[best, 0]) <= 1
+
+            # Cancelar os harmônicos da voz encontrada antes da próxima iteração
+            magnitude[self.cancel_bins[best]] = 0.0
+
+        return voices
+
+    def _refine(self, magnitude: np.ndarray, index: int) -> float:
+        """
+        Refina a frequência da candidata usando os picos dos seus harmônicos
+
+        Cada harmônico tem seu pico interpolado (parábola sobre a log-magnitude)
+        e dividido pela ordem do harmônico; a estimativa final é a média
+        ponderada pela magnitude, o que dá resolução bem menor que um bin.
+        """
+        bins = self.center_bins[index]
+        neighbors = bins[:, np.newaxis] + np.array([-1, 0, 1])
+
+        # Ajustar cada bin para o maior vizinho (pico local do harmônico)
+        peaks = neighbors[np.arange(len(bins)), magnitude[neighbors].argmax(axis=1)]
+        peaks = np.clip(peaks, 1, len(magnitude) - 2)
+
+        left = np.log(magnitude[peaks - 1] + 1e-12)
+        center = np.log(magnitude[peaks] + 1e-12)
+        right = np.log(magnitude[peaks + 1] + 1e-12)
+        denominator = left - 2 * center + right
+        offset = np.divide(0.5 * (left - right), denominator,
+                           out=np.zeros_like(center), where=np.abs(denominator) > 1e-12)
+
+        orders = np.arange(1, self.harmonics + 1)
+        estimates = (peaks + np.clip(offset, -0.5, 0.5)) * self.bin_width / orders
+        weights = magnitude[peaks] * self.harmonic_weights[index]
+
+        # Só harmônicos coerentes com o mais forte (±50 cents) entram na média
+        reference = estimates[np.argmax(weights)]
+        coherent = np.abs(1200 * np.log2(estimates / reference)) < 50
+        weights = np.where(coherent, weights, 0.0)
+        if weights.sum() <= 0:
+            return float(self.candidates[index])
+        return float(np.dot(estimates, weights) / weights.sum())
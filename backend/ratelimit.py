@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Controle de fluxo de entrada do WebSocket - token bucket e coalescência
+
+Cada conexão tem um token bucket que limita quantas mensagens audio_data são
+processadas por segundo. Enquanto o handler espera por um token, as
+mensagens audio_data que chegam são coalescidas: só a mais recente é mantida,
+as anteriores são descartadas e contadas. Mensagens de controle (ping etc.)
+nunca são descartadas: se um cliente acumula mais de `max_control` delas sem
+que o handler as consuma, a conexão é fechada (1008) em vez de perder
+comandos. Um segundo limite, bem mais alto, pausa a leitura do socket quando
+um cliente inunda o servidor, deixando o TCP segurar o envio.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+class TokenBucket:
+    """Token bucket clássico: `rate` tokens por segundo, até `burst` acumulados"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+
+    def _refill(self):
+        """Repõe os tokens proporcionalmente ao tempo decorrido"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        """Tenta consumir tokens; retorna False se não houver suficientes"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Segundos até haver tokens suficientes"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class InboundStats:
+    """Contadores de mensagens de entrada (por conexão ou agregados)"""
+
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.throttled_reads = 0
+        self.control_overflows = 0
+
+    def as_dict(self) -> dict:
+        """Representação para endpoints de status"""
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "throttled_reads": self.throttled_reads,
+            "control_overflows": self.control_overflows
+        }
+
+
+class CoalescingReceiver:
+    """
+    Lê mensagens de um WebSocket em segundo plano e entrega ao handler com
+    limite de taxa e coalescência de audio_data
+    """
+
+    def __init__(self, websocket: WebSocket, rate: float = 30.0, burst: float = 10.0,
+                 flood_factor: float = 10.0, totals: Optional[InboundStats] = None, max_control: int = 256):
+        self.websocket = websocket
+        self.bucket = TokenBucket(rate, burst)
+
+        # Limite de leitura do socket: acima disso a leitura pausa (backpressure no TCP)
+        self.read_bucket = TokenBucket(rate * flood_factor, burst * flood_factor)
+
+        self.stats = InboundStats()
+        self.totals = totals
+        self.latest_audio: Optional[dict] = None
+        self.control: deque = deque()
+        self.max_control = max_control
+        self.closed: Optional[Exception] = None
+        self.ready = asyncio.Event()
+        self.reader_task = None
+
+    def start(self):
+        """Inicia a tarefa de leitura do socket"""
+        self.reader_task = asyncio.create_task(self._reader())
+
+    def stop(self):
+        """Cancela a tarefa de leitura"""
+        if self.reader_task:
+            self.reader_task.cancel()
+
+    def _count(self, field: str):
+        """Incrementa um contador da conexão e o agregado do servidor"""
+        setattr(self.stats, field, getattr(self.stats, field) + 1)
+        if self.totals is not None:
+            setattr(self.totals, field, getattr(self.totals, field) + 1)
+
+    async def _reader(self):
+        """Lê o socket continuamente, guardando só o audio_data mais recente"""
+        try:
+            while True:
+                if not self.read_bucket.consume():
+                    self._count("throttled_reads")
+                    await asyncio.sleep(self.read_bucket.wait_time())
+
+                text = await self.websocket.receive_text()
+                self._count("received")
+
+                try:
+                    message = json.loads(text)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                message["received_at"] = time.time()
+
+                if message.get("type") == "audio_data":
+                    if self.latest_audio is not None:
+                        self._count("coalesced")
+                    self.latest_audio = message
+                elif len(self.control) >= self.max_control:
+                    # Fila de controle cheia: fecha a conexão em vez de descartar comandos
+                    self._count("control_overflows")
+                    await self.websocket.close(code=1008)
+                    raise WebSocketDisconnect(code=1008)
+                else:
+                    self.control.append(message)
+                self.ready.set()
+        except Exception as e:
+            self.closed = e
+            self.ready.set()
+
+    async def receive(self) -> dict:
+        """
+        Próxima mensagem a processar
+
+        Mensagens de controle saem primeiro, na ordem de chegada; audio_data
+        espera um token do bucket e sai sempre a mais recente. Cada mensagem
+        traz "received_at" (time.time() na leitura do socket). Levanta a
+        exceção do socket (ex.: WebSocketDisconnect) quando a conexão fecha.
+        """
+        while True:
+            if self.control:
+                return self.control.popleft()
+
+            if self.latest_audio is not None:
+                delay = self.bucket.wait_time()
+                if delay > 0:
+                    # Durante a espera, novos frames substituem o pendente
+                    await asyncio.sleep(delay)
+                    continue
+                if self.bucket.consume():
+                    message = self.latest_audio
+                    self.latest_audio = None
+                    self._count("processed")
+                    return message
+
+            if self.closed is not None:
+                raise self.closed
+            self.ready.clear()
+            await self.ready.wait()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Gravação e replay de sessões de pitch
+
+Cada sessão vira um arquivo de registros binários de tamanho fixo
+(timestamp, pitch, amplitude), gravado em append enquanto o aluno canta. O
+replay abre o arquivo com np.memmap: só as páginas dos trechos lidos vão
+para a memória, então gravações longas não são carregadas inteiras, e a
+busca por timestamp é uma busca binária direto no arquivo.
+
+O diretório é limitado: cada sessão grava no máximo `max_frames` frames e
+só as `max_sessions` mais recentes ficam em disco (as mais antigas são
+apagadas quando uma nova começa). Um id só grava por um socket de cada vez.
+"""
+
+import bisect
+import math
+import re
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+
+# Um registro por frame de pitch (16 bytes)
+RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("pitch", "<f4"), ("amplitude", "<f4")])
+
+# Ids de sessão viram nomes de arquivo: nada de "/" ou ".."
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionRecorder:
+    """Grava os frames de uma sessão em append, em blocos de registros"""
+
+    def __init__(self, path: Path, flush_every: int = 32, max_frames: Optional[int] = None,
+                 on_close: Optional[Callable[["SessionRecorder"], None]] = None):
+        self.path = path
+        self.file = None  # aberto no primeiro flush: sessões sem frames não geram arquivo
+        self.buffer = np.zeros(flush_every, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.frames = path.stat().st_size // RECORD_DTYPE.itemsize if path.exists() else 0
+        self.max_frames = max_frames
+        self.dropped = 0
+        self.on_close = on_close
+
+    def append(self, timestamp: float, pitch: float, amplitude: float = 0.0):
+        """Acrescenta um frame (gravado em disco a cada flush_every frames; ignorado após max_frames)"""
+        if self.max_frames is not None and self.frames >= self.max_frames:
+            self.dropped += 1
+            return
+        self.buffer[self.count] = (timestamp, pitch, amplitude)
+        self.count += 1
+        self.frames += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        """Grava os registros pendentes"""
+        if self.count:
+            if self.file is None:
+                self.file = open(self.path, "ab")
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.file.flush()
+            self.count = 0
+
+    def close(self):
+        """Grava o que falta e fecha o arquivo"""
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.on_close:
+            self.on_close(self)
+            self.on_close = None
+
+
+class SessionReader:
+    """Acesso somente leitura a uma sessão gravada, via memory map"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: Optional[np.memmap] = None
+        self.refresh()
+
+    def refresh(self):
+        """Remapeia o arquivo se ele cresceu (sessão ainda em gravação)"""
+        count = self.path.stat().st_size // RECORD_DTYPE.itemsize
+        if count and (self.records is None or count != len(self.records)):
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+    def __len__(self) -> int:
+        return 0 if self.records is None else len(self.records)
+
+    @property
+    def start_time(self) -> float:
+        """Timestamp do primeiro frame"""
+        return float(self.records[0]["timestamp"]) if len(self) else 0.0
+
+    @property
+    def duration(self) -> float:
+        """Duração da sessão em segundos"""
+        return float(self.records[-1]["timestamp"]) - self.start_time if len(self) else 0.0
+
+    def timestamp(self, index: int) -> float:
+        """Timestamp do frame `index`"""
+        return float(self.records[index]["timestamp"])
+
+    def index_at(self, timestamp: float) -> int:
+        """Primeiro frame com timestamp >= `timestamp` (busca binária no arquivo)"""
+        if not len(self):
+            return 0
+        return bisect.bisect_left(self.records, timestamp, key=lambda record: record["timestamp"])
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Cópia dos registros [start, stop) (só essas páginas são lidas)"""
+        if not len(self):
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.array(self.records[start:stop])
+
+
+class SessionStore:
+    """Diretório de sessões gravadas, com limite de sessões e de frames por sessão"""
+
+    def __init__(self, directory: str, max_sessions: int = 100, max_frames: Optional[int] = 216000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_sessions = max_sessions
+        self.max_frames = max_frames  # padrão: 1 h a 60 frames/s (~3,5 MB)
+        self.active: dict[str, SessionRecorder] = {}
+
+    def path(self, session_id: str) -> Path:
+        """Arquivo da sessão (ValueError para ids inválidos)"""
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Id de sessão inválido: {session_id}")
+        return self.directory / f"{session_id}.pitch"
+
+    def recording(self, session_id: str) -> bool:
+        """Algum socket está gravando esta sessão agora"""
+        return session_id in self.active
+
+    def recorder(self, session_id: str) -> SessionRecorder:
+        """Gravador da sessão (continua o arquivo se o id já existe; ValueError se já está gravando)"""
+        path = self.path(session_id)
+        if session_id in self.active:
+            raise ValueError(f"Sessão já em gravação: {session_id}")
+        recorder = SessionRecorder(path, max_frames=self.max_frames,
+                                   on_close=lambda closed: self.active.pop(session_id, None))
+        self.active[session_id] = recorder
+        self.prune()
+        return recorder
+
+    def prune(self):
+        """Apaga as sessões mais antigas além de max_sessions (as em gravação contam e ficam)"""
+        paths = sorted(self.directory.glob("*.pitch"), key=lambda p: p.stat().st_mtime, reverse=True)
+        finished = [path for path in paths if path.stem not in self.active]
+        for path in finished[max(self.max_sessions - len(self.active), 0):]:
+            path.unlink(missing_ok=True)
+
+    def open(self, session_id: str) -> Optional[SessionReader]:
+        """Leitor da sessão, ou None se ela não existe"""
+        path = self.path(session_id)
+        return SessionReader(path) if path.exists() else None
+
+    def sessions(self) -> list[dict]:
+        """Sessões gravadas, mais recentes primeiro"""
+        result = []
+        for path in sorted(self.directory.glob("*.pitch"), key=lambda p: p.stat().st_mtime, reverse=True):
+            reader = SessionReader(path)
+            result.append({
+                "session_id": path.stem,
+                "frames": len(reader),
+                "start": reader.start_time,
+                "duration": round(reader.duration, 2)
+            })
+        return result
+
+
+class ReplayCursor:
+    """
+    Posição de reprodução de uma sessão, com velocidade e seek
+
+    advance() devolve os registros cujo tempo de mídia passou desde a última
+    chamada; em velocidades altas isso são vários frames por tick.
+    """
+
+    MIN_SPEED = 1.0
+    MAX_SPEED = 50.0
+
+    def __init__(self, reader: SessionReader, speed: float = 1.0, max_batch: int = 512):
+        self.reader = reader
+        self.max_batch = max_batch
+        self.speed = 1.0
+        self.set_speed(speed)
+        self.playing = True
+        self.position = 0
+        self.media_time = reader.start_time
+        self.last_tick = time.monotonic()
+
+    def set_speed(self, speed: float):
+        """Velocidade de reprodução (limitada a 1×–50×; ValueError para NaN/infinito)"""
+        speed = float(speed)
+        if not math.isfinite(speed):
+            raise ValueError(f"Velocidade inválida: {speed}")
+        self.speed = min(max(speed, self.MIN_SPEED), self.MAX_SPEED)
+
+    def seek(self, seconds: float):
+        """Vai para `seconds` segundos desde o início da sessão (ValueError para NaN/infinito)"""
+        seconds = float(seconds)
+        if not math.isfinite(seconds):
+            raise ValueError(f"Posição inválida: {seconds}")
+        self.media_time = self.reader.start_time + max(0.0, seconds)
+        self.position = self.reader.index_at(self.media_time)
+        self.last_tick = time.monotonic()
+
+    def pause(self):
+        """Pausa a reprodução"""
+        self.playing = False
+
+    def play(self):
+        """Retoma a reprodução"""
+        self.playing = True
+        self.last_tick = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        """Chegou ao último frame gravado"""
+        return self.position >= len(self.reader)
+
+    def elapsed(self) -> float:
+        """Segundos de mídia desde o início da sessão"""
+        return self.media_time - self.reader.start_time
+
+    def advance(self) -> np.ndarray:
+        """Registros a enviar neste tick"""
+        now = time.monotonic()
+        if self.playing:
+            self.media_time += (now - self.last_tick) * self.speed
+        self.last_tick = now
+
+        if self.finished:
+            self.reader.refresh()  # sessão ainda gravando: pode ter frames novos
+        if not self.playing or self.finished:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+
+        stop = self.reader.index_at(self.media_time + 1e-9)
+        stop = min(stop, self.position + self.max_batch)
+        records = self.reader.read(self.position, stop)
+        self.position = stop
+
+        # Se o lote foi limitado, o relógio de mídia acompanha o que foi enviado
+        if len(records) and stop < len(self.reader) and self.reader.timestamp(stop) <= self.media_time:
+            self.media_time = float(records[-1]["timestamp"])
+        return records
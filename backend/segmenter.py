@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Segmentação de notas em streaming e exportação MIDI
+
+O contorno de pitch (20–100 frames/s) vira eventos de nota: início, fim e
+pitch mediano. Cada frame custa O(1):
+
+- a nota atual só muda quando o pitch sai da faixa de ±`hysteresis` cents
+  em torno dela (mais larga que o ±50 do arredondamento, então uma voz
+  oscilando na fronteira entre duas notas não gera notas novas) e a nota
+  candidata se mantém por `min_duration` segundos;
+- silêncio (ou falta de frames) por mais de `max_gap` segundos fecha a nota;
+- o pitch mediano sai de um histograma de desvios em cents com resolução de
+  1 cent e tamanho fixo: cada frame incrementa um bin e a mediana só é
+  calculada quando a nota fecha.
+
+As notas fechadas cabem num Standard MIDI File (formato 0, uma trilha),
+muito menor que o contorno frame a frame.
+"""
+
+import math
+import struct
+from typing import Optional
+
+import numpy as np
+
+from keydetect import NOTE_NAMES
+
+
+# Histograma de desvios: -HISTOGRAM_RANGE..+HISTOGRAM_RANGE cents em bins de 1 cent
+HISTOGRAM_RANGE = 100
+
+# Menor tempo (BPM) cujo µs por batida cabe nos 3 bytes do meta-evento de tempo
+MIN_TEMPO = 60_000_000 / 0xFFFFFF
+
+
+def note_name(midi: int) -> dict:
+    """Nome e oitava de uma nota MIDI (60 = C4)"""
+    return {"note": NOTE_NAMES[midi % 12], "octave": midi // 12 - 1}
+
+
+class _Segment:
+    """Nota em formação: início, último frame com voz e histograma de desvios"""
+
+    __slots__ = ("midi", "onset", "last", "frames", "histogram")
+
+    def __init__(self):
+        self.histogram = np.zeros(2 * HISTOGRAM_RANGE + 1, dtype=np.int32)
+        self.start(0, 0.0)
+
+    def start(self, midi: int, timestamp: float):
+        self.midi = midi
+        self.onset = timestamp
+        self.last = timestamp
+        self.frames = 0
+        self.histogram[:] = 0
+
+    def add(self, timestamp: float, cents: float):
+        self.last = timestamp
+        self.frames += 1
+        self.histogram[min(max(round(cents), -HISTOGRAM_RANGE), HISTOGRAM_RANGE) + HISTOGRAM_RANGE] += 1
+
+    def median_cents(self) -> int:
+        """Desvio mediano (cents) em relação à nota"""
+        cumulative = np.cumsum(self.histogram)
+        return int(np.searchsorted(cumulative, (cumulative[-1] + 1) // 2)) - HISTOGRAM_RANGE
+
+
+class NoteSegmenter:
+    """
+    Contorno de pitch -> eventos note_on / note_off
+
+    add() recebe um frame (timestamp, frequência; <= 0 é silêncio) e devolve
+    os eventos gerados nesse frame. O note_on sai com o início retroativo
+    (o primeiro frame da candidata), depois de confirmada por `min_duration`.
+    Com keep_notes as notas fechadas também ficam em `notes` (sessões
+    gravadas); ao vivo elas só saem como eventos, sem acumular.
+    """
+
+    def __init__(self, hysteresis: float = 70.0, min_duration: float = 0.06, max_gap: float = 0.15,
+                 keep_notes: bool = True):
+        self.hysteresis = hysteresis
+        self.min_duration = min_duration
+        self.max_gap = max_gap
+        self.current: Optional[_Segment] = None
+        self.candidate = _Segment()
+        self.has_candidate = False
+        self._spare = _Segment()
+        self.keep_notes = keep_notes
+        self.notes: list[dict] = []  # notas fechadas da sessão (só com keep_notes)
+
+    def add(self, timestamp: float, frequency: float) -> list[dict]:
+        """Processa um frame; retorna os eventos de nota gerados"""
+        events = []
+        current = self.current
+
+        # Silêncio longo (ou buraco entre frames) fecha a nota
+        if current is not None and timestamp - current.last > self.max_gap:
+            events.append(self._close())
+            current = None
+        if frequency <= 0:
+            self.has_candidate = False
+            return events
+
+        midi = 69 + 12 * math.log2(frequency / 440.0)
+        if current is not None:
+            cents = (midi - current.midi) * 100
+            if abs(cents) <= self.hysteresis:
+                current.add(timestamp, cents)
+                self.has_candidate = False
+                return events
+
+        # Fora da nota atual (ou sem nota): acumula a candidata mais próxima
+        nearest = round(midi)
+        candidate = self.candidate
+        if not self.has_candidate or candidate.midi != nearest or timestamp - candidate.last > self.max_gap:
+            candidate.start(nearest, timestamp)
+            self.has_candidate = True
+        candidate.add(timestamp, (midi - nearest) * 100)
+
+        if candidate.frames >= 2 and timestamp - candidate.onset >= self.min_duration:
+            if current is not None:
+                events.append(self._close(candidate.onset))
+            # A candidata vira a nota atual; o segmento da nota fechada vira a próxima candidata
+            self.current, self.candidate = candidate, self._spare
+            self.has_candidate = False
+            events.append({"type": "note_on", "midi": candidate.midi, **note_name(candidate.midi),
+                           "time": candidate.onset})
+        return events
+
+    def finish(self) -> list[dict]:
+        """Fecha a nota em andamento (fim da sessão)"""
+        self.has_candidate = False
+        return [self._close()] if self.current is not None else []
+
+    def _close(self, offset: Optional[float] = None) -> dict:
+        """Fecha a nota atual em `offset` (padrão: último frame dela)"""
+        segment = self.current
+        self.current = None
+        self._spare = segment
+        offset = segment.last if offset is None else offset
+        cents = segment.median_cents()
+        note = {
+            "type": "note_off",
+            "midi": segment.midi,
+            **note_name(segment.midi),
+            "onset": segment.onset,
+            "offset": offset,
+            "duration": round(offset - segment.onset, 3),
+            "pitch": round(440.0 * 2 ** ((segment.midi + cents / 100 - 69) / 12), 2),
+            "cents": cents,
+            "frames": segment.frames
+        }
+        if self.keep_notes:
+            self.notes.append(note)
+        return note
+
+
+def segment_notes(timestamps, frequencies, **options) -> list[dict]:
+    """Notas de um contorno completo (ex.: sessão gravada)"""
+    segmenter = NoteSegmenter(**options)
+    for timestamp, frequency in zip(timestamps, frequencies):
+        segmenter.add(float(timestamp), float(frequency))
+    segmenter.finish()
+    return segmenter.notes
+
+
+def _variable_length(value: int) -> bytes:
+    """Inteiro no formato de tamanho variável do MIDI (7 bits por byte)"""
+    data = [value & 0x7F]
+    value >>= 7
+    while value:
+        data.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(data))
+
+
+def midi_file(notes: list[dict], tempo: float = 120.0, ticks_per_beat: int = 480,
+              velocity: int = 80, name: str = "") -> bytes:
+    """Standard MIDI File (formato 0) com as notas, tempos relativos à primeira"""
+    # O meta-evento de tempo guarda µs por batida em 3 bytes: no mínimo ~3,6 BPM
+    if not MIN_TEMPO <= tempo <= 60_000_000:
+        raise ValueError(f"Tempo inválido: {tempo} BPM")
+    ticks_per_second = ticks_per_beat * tempo / 60
+    start = min((note["onset"] for note in notes), default=0.0)
+
+    # (tick, ordem, bytes): no mesmo tick, note_off antes de note_on
+    messages = []
+    for note in notes:
+        key = min(max(int(note["midi"]), 0), 127)
+        on = round((note["onset"] - start) * ticks_per_second)
+        off = max(on + 1, round((note["offset"] - start) * ticks_per_second))
+        messages.append((on, 1, bytes((0x90, key, velocity))))
+        messages.append((off, 0, bytes((0x80, key, 0))))
+    messages.sort(key=lambda message: message[:2])
+
+    track = bytearray()
+    if name:
+        encoded = name.encode("utf-8")
+        track += b"\x00\xff\x03" + _variable_length(len(encoded)) + encoded
+    track += b"\x00\xff\x51\x03" + round(60_000_000 / tempo).to_bytes(3, "big")
+    last = 0
+    for tick, _, message in messages:
+        track += _variable_length(tick - last) + message
+        last = tick
+    track += b"\x00\xff\x2f\x00"
+
+    header = b"MThd" + struct.pack(">IHHH", 6, 0, 1, ticks_per_beat)
+    return header + b"MTrk" + struct.pack(">I", len(track)) + bytes(track)
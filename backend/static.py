@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Servir o build do frontend (frontend/dist) com compressão pré-calculada
+
+Na subida todos os arquivos do build são lidos para a memória junto com as
+variantes gzip e brotli (brotli se o módulo estiver instalado; arquivos
+.gz/.br gerados pelo build são reaproveitados). Nenhuma requisição comprime
+nada: a negociação só escolhe, pelo Accept-Encoding, qual variante pronta
+enviar.
+
+Assets com hash no nome (assets/index-3f9a1c2b.js, padrão do Vite) nunca
+mudam de conteúdo e recebem Cache-Control immutable de um ano; o resto
+(index.html) é revalidado a cada acesso com ETag e responde 304 quando não
+mudou. Rotas desconhecidas sem extensão caem no index.html (SPA).
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Brotli é opcional; sem ele só gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Nome com hash gerado pelo Vite: <nome>-<hash de 8+ caracteres>.<ext>
+HASHED_ASSET = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Tipos que valem a pena comprimir (imagens e fontes já vêm comprimidas)
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                "application/manifest+json", "application/xml")
+
+
+class StaticAsset:
+    """Um arquivo do build com suas variantes já comprimidas"""
+
+    def __init__(self, path: str, content: bytes, media_type: str, immutable: bool):
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        self.etag = hashlib.blake2b(content, digest_size=12).hexdigest()
+        self.variants: dict[str, bytes] = {"identity": content}
+
+    def add_variant(self, encoding: str, content: bytes):
+        """Guarda uma variante comprimida se ela for menor que o original"""
+        if len(content) < len(self.variants["identity"]):
+            self.variants[encoding] = content
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    """Accept-Encoding para {codificação: q}"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class FrontendFiles:
+    """Build do frontend servido da memória, com ETag e compressão pré-calculada"""
+
+    # Ordem de preferência quando o cliente aceita mais de uma
+    ENCODINGS = ("br", "gzip")
+
+    def __init__(self, directory: str, min_size: int = 512):
+        self.directory = Path(directory)
+        self.min_size = min_size
+        self.assets: dict[str, StaticAsset] = {}
+
+    def load(self):
+        """Lê o build e pré-calcula as variantes comprimidas (chamado na subida)"""
+        assets = {}
+        files = {path.relative_to(self.directory).as_posix(): path
+                 for path in self.directory.rglob("*") if path.is_file()}
+
+        for name, path in files.items():
+            if name.endswith((".gz", ".br")) and name[:-3] in files:
+                continue  # variante gerada pelo build, usada abaixo
+
+            content = path.read_bytes()
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            asset = StaticAsset(name, content, media_type, bool(HASHED_ASSET.search(name)))
+
+            if len(content) >= self.min_size and media_type.startswith(COMPRESSIBLE):
+                if f"{name}.gz" in files:
+                    asset.add_variant("gzip", files[f"{name}.gz"].read_bytes())
+                else:
+                    asset.add_variant("gzip", gzip.compress(content, compresslevel=9, mtime=0))
+                if f"{name}.br" in files:
+                    asset.add_variant("br", files[f"{name}.br"].read_bytes())
+                elif brotli is not None:
+                    asset.add_variant("br", brotli.compress(content, quality=11))
+            assets[name] = asset
+
+        self.assets = assets
+        sizes = sum(len(variant) for asset in assets.values() for variant in asset.variants.values())
+        print(f"📦 Frontend: {len(assets)} arquivos de {self.directory} ({sizes // 1024} KB com variantes)")
+
+    def find(self, path: str) -> Optional[StaticAsset]:
+        """Arquivo do caminho pedido; rotas do SPA (sem extensão) viram index.html"""
+        path = path.strip("/") or "index.html"
+        asset = self.assets.get(path) or self.assets.get(f"{path}/index.html")
+        if asset is None and "." not in path.rsplit("/", 1)[-1]:
+            asset = self.assets.get("index.html")
+        return asset
+
+    def response(self, request: Request, path: str) -> Response:
+        """Resposta para o arquivo: variante negociada, 304 se o ETag bate"""
+        asset = self.find(path)
+        if asset is None:
+            return Response(status_code=404)
+
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((name for name in self.ENCODINGS
+                         if name in asset.variants and accepted.get(name, 0) > 0), "identity")
+
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/")
+                                                    for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = asset.variants[encoding]
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(body, media_type=asset.media_type, headers=headers)
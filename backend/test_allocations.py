@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""Testes das alocações do detector FFT (python -m pytest backend/test_allocations.py)"""
+
+import pytest
+
+from bench_allocations import check_allocations
+from main_simple import RFFT_SUPPORTS_OUT
+
+
+@pytest.mark.parametrize("decimation", [1, 4])
+def test_hot_path_keeps_no_memory(decimation):
+    result = check_allocations(frames=200, decimation=decimation)
+    assert result["net"] <= 0
+    assert result["ok"]
+
+
+@pytest.mark.skipif(not RFFT_SUPPORTS_OUT, reason="rfft com out= precisa do NumPy 2")
+def test_hot_path_peak_without_arrays():
+    assert check_allocations(frames=200)["peak"] <= 4096
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Testes das inscrições e do ciclo de vida dos tópicos do hub (python -m pytest backend/test_hub.py)"""
+
+import asyncio
+import math
+
+import pytest
+
+from hub import PitchHub, Subscription
+
+
+async def _send(message: str):
+    pass
+
+
+@pytest.mark.parametrize("rate, expected", [
+    (20, 20.0),
+    ("30", 30.0),
+    (0, 0.1),
+    (-5, 0.1),
+    (1000, 100.0),
+    ("0.5", 0.5)
+])
+def test_clamp_rate_limits_range(rate, expected):
+    assert Subscription.clamp_rate(rate) == expected
+
+
+@pytest.mark.parametrize("rate", ["nan", "NaN", "inf", "-inf", math.nan, math.inf, "abc"])
+def test_clamp_rate_rejects_non_finite(rate):
+    with pytest.raises(ValueError):
+        Subscription.clamp_rate(rate)
+
+
+def test_subscription_rejects_nan_rate():
+    with pytest.raises(ValueError):
+        Subscription("mic", _send, rate=math.nan)
+
+
+def test_configure_keeps_rate_on_invalid_value():
+    subscription = Subscription("mic", _send, rate=10)
+    with pytest.raises(ValueError):
+        subscription.configure(rate="nan")
+    assert subscription.rate == 10.0
+    assert subscription.interval == pytest.approx(0.1)
+
+
+class _Source:
+    """Fonte falsa: conta leituras, pode falhar ao ligar"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.reads = 0
+
+    def start(self):
+        if self.fail:
+            raise OSError("sem dispositivo")
+
+    def stop(self):
+        pass
+
+    def read(self) -> dict:
+        self.reads += 1
+        return {"type": "pitch_data", "pitch": 440.0}
+
+
+def test_failed_start_leaves_no_subscription():
+    async def scenario():
+        hub = PitchHub()
+        hub.register_source("mic", lambda: _Source(fail=True))
+        with pytest.raises(OSError):
+            hub.subscribe("mic", _send)
+        assert hub.topics["mic"].subscriptions == []
+        assert not hub.topics["mic"].running
+
+    asyncio.run(scenario())
+
+
+def test_resubscribe_after_stop_runs_one_loop():
+    async def scenario():
+        hub = PitchHub(grace_period=0.0)
+        hub.register_source("mic", _Source)
+        sent = []
+
+        async def send(message: str):
+            sent.append(message)
+
+        subscription = hub.subscribe("mic", send, rate=10)
+        await asyncio.sleep(0.05)
+        hub.unsubscribe(subscription)
+        hub._stop_topic(hub.topics["mic"])
+        hub.subscribe("mic", send, rate=10)  # antes do loop antigo acordar
+        sent.clear()
+        await asyncio.sleep(0.55)
+        loops = [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "_run"]
+        assert len(loops) == 1
+        assert len(sent) <= 7
+
+    asyncio.run(scenario())
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Tons e drones de referência gerados no servidor, enviados como PCM
+
+Cada timbre vira um conjunto de wavetables de um ciclo calculado uma única
+vez (cache por timbre e taxa de amostragem): uma tabela por oitava, cada uma
+só com os harmônicos que ficam abaixo da Nyquist para a nota mais aguda da
+oitava, então nenhuma nota gera aliasing. A síntese é um acumulador de fase
+por voz (incremento = f / taxa) lendo a tabela com interpolação linear; as
+vozes de um acorde formam uma matriz (vozes × amostras) que é ponderada
+pelos ganhos e somada sobre as vozes numa única operação.
+
+Cada canal (/ws/tones/{canal}) tem um único gerador: a cada bloco os mesmos
+bytes vão para todos os ouvintes, então o custo não depende de quantos
+estão ouvindo e todos recebem a referência sincronizada (o índice da
+primeira amostra vai no cabeçalho).
+
+Frame binário (little-endian):
+    cabeçalho  "PTTN" | bloco (uint32) | primeira amostra (uint64)
+    amostras   PCM int16 mono na taxa do canal
+"""
+
+import asyncio
+import json
+import math
+import struct
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from fastapi import WebSocket
+
+
+FRAME_HEADER = struct.Struct("<4sIQ")
+FRAME_MAGIC = b"PTTN"
+
+TABLE_SIZE = 2048
+
+# Vozes por acorde (o canal é compartilhado: um play não pode custar o loop de todos)
+MAX_VOICES = 16
+
+# Amplitude do harmônico n (1..N) de cada timbre
+TIMBRES = {
+    "sine": lambda n: (n == 1).astype(float),
+    "triangle": lambda n: np.where(n % 2 == 1, (-1.0) ** ((n - 1) // 2) / n ** 2, 0.0),
+    "square": lambda n: np.where(n % 2 == 1, 1.0 / n, 0.0),
+    "sawtooth": lambda n: 1.0 / n,
+    "organ": lambda n: np.select([n == 1, n == 2, n == 3, n == 4, n == 6, n == 8],
+                                 [1.0, 0.7, 0.5, 0.35, 0.2, 0.15], 0.0),
+    "voice": lambda n: n ** -1.1 * (1 + 0.8 * np.exp(-0.5 * ((n - 3) / 1.2) ** 2))
+}
+
+# Intervalos (semitons a partir da nota) de cada acorde/drone
+CHORDS = {
+    "unison": (0,),
+    "octave": (0, 12),
+    "fifth": (0, 7),
+    "drone": (-12, 0, 7),
+    "major": (0, 4, 7),
+    "minor": (0, 3, 7)
+}
+
+
+@lru_cache(maxsize=None)
+def wavetables(timbre: str, sample_rate: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Tabelas limitadas em banda de um timbre (calculadas uma vez)
+
+    Retorna (tabelas, limites): a tabela i serve para fundamentais até
+    limites[i] Hz (uma por oitava a partir de A0). Cada tabela tem
+    TABLE_SIZE + 1 amostras (a última repete a primeira, para interpolar sem
+    módulo).
+    """
+    harmonic_amplitude = TIMBRES[timbre]
+    nyquist = sample_rate / 2
+    limits = 27.5 * 2.0 ** np.arange(1, int(np.log2(nyquist / 27.5)) + 1)
+
+    tables = np.empty((len(limits), TABLE_SIZE + 1), dtype=np.float32)
+    for i, limit in enumerate(limits):
+        count = max(1, min(int(nyquist / limit), TABLE_SIZE // 2 - 1))
+        orders = np.arange(1, count + 1)
+        spectrum = np.zeros(TABLE_SIZE // 2 + 1, dtype=np.complex128)
+        spectrum[orders] = -0.5j * TABLE_SIZE * harmonic_amplitude(orders)  # senos
+        wave = np.fft.irfft(spectrum, TABLE_SIZE)
+        tables[i, :TABLE_SIZE] = wave / np.abs(wave).max()
+        tables[i, TABLE_SIZE] = tables[i, 0]
+    return tables, limits
+
+
+class ToneGenerator:
+    """
+    Osciladores de wavetable de um canal, com fade ao trocar de nota
+
+    play() troca o acorde: as vozes antigas saem em fade-out e as novas
+    entram em fade-in (`fade` segundos), sem cliques. render() gera um bloco
+    misturando todas as vozes de uma vez.
+    """
+
+    def __init__(self, sample_rate: int = 22050, fade: float = 0.02):
+        self.sample_rate = sample_rate
+        self.fade_samples = max(1, int(fade * sample_rate))
+        self.position = 0  # índice da próxima amostra
+        self.stop_at: Optional[int] = None
+        self.state: dict = {"playing": False}
+        self.version = 0  # incrementado a cada play/stop (estado reenviado aos ouvintes)
+
+        # Uma linha por voz: tabela, incremento, fase, ganho atual e alvo
+        self.tables = np.zeros((0, TABLE_SIZE + 1), dtype=np.float32)
+        self.increment = np.zeros(0)
+        self.phase = np.zeros(0)
+        self.gain = np.zeros(0)
+        self.target = np.zeros(0)
+
+    @property
+    def active(self) -> bool:
+        """Há voz soando (ou em fade-out)"""
+        return bool(len(self.gain))
+
+    def play(self, midi_notes: list[float], timbre: str = "sine", gain: float = 0.3,
+             duration: Optional[float] = None):
+        """Troca o acorde (MIDI fracionário permitido); duration em segundos para parar sozinho"""
+        if timbre not in TIMBRES:
+            raise ValueError(f"Timbre desconhecido: {timbre}")
+        if len(midi_notes) > MAX_VOICES:
+            raise ValueError(f"Acorde com mais de {MAX_VOICES} vozes")
+        if not math.isfinite(gain) or not 0.0 <= gain <= 1.0:
+            raise ValueError(f"Ganho inválido: {gain}")
+        if duration is not None and not (math.isfinite(duration) and duration > 0):
+            raise ValueError(f"Duração inválida: {duration}")
+        frequencies = 440.0 * 2 ** ((np.asarray(midi_notes, dtype=np.float64) - 69) / 12)
+        frequencies = frequencies[(frequencies > 0) & (frequencies < self.sample_rate / 2)]
+
+        tables, limits = wavetables(timbre, self.sample_rate)
+        band = np.minimum(np.searchsorted(limits, frequencies), len(limits) - 1)
+
+        # Vozes antigas só saem em fade-out (as que já estavam saindo são cortadas,
+        # então o gerador nunca passa de 2 × MAX_VOICES); as novas começam em silêncio
+        sounding = self.target > 0
+        self.tables, self.increment, self.phase = self.tables[sounding], self.increment[sounding], self.phase[sounding]
+        self.gain, self.target = self.gain[sounding], self.target[sounding]
+        self.target[:] = 0.0
+        count = len(frequencies)
+        self.tables = np.concatenate([self.tables, tables[band]])
+        self.increment = np.concatenate([self.increment, frequencies / self.sample_rate])
+        self.phase = np.concatenate([self.phase, np.zeros(count)])
+        self.gain = np.concatenate([self.gain, np.zeros(count)])
+        self.target = np.concatenate([self.target, np.full(count, gain / max(1, count))])
+
+        self.stop_at = None if duration is None else self.position + int(duration * self.sample_rate)
+        self.state = {
+            "playing": bool(count),
+            "notes": [float(note) for note in midi_notes],
+            "frequencies": [round(float(frequency), 2) for frequency in frequencies],
+            "timbre": timbre,
+            "gain": gain,
+            "duration": duration
+        }
+        self.version += 1
+
+    def stop(self):
+        """Fade-out de todas as vozes"""
+        self.target[:] = 0.0
+        self.stop_at = None
+        self.state = {"playing": False}
+        self.version += 1
+
+    def render(self, count: int) -> np.ndarray:
+        """Próximas `count` amostras (float32, -1..1)"""
+        if self.stop_at is not None and self.position + count >= self.stop_at:
+            self.stop()
+        self.position += count
+        if not self.active:
+            return np.zeros(count, dtype=np.float32)
+
+        # Fase de cada voz em cada amostra (vozes × amostras) e leitura interpolada
+        steps = np.arange(count)
+        phase = (self.phase[:, np.newaxis] + self.increment[:, np.newaxis] * steps) % 1.0
+        position = phase * TABLE_SIZE
+        index = position.astype(np.intp)
+        fraction = (position - index).astype(np.float32)
+        left = np.take_along_axis(self.tables, index, axis=1)
+        right = np.take_along_axis(self.tables, index + 1, axis=1)
+        voices = left + (right - left) * fraction
+
+        # Rampa linear de ganho até o alvo, limitada pela duração do fade
+        ramp = np.minimum(1.0, (steps + 1) / self.fade_samples)
+        gains = self.gain[:, np.newaxis] + (self.target - self.gain)[:, np.newaxis] * ramp
+        mix = np.einsum("vs,vs->s", voices, gains.astype(np.float32))
+
+        self.phase = (self.phase + self.increment * count) % 1.0
+        self.gain = gains[:, -1]
+
+        # Vozes que terminaram o fade-out saem da matriz
+        silent = (self.gain == 0.0) & (self.target == 0.0)
+        if silent.any():
+            keep = ~silent
+            self.tables, self.increment, self.phase = self.tables[keep], self.increment[keep], self.phase[keep]
+            self.gain, self.target = self.gain[keep], self.target[keep]
+        return np.clip(mix, -1.0, 1.0)
+
+    def frame(self, count: int, block: int) -> Optional[bytes]:
+        """Bloco como frame binário PCM int16, ou None em silêncio (o tempo avança igual)"""
+        start = self.position
+        if not self.active:
+            self.position += count
+            return None
+        pcm = (self.render(count) * 32767).astype("<i2")
+        return FRAME_HEADER.pack(FRAME_MAGIC, block & 0xFFFFFFFF, start) + pcm.tobytes()
+
+
+class ToneListener:
+    """Envio para um ouvinte: fila curta de blocos, os mais antigos são descartados"""
+
+    def __init__(self, websocket: WebSocket, max_pending: int = 8):
+        self.websocket = websocket
+        self.frames: deque[bytes] = deque(maxlen=max_pending)
+        self.state: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, frame: Optional[bytes], state: Optional[str] = None):
+        """Enfileira o bloco do tick (e o estado do canal, se mudou)"""
+        if frame is not None:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+        if state is not None:
+            self.state = state
+        self.ready.set()
+
+    async def run(self):
+        """Envia estado (quando mudou) e os blocos pendentes, em ordem"""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            state, self.state = self.state, None
+            if state is not None:
+                await self.websocket.send_text(state)
+            while self.frames:
+                await self.websocket.send_bytes(self.frames.popleft())
+
+
+class ToneHub:
+    """Canais de referência com ouvintes nesta instância e seus loops de geração"""
+
+    def __init__(self, sample_rate: int = 22050, block_size: int = 1024):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.generators: dict[str, ToneGenerator] = {}
+        self.listeners: dict[str, list[ToneListener]] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.blocks_rendered = 0
+
+    async def join(self, channel: str, websocket: WebSocket) -> ToneGenerator:
+        """Adiciona um ouvinte; o primeiro do canal cria o gerador e inicia o loop"""
+        generator = self.generators.get(channel)
+        if generator is None:
+            generator = self.generators[channel] = ToneGenerator(self.sample_rate)
+            self.listeners[channel] = []
+            self.tasks[channel] = asyncio.create_task(self._run(channel, generator))
+
+        listener = ToneListener(websocket)
+        listener.state = self.state_message(channel, generator)
+        listener.task = asyncio.create_task(listener.run())
+        listener.ready.set()
+        self.listeners[channel].append(listener)
+        return generator
+
+    async def leave(self, channel: str, websocket: WebSocket):
+        """Remove um ouvinte; o último encerra o canal nesta instância"""
+        listeners = self.listeners.get(channel)
+        if listeners is None:
+            return
+        for listener in [listener for listener in listeners if listener.websocket is websocket]:
+            listener.task.cancel()
+            listeners.remove(listener)
+        if listeners:
+            return
+
+        del self.generators[channel]
+        del self.listeners[channel]
+        self.tasks.pop(channel).cancel()
+
+    def state_message(self, channel: str, generator: ToneGenerator) -> str:
+        """Mensagem JSON com o que o canal está tocando e o formato do PCM"""
+        return json.dumps({
+            "type": "tone_state",
+            "channel": channel,
+            "sample_rate": generator.sample_rate,
+            "block_size": self.block_size,
+            "position": generator.position,
+            **generator.state
+        })
+
+    async def _run(self, channel: str, generator: ToneGenerator):
+        """Loop do canal: um bloco por período, os mesmos bytes para todos os ouvintes"""
+        period = self.block_size / self.sample_rate
+        version = 0  # gerador novo: o estado inicial já foi enviado no join
+        started = time.monotonic()
+        block = 0
+        while True:
+            frame = generator.frame(self.block_size, block)
+            if frame is not None:
+                self.blocks_rendered += 1
+
+            state = None
+            if generator.version != version:
+                version = generator.version
+                state = self.state_message(channel, generator)
+
+            if frame is not None or state is not None:
+                for listener in self.listeners.get(channel, ()):
+                    listener.offer(frame, state)
+
+            # Prazo absoluto (sem deriva); atraso grande (ex.: pausa do processo) ressincroniza
+            block += 1
+            delay = started + block * period - time.monotonic()
+            if delay < -10 * period:
+                started, block = time.monotonic(), 0
+                delay = 0.0
+            await asyncio.sleep(max(0.0, delay))
+
+    def stats(self) -> dict:
+        """Resumo dos canais para endpoints de status"""
+        return {
+            "blocks_rendered": self.blocks_rendered,
+            "channels": {
+                name: {
+                    "listeners": len(self.listeners[name]),
+                    "playing": generator.state["playing"],
+                    "dropped_blocks": sum(listener.dropped for listener in self.listeners[name])
+                }
+                for name, generator in self.generators.items()
+            }
+        }
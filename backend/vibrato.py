@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Análise de vibrato em streaming - taxa (Hz) e extensão (cents)
+
+O contorno de pitch em cents tem a tendência removida por uma média móvel
+(a nota sustentada) e o que sobra é a oscilação do vibrato. Cada frame
+atualiza a média (soma corrente numa janela deslizante), verifica se o
+desvio cruzou o zero - com histerese, para o jitter não contar como
+cruzamento - e acompanha o pico do meio-ciclo atual. Tudo O(1) por frame:
+taxa e extensão só mudam quando um meio-ciclo fecha.
+
+- taxa: meios-ciclos na janela / (2 × tempo entre o primeiro e o último cruzamento)
+- extensão: média dos picos |desvio| dos meios-ciclos na janela (± cents)
+- regularidade: 1 - coeficiente de variação da duração dos meios-ciclos
+
+Frames sem voz por mais de `max_gap` segundos ou saltos grandes (troca de
+nota) reiniciam a análise.
+"""
+
+import math
+from collections import deque
+from typing import Optional
+
+
+class VibratoAnalyzer:
+    """Taxa e extensão do vibrato sobre uma janela deslizante do contorno"""
+
+    def __init__(self, window: float = 1.0, detrend: float = 0.4, hysteresis: float = 3.0,
+                 min_rate: float = 3.0, max_rate: float = 9.0, min_half_cycles: int = 4,
+                 max_gap: float = 0.15, max_jump: float = 150.0):
+        self.window = window
+        self.detrend = detrend
+        self.hysteresis = hysteresis
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_half_cycles = min_half_cycles
+        self.max_gap = max_gap
+        self.max_jump = max_jump
+        self.reset()
+
+    def reset(self):
+        """Descarta o contorno (silêncio ou nota nova)"""
+        self.samples: deque[tuple[float, float]] = deque()  # (timestamp, cents) na janela da média
+        self.total = 0.0
+        self.last_time: Optional[float] = None
+        self.sign = 0  # lado do desvio (+1/-1), 0 antes do primeiro cruzamento
+        self.peak = 0.0
+        self.crossings: deque[tuple[float, float]] = deque()  # (timestamp, pico do meio-ciclo que fechou)
+        self.current: Optional[dict] = None
+
+    def add(self, timestamp: float, frequency: float) -> Optional[dict]:
+        """Processa um frame; retorna {"rate", "extent", "regularity"} enquanto há vibrato"""
+        if frequency <= 0:
+            if self.last_time is not None and timestamp - self.last_time > self.max_gap:
+                self.reset()
+            return self.current
+        if self.last_time is not None and timestamp <= self.last_time:
+            return self.current  # timestamp repetido ou voltando (relógio do cliente)
+
+        cents = 1200 * math.log2(frequency / 440.0)
+        if self.last_time is not None and (timestamp - self.last_time > self.max_gap
+                                           or abs(cents - self.total / len(self.samples)) > self.max_jump):
+            self.reset()
+        self.last_time = timestamp
+
+        # Média móvel da janela de tendência
+        self.samples.append((timestamp, cents))
+        self.total += cents
+        while self.samples[0][0] < timestamp - self.detrend:
+            self.total -= self.samples.popleft()[1]
+        if timestamp - self.samples[0][0] < self.detrend / 2:
+            return self.current  # média ainda sem histórico suficiente
+        deviation = cents - self.total / len(self.samples)
+
+        # Cruzamento com histerese: o desvio precisa passar do outro lado por `hysteresis` cents
+        side = 1 if deviation > self.hysteresis else -1 if deviation < -self.hysteresis else 0
+        if side and side != self.sign:
+            if self.sign:
+                self.crossings.append((timestamp, self.peak))
+                self._update(timestamp)
+            self.sign = side
+            self.peak = 0.0
+        self.peak = max(self.peak, abs(deviation))
+
+        # Sem cruzamento há mais de um período da taxa mínima: o vibrato parou
+        if self.crossings and timestamp - self.crossings[-1][0] > 1 / self.min_rate:
+            self.crossings.clear()
+            self.current = None
+        return self.current
+
+    def _update(self, timestamp: float):
+        """Recalcula taxa e extensão quando um meio-ciclo fecha"""
+        while self.crossings[0][0] < timestamp - self.window:
+            self.crossings.popleft()
+
+        half_cycles = len(self.crossings) - 1
+        if half_cycles < self.min_half_cycles:
+            self.current = None
+            return
+
+        first, last = self.crossings[0][0], self.crossings[-1][0]
+        if last <= first:
+            self.current = None
+            return
+        rate = half_cycles / (2 * (last - first))
+        if not self.min_rate <= rate <= self.max_rate:
+            self.current = None
+            return
+
+        # Picos e durações dos meios-ciclos completos (o primeiro pico começou antes da janela)
+        peaks = [peak for _, peak in list(self.crossings)[1:]]
+        times = [time for time, _ in self.crossings]
+        durations = [b - a for a, b in zip(times, times[1:])]
+        mean_duration = sum(durations) / len(durations)
+        spread = math.sqrt(sum((d - mean_duration) ** 2 for d in durations) / len(durations))
+
+        self.current = {
+            "rate": round(rate, 2),
+            "extent": round(sum(peaks) / len(peaks), 1),
+            "regularity": round(max(0.0, 1 - spread / mean_duration), 2)
+        }
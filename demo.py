@@ -2,20 +2,46 @@
 """
 Demo rápida do detector de pitch
 Testa a funcionalidade básica sem interface gráfica
+
+Modo lote: analisa todas as gravações de uma pasta em paralelo
+    python demo.py --batch gravacoes/ --output resultados/
 """
 
+import argparse
+import json
+import os
 import sys
 import time
 import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 try:
     import aubio
-    import sounddevice as sd
     import numpy as np
 except ImportError as e:
     print(f"❌ Dependência não encontrada: {e}")
     print("💡 Execute: pip install aubio sounddevice numpy")
     sys.exit(1)
 
+# Captura ao vivo precisa de PortAudio; o modo lote não
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    sd = None
+
+# Parquet é opcional; sem pyarrow os resultados saem em .npz
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Extensões lidas pelo aubio.source (libav/sndfile)
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".ogg", ".m4a", ".aif", ".aiff"}
+
+# Arquivo de progresso (uma linha JSON por gravação concluída)
+PROGRESS_FILE = "progress.jsonl"
+
 class PitchDemo:
     """Demo simples do detector de pitch"""
     
@@ -113,8 +139,209 @@ class PitchDemo:
         finally:
             print("\n\n✅ Demo finalizada!")
 
+def analyze_file(path, sample_rate=44100, buffer_size=4096):
+    """
+    Extrai o contorno de pitch de uma gravação
+    
+    Retorna colunas float32: tempo (s), pitch (Hz, 0.0 sem voz) e RMS de cada hop.
+    """
+    hop_size = buffer_size // 4
+    source = aubio.source(str(path), sample_rate, hop_size)
+    detector = aubio.pitch("default", buffer_size, hop_size, sample_rate)
+    detector.set_unit("Hz")
+    detector.set_tolerance(0.8)
+    
+    pitches = []
+    levels = []
+    try:
+        while True:
+            samples, read = source()
+            pitch = detector(samples)[0]
+            pitches.append(pitch if 80 <= pitch <= 2000 else 0.0)
+            levels.append(float(np.sqrt(np.mean(samples[:read] ** 2))) if read else 0.0)
+            if read < hop_size:
+                break
+    finally:
+        source.close()
+    
+    pitch = np.array(pitches, dtype=np.float32)
+    rms = np.array(levels, dtype=np.float32)
+    
+    # Gate de silêncio: pitch em trechos sem energia é ruído do detector
+    pitch[rms < 0.005] = 0.0
+    
+    times = (np.arange(len(pitch)) * hop_size / sample_rate).astype(np.float32)
+    return {"time": times, "pitch": pitch, "rms": rms}
+
+
+def summarize_contour(contour, hop_seconds):
+    """Estatísticas de uma gravação a partir do seu contorno"""
+    pitch = contour["pitch"]
+    voiced = pitch[pitch > 0]
+    summary = {
+        "duration": float(len(pitch) * hop_seconds),
+        "frames": int(len(pitch)),
+        "voiced_ratio": float(len(voiced) / len(pitch)) if len(pitch) else 0.0,
+        "median_pitch": 0.0,
+        "p5_pitch": 0.0,
+        "p95_pitch": 0.0,
+        "range_semitones": 0.0,
+        "mean_abs_cents": 0.0
+    }
+    if len(voiced):
+        semitones = 12 * np.log2(voiced / 440.0)
+        p5, p50, p95 = np.percentile(voiced, [5, 50, 95])
+        summary.update({
+            "median_pitch": float(p50),
+            "p5_pitch": float(p5),
+            "p95_pitch": float(p95),
+            "range_semitones": float(12 * np.log2(p95 / p5)),
+            # Desvio médio em relação ao semitom temperado mais próximo
+            "mean_abs_cents": float(np.mean(np.abs(semitones - np.round(semitones))) * 100)
+        })
+    return summary
+
+
+def write_columns(columns, path, file_format):
+    """Grava colunas em .parquet ou .npz, de forma atômica (arquivo temporário + rename)"""
+    temporary = path.with_name(path.name + ".tmp")
+    if file_format == "parquet":
+        pq.write_table(pa.table(columns), temporary, compression="zstd")
+    else:
+        with open(temporary, "wb") as handle:
+            np.savez_compressed(handle, **columns)
+    os.replace(temporary, path)
+
+
+def process_file(path, output_path, sample_rate, buffer_size, file_format):
+    """Tarefa de um worker: analisa uma gravação e grava seu contorno"""
+    start = time.perf_counter()
+    contour = analyze_file(path, sample_rate, buffer_size)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    write_columns(contour, output_path, file_format)
+    summary = summarize_contour(contour, buffer_size // 4 / sample_rate)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def load_progress(progress_path):
+    """Gravações já concluídas, indexadas pelo caminho relativo"""
+    done = {}
+    if progress_path.exists():
+        for line in progress_path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # linha cortada por uma interrupção no meio da escrita
+            done[entry["file"]] = entry
+    return done
+
+
+def run_batch(input_dir, output_dir, workers=None, file_format="auto",
+              sample_rate=44100, buffer_size=4096):
+    """
+    Analisa todas as gravações de uma pasta em um pool de processos
+    
+    Cada gravação gera um contorno (tempo, pitch, rms) em output_dir; o
+    progresso vai sendo anotado em progress.jsonl, então uma execução
+    interrompida continua de onde parou (arquivos alterados desde a análise
+    são refeitos). No final grava summary.parquet/summary.npz com as
+    estatísticas de todas as gravações.
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    if file_format == "auto":
+        file_format = "parquet" if pa is not None else "npz"
+    if file_format == "parquet" and pa is None:
+        print("❌ Formato parquet precisa do pyarrow (pip install pyarrow)")
+        return 1
+    
+    files = sorted(path for path in input_dir.rglob("*") if path.suffix.lower() in AUDIO_EXTENSIONS)
+    progress_path = output_dir / PROGRESS_FILE
+    done = load_progress(progress_path)
+    
+    pending = []
+    for path in files:
+        relative = path.relative_to(input_dir).as_posix()
+        stat = path.stat()
+        output_path = output_dir / f"{relative}.{file_format}"
+        entry = done.get(relative)
+        if (entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+                and entry["output"] == output_path.name and output_path.exists()):
+            continue
+        pending.append((path, relative, stat, output_path))
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"🎵 {len(files)} gravações em {input_dir} ({len(files) - len(pending)} já analisadas)")
+    print(f"⚙️  {workers} processos | contornos em {file_format} | saída: {output_dir}")
+    
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(progress_path, "a", encoding="utf-8") as progress:
+        futures = {
+            executor.submit(process_file, path, output_path, sample_rate, buffer_size, file_format):
+                (relative, stat, output_path)
+            for path, relative, stat, output_path in pending
+        }
+        for completed, future in enumerate(as_completed(futures), 1):
+            relative, stat, output_path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"❌ [{completed}/{len(pending)}] {relative}: {e}")
+                continue
+            
+            entry = {"file": relative, "size": stat.st_size, "mtime": stat.st_mtime,
+                     "output": output_path.name, **summary}
+            progress.write(json.dumps(entry) + "\n")
+            progress.flush()
+            done[relative] = entry
+            
+            elapsed = time.perf_counter() - start
+            remaining = elapsed / completed * (len(pending) - completed)
+            print(f"✅ [{completed}/{len(pending)}] {relative} | {summary['duration']:.0f} s de áudio "
+                  f"| mediana {summary['median_pitch']:.1f} Hz | faltam ~{remaining:.0f} s", flush=True)
+    
+    # Resumo de todas as gravações presentes na pasta (desta execução e das anteriores)
+    entries = [done[relative] for relative in (path.relative_to(input_dir).as_posix() for path in files)
+               if relative in done]
+    if entries:
+        columns = {"path": np.array([entry["file"] for entry in entries])}
+        columns.update({name: np.array([entry[name] for entry in entries])
+                        for name in entries[0] if name not in ("file", "output", "seconds")})
+        write_columns(columns, output_dir / f"summary.{file_format}", file_format)
+        
+        total_audio = sum(entry["duration"] for entry in entries)
+        print(f"\n📊 {len(entries)} gravações, {total_audio / 3600:.1f} h de áudio "
+              f"-> {output_dir / f'summary.{file_format}'}")
+    if failures:
+        print(f"⚠️  {failures} gravações falharam (serão refeitas na próxima execução)")
+    return 1 if failures else 0
+
+
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description="Demo do detector de pitch")
+    parser.add_argument("--batch", metavar="PASTA", help="analisar todas as gravações da pasta em vez do microfone")
+    parser.add_argument("--output", default="pitch_resultados", help="pasta dos contornos e do resumo (modo lote)")
+    parser.add_argument("--workers", type=int, help="processos em paralelo (padrão: número de CPUs)")
+    parser.add_argument("--format", choices=["auto", "parquet", "npz"], default="auto",
+                        help="formato colunar dos resultados (auto: parquet se o pyarrow estiver instalado)")
+    parser.add_argument("--duration", type=float, default=30, help="duração da demo ao vivo em segundos")
+    args = parser.parse_args()
+    
+    if args.batch:
+        sys.exit(run_batch(args.batch, args.output, args.workers, args.format))
+    
+    if sd is None:
+        print("❌ Dependência não encontrada: sounddevice")
+        print("💡 Execute: pip install aubio sounddevice numpy")
+        sys.exit(1)
+    
     try:
         demo = PitchDemo()
         
@@ -129,7 +356,7 @@ def main():
         print(f"🎤 Usando dispositivo: {sd.query_devices(kind='input')['name']}")
         
         # Executar demo
-        demo.run_demo(30)  # 30 segundos
+        demo.run_demo(args.duration)
         
     except Exception as e:
         print(f"\n❌ Erro: {e}")